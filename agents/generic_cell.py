@@ -0,0 +1,39 @@
+import numpy as np
+
+
+class GenericCell:
+    """Un agent simple qui se déplace sur une grille, ses paramètres (color, life_span,
+    speed) sont des attributs de classe renseignés par le registre des espèces."""
+
+    color = 'grey'
+    life_span = 10
+    speed = 1
+
+    def __init__(self, x, y, grid_size):
+        self.x = x
+        self.y = y
+        self.grid_size = grid_size
+        self.color = type(self).color
+        self.speed = type(self).speed
+        self.life_span = type(self).life_span
+        self.age = 0
+        self.activated = False
+
+    def move(self, dx=None, dy=None):
+        """Déplacement aléatoire dans la grille, dx et dy (dans [-1, 0, 1]) sont tirés
+        s'ils ne sont pas fournis, le déplacement vertical est multiplié par speed."""
+        if dx is None or dy is None:
+            dx, dy = np.random.choice([-1, 0, 1]), np.random.choice([-1, 0, 1])
+        self.x = np.clip(self.x + dx, 0, self.grid_size - 1)
+        self.y = np.clip(self.y + dy * self.speed, 0, self.grid_size - 1)
+
+    def get_older(self):
+        self.age +=1
+
+    def cell_division(self):
+        new_cell = type(self)(self.x+1, self.y, self.grid_size)
+        new_cell.color = self.color
+        new_cell.life_span = self.life_span
+        new_cell.speed = self.speed
+        new_cell.age = 0
+        return new_cell
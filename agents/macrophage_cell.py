@@ -9,15 +9,18 @@ class Macrophage:
         self.y = y
         self.grid_size = grid_size
         self.color = 'purple'
+        self.speed = 1
         self.life_span = 10
         self.age = 0
         self.activated = False
 
-    def move(self):
-        """Déplacement aléatoire dans la grille."""
-        dx, dy = np.random.choice([-1, 0, 1]), np.random.choice([-1, 0, 1])
+    def move(self, dx=None, dy=None):
+        """Déplacement aléatoire dans la grille, dx et dy (dans [-1, 0, 1]) sont tirés
+        s'ils ne sont pas fournis, le déplacement vertical est multiplié par speed."""
+        if dx is None or dy is None:
+            dx, dy = np.random.choice([-1, 0, 1]), np.random.choice([-1, 0, 1])
         self.x = np.clip(self.x + dx, 0, self.grid_size - 1)
-        self.y = np.clip(self.y + dy, 0, self.grid_size - 1)
+        self.y = np.clip(self.y + dy * self.speed, 0, self.grid_size - 1)
 
     def get_older(self):
         self.age +=1
@@ -25,5 +28,7 @@ class Macrophage:
     def cell_division(self):
         new_cell = Macrophage(self.x+1, self.y, self.grid_size)
         new_cell.color = self.color
+        new_cell.life_span = self.life_span
+        new_cell.speed = self.speed
         new_cell.age = 0
         return new_cell
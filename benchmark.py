@@ -0,0 +1,371 @@
+# load usual dependencies
+import numpy as np
+import time
+import tracemalloc
+import platform
+import datetime
+import json
+import subprocess
+import tempfile
+import os
+import sys
+
+# load modules
+import environment
+from population import Population, SPECIES
+from spatial import OccupancyGrid
+
+
+# fraction of each species in the population, in the SPECIES order
+SPECIES_MIX = {
+    "default":[5, 7, 2, 4, 4, 4, 4, 4],
+    "b_t":[1, 1, 0, 0, 0, 0, 0, 0],
+    "b_only":[1, 0, 0, 0, 0, 0, 0, 0]
+}
+
+# engines, with the max number of agents they are benchmarked with (quadratic paths are slow)
+ENGINES = {
+    "objects-brute":1000,
+    "objects":100000,
+    "arrays":1000000
+}
+
+PHASES = ["interaction", "division", "death", "movement"]
+
+# startup budget of a headless job (e.g one run of a sweep), in seconds, see check_startup
+STARTUP_BUDGET = {
+    "import_seconds":0.4,
+    "configuration_seconds":0.02,
+    "job_seconds":0.8
+}
+
+# modules a headless job must not import
+HEAVY_MODULES = ["pandas", "matplotlib", "imageio", "PIL", "tqdm"]
+
+# headless jobs measured by check_startup: module imported by the job (the module of the
+# function run by a process pool worker) and the call running it with the parsed arguments
+STARTUP_JOBS = {
+    "simulation":("simple_run", "simple_run.run_simulation(**arguments)"),
+    "sweep":("sweep", "sweep.run_replicate(arguments)"),
+    "replicas":("sweep", "sweep.run_replicas(arguments, 2)")
+}
+
+# headless job run in a fresh interpreter by measure_startup, prints its timings as json
+STARTUP_SCRIPT = """
+import time
+start = time.perf_counter()
+import json, sys
+import {module}
+imported = time.perf_counter()
+import simple_run
+configuration = simple_run.parse_configuration(sys.argv[1])
+arguments = simple_run.simulation_arguments(configuration)
+configured = time.perf_counter()
+arguments.update(output_folder=sys.argv[2], n_steps=1, engine="arrays")
+arguments["outputs"].update(frame_every=0)
+{call}
+print(json.dumps({{
+    "import_seconds":imported - start,
+    "configuration_seconds":configured - imported,
+    "heavy_modules":[m for m in sys.argv[3:] if m in sys.modules]
+}}))
+"""
+
+
+def _species_counts(n_agents:int, mix:str) -> list:
+    """Split n_agents between species according to a species mix"""
+    weights = np.array(SPECIES_MIX[mix], dtype=np.float64)
+    counts = np.floor(n_agents * weights / weights.sum()).astype(int)
+    counts[np.argmax(weights)] += n_agents - counts.sum()
+    return counts.tolist()
+
+
+def _init_objects(counts:list, grid_size:int, rng:np.random.Generator) -> list:
+    agent_list_list = [[agent_class(x, y, grid_size) for x, y in rng.integers(0, grid_size, size=(n, 2)).tolist()] for agent_class, n in zip(SPECIES, counts)]
+    return environment.init_random_age(agent_list_list, rng)
+
+
+def _init_arrays(counts:list, grid_size:int, rng:np.random.Generator) -> Population:
+    population = Population(grid_size, rng)
+    for species_id, n in enumerate(counts):
+        population.add(species_id, rng.integers(0, grid_size, n), rng.integers(0, grid_size, n))
+    population.init_random_age()
+    return population
+
+
+def _step_objects(agent_list_list:list, rng:np.random.Generator, method:str, timings:dict, occupancy:OccupancyGrid=None) -> list:
+    """One step of the object engine (same phases as run_simulation), timings are accumulated.
+    occupancy is the occupancy grid kept along the run by the 'grid' method."""
+
+    t = time.perf_counter()
+    environment.detect_interaction(agent_list_list[0], agent_list_list[1], method=method)
+    timings["interaction"] += time.perf_counter() - t
+
+    t = time.perf_counter()
+    agent_list_list = environment.look_for_division(agent_list_list, method=method, occupancy=occupancy)
+    timings["division"] += time.perf_counter() - t
+
+    t = time.perf_counter()
+    agent_list_list = environment.drop_old_cell(agent_list_list, occupancy)
+    timings["death"] += time.perf_counter() - t
+
+    t = time.perf_counter()
+    environment.move_agents(agent_list_list, rng, occupancy)
+    timings["movement"] += time.perf_counter() - t
+
+    return agent_list_list
+
+
+def _step_arrays(population:Population, timings:dict) -> None:
+    """One step of the array engine (same phases as run_simulation), timings are accumulated"""
+
+    t = time.perf_counter()
+    population.detect_interaction()
+    timings["interaction"] += time.perf_counter() - t
+
+    t = time.perf_counter()
+    population.look_for_division()
+    timings["division"] += time.perf_counter() - t
+
+    t = time.perf_counter()
+    population.drop_old_cell()
+    timings["death"] += time.perf_counter() - t
+
+    t = time.perf_counter()
+    population.move()
+    population.get_older()
+    timings["movement"] += time.perf_counter() - t
+
+
+def _run_case(engine:str, counts:list, grid_size:int, n_steps:int, seed:int, timings:dict) -> list:
+    """Initialise and run n_steps of one engine, returns the population size after each step"""
+
+    # params
+    rng = np.random.default_rng(seed)
+    population_sizes = []
+
+    if engine == "arrays":
+        state = _init_arrays(counts, grid_size, rng)
+    else:
+        state = _init_objects(counts, grid_size, rng)
+        occupancy = OccupancyGrid(grid_size, [a.x for l in state for a in l], [a.y for l in state for a in l]) if engine == "objects" else None
+
+    for _ in range(n_steps):
+        if engine == "arrays":
+            _step_arrays(state, timings)
+            population_sizes.append(len(state))
+        else:
+            state = _step_objects(state, rng, "brute" if engine == "objects-brute" else "grid", timings, occupancy)
+            population_sizes.append(sum(len(l) for l in state))
+
+    return population_sizes
+
+
+def benchmark_case(engine:str, n_agents:int, grid_size:int, mix:str="default", n_steps:int=5, seed:int=0, memory_steps:int=2) -> dict:
+    """Run n_steps of one engine and measure step throughput and time per phase, then
+    measure peak memory (tracemalloc) on a separate run of memory_steps steps, so that
+    tracing does not slow down the timed run.
+
+    Args:
+        - engine (str) : 'objects-brute', 'objects' or 'arrays'
+        - n_agents (int) : number of agents at initial condition
+        - grid_size (int) : grid_size (assume grid is a square)
+        - mix (str) : species mix, a key of SPECIES_MIX
+        - n_steps (int) : number of steps measured
+        - seed (int) : seed of the random generator
+        - memory_steps (int) : number of steps of the memory run, 0 to skip it
+
+    Returns:
+        - (dict) : case description and measures
+
+    """
+
+    # params
+    counts = _species_counts(n_agents, mix)
+    timings = {phase:0.0 for phase in PHASES}
+
+    # timed run
+    start = time.perf_counter()
+    population_sizes = _run_case(engine, counts, grid_size, n_steps, seed, timings)
+    elapsed = sum(timings.values())
+    setup = time.perf_counter() - start - elapsed
+
+    # memory run
+    peak = 0
+    if memory_steps > 0:
+        tracemalloc.start()
+        _run_case(engine, counts, grid_size, min(n_steps, memory_steps), seed, {phase:0.0 for phase in PHASES})
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        "engine":engine,
+        "n_agents":n_agents,
+        "grid_size":grid_size,
+        "mix":mix,
+        "n_steps":n_steps,
+        "steps_per_second":n_steps / elapsed,
+        "setup_seconds":setup,
+        "phase_seconds":{phase:timings[phase] / n_steps for phase in PHASES},
+        "peak_memory_mb":peak / 2**20,
+        "mean_population":float(np.mean(population_sizes))
+    }
+
+
+def run_benchmarks(output_file:str="benchmark_results.json", agent_counts:tuple=(100, 1000, 10000, 100000, 1000000), grid_sizes:tuple=(200, 2000), mixes:tuple=("default",), engines:tuple=tuple(ENGINES), n_steps:int=5) -> list:
+    """Benchmark every engine over agent counts, grid sizes and species mixes, and save
+    the results as a json baseline. Cases above the max number of agents of an engine
+    (see ENGINES) are skipped.
+
+    Args:
+        - output_file (str) : path to the json file
+        - agent_counts (tuple) : numbers of agents at initial condition
+        - grid_sizes (tuple) : grid sizes
+        - mixes (tuple) : species mixes, keys of SPECIES_MIX
+        - engines (tuple) : engines, keys of ENGINES
+        - n_steps (int) : number of steps measured per case
+
+    Returns:
+        - (list) : results of each case
+
+    """
+
+    # params
+    results = []
+
+    for engine in engines:
+        for n_agents in agent_counts:
+            if n_agents > ENGINES[engine]:
+                continue
+            for grid_size in grid_sizes:
+                for mix in mixes:
+                    result = benchmark_case(engine, n_agents, grid_size, mix, n_steps)
+                    results.append(result)
+                    print(f"[+] {engine:<14} n={n_agents:<8} grid={grid_size:<6} mix={mix:<8} {result['steps_per_second']:10.3f} steps/s {result['peak_memory_mb']:9.1f} MB")
+
+    # save baseline
+    baseline = {
+        "date":datetime.datetime.now().isoformat(),
+        "python":platform.python_version(),
+        "numpy":np.__version__,
+        "machine":platform.platform(),
+        "results":results
+    }
+    with open(output_file, "w") as f:
+        json.dump(baseline, f, indent=2)
+
+    return results
+
+
+def measure_startup(configuration_file:str="ressources/exemple.conf", n_repeats:int=5, job:str="simulation") -> dict:
+    """Measure the fixed cost of a headless job in fresh interpreters: import of
+    the module of the job, parsing of the configuration and whole job (interpreter start
+    to exit, one step of the arrays engine), median over n_repeats jobs
+
+    Args:
+        - configuration_file (str) : path to the configuration file of the job
+        - n_repeats (int) : number of jobs measured
+        - job (str) : job measured, key of STARTUP_JOBS
+
+    Returns:
+        - (dict) : median 'import_seconds', 'configuration_seconds' and 'job_seconds', and
+        'heavy_modules' (modules of HEAVY_MODULES imported by the job)
+
+    """
+
+    # params
+    folder = os.path.dirname(os.path.abspath(__file__))
+    module, call = STARTUP_JOBS[job]
+    script = STARTUP_SCRIPT.format(module=module, call=call)
+    measures = []
+
+    for _ in range(n_repeats):
+        with tempfile.TemporaryDirectory() as output_folder:
+            start = time.perf_counter()
+            process = subprocess.run([sys.executable, "-c", script, os.path.abspath(configuration_file), output_folder] + HEAVY_MODULES, cwd=folder, capture_output=True, text=True, check=True)
+            job = time.perf_counter() - start
+        measures.append({**json.loads(process.stdout.strip().splitlines()[-1]), "job_seconds":job})
+
+    return {
+        **{measure:float(np.median([m[measure] for m in measures])) for measure in STARTUP_BUDGET},
+        "heavy_modules":measures[-1]["heavy_modules"]
+    }
+
+
+def check_startup(configuration_file:str="ressources/exemple.conf", budget:dict=None) -> list:
+    """Measure the startup of every headless job of STARTUP_JOBS (see measure_startup)
+    and report every measure above its budget, and every heavy module imported
+
+    Args:
+        - configuration_file (str) : path to the configuration file of the job
+        - budget (dict) : max seconds of each measure, default to STARTUP_BUDGET
+
+    Returns:
+        - (list) : one dict per overrun, with the job, the measure, its value and its budget
+
+    """
+
+    # params
+    budget = budget or STARTUP_BUDGET
+    overruns = []
+
+    for job in STARTUP_JOBS:
+        startup = measure_startup(configuration_file, job=job)
+        for measure, limit in budget.items():
+            print(f"[+] {job:<10} {measure:<22} {startup[measure]:8.3f} s (budget {limit:.3f} s)")
+            if startup[measure] > limit:
+                overruns.append({"job":job, "measure":measure, "value":startup[measure], "budget":limit})
+                print(f"[!] Startup of the {job} job over budget on {measure} : {startup[measure]:.3f} > {limit:.3f} s")
+        for module in startup["heavy_modules"]:
+            overruns.append({"job":job, "measure":"heavy_modules", "value":module, "budget":None})
+            print(f"[!] Headless {job} job imports {module}")
+
+    return overruns
+
+
+def compare(baseline_file:str, results_file:str, tolerance:float=0.2) -> list:
+    """Compare two benchmark files, report cases whose throughput dropped by more than tolerance
+
+    Args:
+        - baseline_file (str) : path to the reference json file
+        - results_file (str) : path to the new json file
+        - tolerance (float) : accepted relative drop of steps per second
+
+    Returns:
+        - (list) : one dict per regression, with the case and both throughputs
+
+    """
+
+    # params
+    regressions = []
+    with open(baseline_file) as f:
+        baseline = json.load(f)["results"]
+    with open(results_file) as f:
+        results = json.load(f)["results"]
+    key = lambda r: (r["engine"], r["n_agents"], r["grid_size"], r["mix"])
+    reference = {key(r):r for r in baseline}
+
+    for result in results:
+        if key(result) not in reference:
+            continue
+        before = reference[key(result)]["steps_per_second"]
+        after = result["steps_per_second"]
+        if after < (1 - tolerance) * before:
+            regressions.append({"case":key(result), "baseline":before, "current":after})
+            print(f"[!] Regression on {key(result)} : {before:.3f} -> {after:.3f} steps/s")
+
+    return regressions
+
+
+if __name__ == "__main__":
+
+    # python benchmark.py startup [configuration_file]
+    if len(sys.argv) > 1 and sys.argv[1] == "startup":
+        overruns = check_startup(*sys.argv[2:3])
+        sys.exit(1 if overruns else 0)
+
+    # python benchmark.py [output_file] [baseline_file]
+    output_file = sys.argv[1] if len(sys.argv) > 1 else "benchmark_results.json"
+    run_benchmarks(output_file)
+    if len(sys.argv) > 2:
+        compare(sys.argv[2], output_file)
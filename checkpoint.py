@@ -0,0 +1,133 @@
+# load usual dependencies
+import numpy as np
+import os
+import glob
+import json
+import shutil
+
+# load modules
+from population import Population, COLUMNS
+from species import load_species
+from lineage import load_lineage
+
+
+def save_checkpoint(checkpoint_folder:str, step:int, population:Population, metrics, parameters:dict, keep_last:int=2, colors:list=None, fields:dict=None) -> str:
+    """Save the state of a simulation after a given step, as one .npy file per array
+    (can be memory mapped) and a state.json file for the step, the random generator
+    state and the run parameters.
+    The checkpoint is written in a temporary folder then renamed, so a crash during
+    the save never leaves a partial checkpoint.
+
+    Args:
+        - checkpoint_folder (str) : folder containing all checkpoints of the run
+        - step (int) : number of steps done
+        - population (Population) : agents of the simulation, with its random generator
+        and its lineage table (if any)
+        - metrics (MetricsTable) : metrics recorded so far
+        - parameters (dict) : arguments of run_simulation
+        - keep_last (int) : number of checkpoints to keep, older ones are deleted
+        - colors (list) : color of each agent, in the population order, for agent objects
+        whose color is not given by their activation status
+        - fields (dict) : concentration array of each cytokine field, field name as key
+
+    Returns:
+        - (str) : path to the checkpoint
+
+    """
+
+    # params
+    target = f"{checkpoint_folder}/step_{step:08d}"
+    tmp = f"{target}.tmp"
+    if os.path.isdir(tmp):
+        shutil.rmtree(tmp)
+    os.makedirs(tmp)
+
+    # agent arrays & metrics
+    for column in COLUMNS:
+        np.save(f"{tmp}/{column}.npy", getattr(population, column))
+    np.save(f"{tmp}/metrics.npy", metrics.data[:len(metrics)])
+    if colors is not None:
+        np.save(f"{tmp}/colors.npy", np.array(colors, dtype=str))
+    if population.internal is not None:
+        np.save(f"{tmp}/internal.npy", population.internal)
+    if population.lineage is not None:
+        np.save(f"{tmp}/lineage_ids.npy", population.lineage_ids)
+        population.lineage.save(f"{tmp}/lineage.npz")
+    for name, values in (fields or {}).items():
+        np.save(f"{tmp}/field_{name}.npy", values)
+
+    # step, random generator & run parameters
+    state = {
+        "step":step,
+        "rng":population.rng.bit_generator.state,
+        "metrics_columns":metrics.columns,
+        "fields":list(fields or {}),
+        "parameters":parameters
+    }
+    with open(f"{tmp}/state.json", "w") as f:
+        json.dump(state, f)
+
+    # publish checkpoint
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    os.rename(tmp, target)
+
+    # drop old checkpoints
+    for old in list_checkpoints(checkpoint_folder)[:-keep_last]:
+        shutil.rmtree(old)
+
+    return target
+
+
+def list_checkpoints(checkpoint_folder:str) -> list:
+    """Return complete checkpoints of a folder, oldest first"""
+    return sorted(f for f in glob.glob(f"{checkpoint_folder}/step_*") if not f.endswith(".tmp"))
+
+
+def load_checkpoint(checkpoint:str, mmap:bool=False) -> dict:
+    """Load a checkpoint saved by save_checkpoint
+
+    Args:
+        - checkpoint (str) : path to a checkpoint, or to a folder of checkpoints (the last one is used)
+        - mmap (bool) : memory map agent arrays (copy on write) instead of reading them, the
+        population works on the mapped arrays until it grows (see Population.restore)
+
+    Returns:
+        - (dict) : 'step', 'population', 'rng', 'metrics', 'metrics_columns', 'parameters',
+        'colors' (None if not saved), 'fields' (field name as key, concentrations as value)
+        and 'internal' (intracellular states, None if not saved, see Population.set_model),
+        the population carries its lineage table if one was saved
+
+    """
+
+    # pick last checkpoint of a folder
+    if not os.path.isfile(f"{checkpoint}/state.json"):
+        checkpoints = list_checkpoints(checkpoint)
+        if len(checkpoints) == 0:
+            raise FileNotFoundError(f"No checkpoint found in {checkpoint}")
+        checkpoint = checkpoints[-1]
+
+    # state
+    with open(f"{checkpoint}/state.json") as f:
+        state = json.load(f)
+    rng = np.random.default_rng()
+    rng.bit_generator.state = state["rng"]
+
+    # agents
+    population = Population(state["parameters"]["grid_size"], rng, load_species(state["parameters"].get("species_file")))
+    arrays = {column:np.load(f"{checkpoint}/{column}.npy", mmap_mode="c" if mmap else None) for column in COLUMNS}
+    population.restore(arrays)
+    if os.path.isfile(f"{checkpoint}/lineage.npz"):
+        population.track_lineage(load_lineage(f"{checkpoint}/lineage.npz"), np.load(f"{checkpoint}/lineage_ids.npy"))
+
+    return {
+        "step":state["step"],
+        "population":population,
+        "rng":rng,
+        "metrics":np.load(f"{checkpoint}/metrics.npy"),
+        "metrics_columns":state["metrics_columns"],
+        "parameters":state["parameters"],
+        "colors":np.load(f"{checkpoint}/colors.npy").tolist() if os.path.isfile(f"{checkpoint}/colors.npy") else None,
+        "fields":{name:np.load(f"{checkpoint}/field_{name}.npy") for name in state.get("fields", [])},
+        "internal":np.load(f"{checkpoint}/internal.npy") if os.path.isfile(f"{checkpoint}/internal.npy") else None
+    }
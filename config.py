@@ -0,0 +1,97 @@
+# load usual dependencies
+import csv
+
+
+# default of a parameter that must be in the configuration
+REQUIRED = object()
+
+# values accepted for a boolean parameter
+TRUE_VALUES = ["True", "true", "1", "yes"]
+FALSE_VALUES = ["False", "false", "0", "no"]
+
+
+def read_table(table_file:str) -> list:
+    """Read a csv file with a header line (configuration, species, cytokine and interaction
+    files), with the csv module: these files have a few rows and reading them with pandas
+    costs far less than importing pandas
+
+    Args:
+        - table_file (str) : path to the csv file
+
+    Returns:
+        - (list) : one dict per row, column name as key and cell as str value ('' for missing cells)
+
+    """
+    with open(table_file, newline="") as f:
+        return [dict(row) for row in csv.DictReader(f, restval="")]
+
+
+def read_configuration(configuration_file:str) -> dict:
+    """Read a configuration file with the two columns PARAMETER and VALUE
+
+    Args:
+        - configuration_file (str) : path to the configuration file
+
+    Returns:
+        - (dict) : parameter as key and its value as str
+
+    """
+    return {row['PARAMETER']:row['VALUE'] for row in read_table(configuration_file)}
+
+
+def boolean(value:str) -> bool:
+    """Convert a boolean parameter, one of TRUE_VALUES or FALSE_VALUES"""
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(f"expected one of {TRUE_VALUES + FALSE_VALUES}")
+
+
+def choice(values:list):
+    """Return the converter of a parameter taking one of values"""
+    def convert(value:str) -> str:
+        if value not in values:
+            raise ValueError(f"expected one of {values}")
+        return value
+    return convert
+
+
+def int_range(value:str) -> tuple:
+    """Convert a start:stop parameter into a (start, stop) tuple of int"""
+    bounds = tuple(int(v) for v in value.split(":"))
+    if len(bounds) != 2:
+        raise ValueError("expected start:stop")
+    return bounds
+
+
+def typed_configuration(configuration:dict, parameters:dict) -> dict:
+    """Validate and convert the values of a configuration
+
+    Args:
+        - configuration (dict) : parameter as key and its value (str or already converted)
+        - parameters (dict) : parameter as key and a (converter, default) tuple as value, converter
+        is a type (int, float, str) or a function of this module, default is REQUIRED for
+        mandatory parameters. Parameters missing from parameters are ignored.
+
+    Returns:
+        - (dict) : every parameter of parameters with its converted value, or its default when missing
+
+    """
+
+    # params
+    typed = {}
+
+    for parameter, (converter, default) in parameters.items():
+        if parameter not in configuration:
+            if default is REQUIRED:
+                raise ValueError(f"Missing mandatory parameter {parameter} from configuration")
+            typed[parameter] = default
+            continue
+        value = str(configuration[parameter]).strip()
+        try:
+            typed[parameter] = converter(value)
+        except ValueError as error:
+            raise ValueError(f"Invalid value {value} for parameter {parameter} : {error}") from None
+
+    return typed
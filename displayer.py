@@ -1,34 +1,39 @@
 import matplotlib.pyplot as plt
+import matplotlib.colors as mcolors
 import glob
 import imageio.v2 as imageio
-import pandas as pd
+import numpy as np
+import os
+from PIL import Image, GifImagePlugin
+
+# load modules
+from metrics import load_metrics
 
 
 def display_logs(log_folder:str, output_file:str) -> None:
     """Display Metrics present in log_folder
 
     Args:
-        - log_folder (str) : path to the log folder
+        - log_folder (str) : path to the log folder, containing the metrics.npz file
         - output_file (str) : path to save the figure
 
     """
 
     # params
-    file_to_label = {
-        "nb_bcell.csv" : "Bcells (Total)",
-        "nb_tcell.csv": "Tcells",
-        "nb_activated_bcell.csv": "Activated Bcells",
-        "nb_naive_bcell.csv": "Naive Bcells",
-        "nb_total.csv": "Total",
+    column_to_label = {
+        "n_b" : "Bcells (Total)",
+        "n_t": "Tcells",
+        "n_activated_b": "Activated Bcells",
+        "n_naive_b": "Naive Bcells",
+        "n_total": "Total",
     }
 
     # craft figure
+    metrics = load_metrics(f"{log_folder}/metrics.npz")
     plt.figure(figsize=(10, 6))
-    for file in list(file_to_label.keys()):
-        l = file_to_label[file]
-        file = f"{log_folder}/{file}"
-        df = pd.read_csv(file)
-        plt.plot(df["STEP"], df["VALUE"], label=l)
+    for column in list(column_to_label.keys()):
+        l = column_to_label[column]
+        plt.plot(metrics["step"], metrics[column], label=l)
     plt.xlabel("STEP")
     plt.ylabel("VALUE")
     plt.title("Simulation Logs")
@@ -39,7 +44,8 @@ def display_logs(log_folder:str, output_file:str) -> None:
 
 
 def craft_simulation_animation(figure_folder:str, output_file:str) -> None:
-    """Use png images in figire folder to craft a gif
+    """Use png images in figire folder to craft a gif (or a mp4), images are read
+    one at a time in step order and streamed to the animation file
 
     Args:
         - figure_folder (str) : path to the folder with png files
@@ -47,10 +53,146 @@ def craft_simulation_animation(figure_folder:str, output_file:str) -> None:
     
     """
     
-    # load & sort images
-    files = sorted(glob.glob(f"{figure_folder}/step_*.png"))
-    frames = [imageio.imread(img) for img in files]
+    # sort images by step number
+    files = sorted(glob.glob(f"{figure_folder}/step_*.png"), key=lambda f: int(os.path.basename(f)[5:-4]))
 
     # save GIF
-    imageio.mimsave(output_file, frames, duration=0.5)
+    with AnimationWriter(output_file, duration=0.5) as writer:
+        for img in files:
+            writer.append(imageio.imread(img))
+
+
+def save_frame(frame:np.ndarray, output_file:str) -> None:
+    """Save one RGB frame as an image file (png)"""
+    imageio.imwrite(output_file, frame)
+
+
+class AnimationWriter:
+    """Append frames one at a time to an animation file, memory usage does not depend
+    on the number of frames.
+    GIF frames are encoded with pillow on a fixed web palette and written as soon as
+    they are received, other formats (e.g mp4) go through imageio (ffmpeg plugin).
+    """
+
+    def __init__(self, output_file:str, duration:float=0.5):
+        self.output_file = output_file
+        self.duration = duration
+        self.n_frames = 0
+        self.is_gif = output_file.lower().endswith(".gif")
+        if self.is_gif:
+            self.fp = open(output_file, "wb")
+        else:
+            self.writer = imageio.get_writer(output_file, fps=1.0 / duration)
+
+    def append(self, frame:np.ndarray) -> None:
+        """Write one RGB(A) frame at the end of the animation"""
+        if not self.is_gif:
+            self.writer.append_data(frame)
+            self.n_frames += 1
+            return
+
+        image = Image.fromarray(np.asarray(frame)[..., :3]).convert("P", palette=Image.Palette.WEB, dither=Image.Dither.NONE)
+        if self.n_frames == 0:
+            header, _ = GifImagePlugin.getheader(image, info={"loop":0, "duration":int(1000 * self.duration)})
+            for chunk in header:
+                self.fp.write(chunk)
+        for chunk in GifImagePlugin.getdata(image, duration=int(1000 * self.duration)):
+            self.fp.write(chunk)
+        self.n_frames += 1
+
+    def close(self) -> None:
+        if self.is_gif:
+            if not self.fp.closed:
+                self.fp.write(b";")
+                self.fp.close()
+        else:
+            self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class FrameRenderer:
+    """Render simulation frames without creating a new figure at each step.
+    mode 'raster' draws each agent straight into a numpy RGB image (one block of
+    scale x scale pixels per site), mode 'scatter' updates one scatter per species
+    on a figure created once and reused.
+    Agents are given as groups (one per species) of (x, y, colors), colors is either
+    one color per agent, an (n, 3) uint8 RGB array or a single color for the whole group.
+    """
+
+    def __init__(self, grid_size:int, mode:str="scatter", scale:int=None, figsize:tuple=(5, 5)):
+        self.grid_size = grid_size
+        self.mode = mode
+        self.scale = scale if scale is not None else max(1, 500 // grid_size)
+        self.figsize = figsize
+        self.figure = None
+        self.collections = []
+        self.rgb = {}
+
+    def _to_rgb(self, colors) -> np.ndarray:
+        """Convert a list of color names (or a single name) to an (n, 3) uint8 array, names are cached"""
+        if isinstance(colors, str):
+            colors = [colors]
+        if np.ndim(colors) == 2:
+            return np.asarray(colors, dtype=np.uint8)
+        rgb = []
+        for color in colors:
+            if color not in self.rgb:
+                self.rgb[color] = [int(255 * c) for c in mcolors.to_rgb(color)]
+            rgb.append(self.rgb[color])
+        return np.array(rgb, dtype=np.uint8).reshape(-1, 3)
+
+    def _draw_raster(self, groups:list) -> np.ndarray:
+        image = np.full((self.grid_size, self.grid_size, 3), 255, dtype=np.uint8)
+        for x, y, colors in groups:
+            if len(x) == 0:
+                continue
+            x = np.clip(np.asarray(x), 0, self.grid_size - 1)
+            y = np.clip(np.asarray(y), 0, self.grid_size - 1)
+            image[self.grid_size - 1 - y, x] = self._to_rgb(colors)
+        return image.repeat(self.scale, axis=0).repeat(self.scale, axis=1)
+
+    def _draw_scatter(self, groups:list) -> np.ndarray:
+        if self.figure is None:
+            self.figure = plt.figure(figsize=self.figsize)
+            ax = self.figure.add_subplot()
+            ax.set_xlim(0, self.grid_size)
+            ax.set_ylim(0, self.grid_size)
+            self.collections = [ax.scatter([], []) for _ in groups]
+        for collection, (x, y, colors) in zip(self.collections, groups):
+            collection.set_offsets(np.column_stack([x, y]).reshape(-1, 2))
+            if np.ndim(colors) == 2:
+                collection.set_facecolors(np.asarray(colors, dtype=np.float64).reshape(-1, 3) / 255)
+            else:
+                collection.set_facecolors(colors if isinstance(colors, str) else list(colors))
+        self.figure.canvas.draw()
+        return np.asarray(self.figure.canvas.buffer_rgba())[..., :3].copy()
+
+    def draw(self, groups:list) -> np.ndarray:
+        """Draw one frame
+
+        Args:
+            - groups (list) : one (x, y, colors) tuple per species
+
+        Returns:
+            - (np.ndarray) : RGB image of the frame
+
+        """
+        if self.mode == "raster":
+            return self._draw_raster(groups)
+        return self._draw_scatter(groups)
+
+    def save(self, groups:list, output_file:str) -> np.ndarray:
+        """Draw one frame and save it as an image, returns the frame"""
+        frame = self.draw(groups)
+        save_frame(frame, output_file)
+        return frame
 
+    def close(self) -> None:
+        if self.figure is not None:
+            plt.close(self.figure)
+            self.figure = None
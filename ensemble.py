@@ -0,0 +1,257 @@
+# load usual dependencies
+import numpy as np
+import statistics
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# load modules
+import simple_run
+import config
+from metrics import load_metrics
+from sweep import run_replicate
+
+
+# converter and default of each ensemble parameter of an ensemble configuration file, see config.typed_configuration
+ENSEMBLE_PARAMETERS = {
+    "targets":(str, "n_activated_b/n_naive_b;density"),
+    "precision":(float, 0.05),
+    "absolute_precision":(float, 0.0),
+    "confidence":(float, 0.95),
+    "batch_size":(int, 0),
+    "min_replicates":(int, 10),
+    "max_replicates":(int, 200),
+    "ensemble_workers":(int, 0),
+    "seed":(int, None)
+}
+
+
+class RunningStatistics:
+    """Streaming mean and variance of several metrics, merged one batch of values at a
+    time (Chan et al. pairwise update of Welford's algorithm) so that no run value has
+    to be kept. Non finite values (e.g a ratio with a null denominator) are left out of
+    the metric they belong to.
+    """
+
+    def __init__(self, metrics:list):
+        self.metrics = list(metrics)
+        self.count = np.zeros(len(self.metrics), dtype=np.int64)
+        self.mean = np.zeros(len(self.metrics), dtype=np.float64)
+        self.m2 = np.zeros(len(self.metrics), dtype=np.float64)
+
+    def update(self, values) -> None:
+        """Merge a batch of values
+
+        Args:
+            - values (array) : (n_runs, n_metrics) value of each metric for each run of the batch
+
+        """
+
+        # statistics of the batch
+        values = np.asarray(values, dtype=np.float64).reshape(-1, len(self.metrics))
+        finite = np.isfinite(values)
+        n = finite.sum(axis=0)
+        batch_mean = np.where(finite, values, 0).sum(axis=0) / np.maximum(n, 1)
+        batch_m2 = (np.where(finite, values - batch_mean, 0) ** 2).sum(axis=0)
+
+        # merge with the previous batches
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.mean = self.mean + delta * n / np.maximum(total, 1)
+        self.m2 = self.m2 + batch_m2 + delta * delta * self.count * n / np.maximum(total, 1)
+        self.count = total
+
+    def variance(self) -> np.ndarray:
+        """Return the sample variance of each metric, nan below two values"""
+        return np.where(self.count > 1, self.m2 / np.maximum(self.count - 1, 1), np.nan)
+
+    def half_width(self, confidence:float) -> np.ndarray:
+        """Return the half width of the confidence interval of the mean of each metric
+        (normal approximation), nan below two values
+
+        Args:
+            - confidence (float) : confidence level of the interval, e.g 0.95
+
+        Returns:
+            - (np.ndarray) : half width of the interval of each metric
+
+        """
+        z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+        return z * np.sqrt(self.variance() / np.maximum(self.count, 1))
+
+
+def target_value(metrics:dict, target:str) -> float:
+    """Value of a target metric at the last step of a run, a target is a metrics column
+    (e.g density) or the ratio of two columns (e.g n_activated_b/n_naive_b, nan when the
+    denominator is null)
+
+    Args:
+        - metrics (dict) : metrics of the run, as returned by metrics.load_metrics
+        - target (str) : target metric
+
+    Returns:
+        - (float) : value of the target at the last step
+
+    """
+    if "/" in target:
+        numerator, denominator = [metrics[column][-1] for column in target.split("/")]
+        return float(numerator / denominator) if denominator != 0 else np.nan
+    return float(metrics[target][-1])
+
+
+def run_ensemble(configuration:dict, targets:list, output_folder:str, precision:float=0.05, absolute_precision:float=0.0, confidence:float=0.95, batch_size:int=None, min_replicates:int=10, max_replicates:int=200, seed:int=None, n_workers:int=None) -> dict:
+    """Run replicates of one configuration in batches over a pool of processes, until the
+    mean of every target is known with the requested precision or max_replicates runs
+    are done. After each batch the running mean and confidence interval of each target
+    (see target_value) are updated, a target has converged when it has at least
+    min_replicates values and the half width of its interval is below
+    max(absolute_precision, precision * |mean|).
+    Each run gets its own random stream (spawned from the root seed, as run_sweep does) and
+    its own output folder, output_folder/replicate_<j>. Runs are headless unless frame_every is set.
+
+    Args:
+        - configuration (dict) : configuration dict (PARAMETER as key), output_folder is ignored
+        - targets (list) : target metrics, see target_value
+        - output_folder (str) : path to the ensemble output folder
+        - precision (float) : target half width of the confidence interval, relative to the mean
+        - absolute_precision (float) : target half width of the confidence interval, for means close to 0
+        - confidence (float) : confidence level of the intervals
+        - batch_size (int) : number of runs launched between two checks, default to the number of workers
+        - min_replicates (int) : number of values of a target before it can converge
+        - max_replicates (int) : budget, max number of runs
+        - seed (int) : root seed of the ensemble, fresh seed if not provided
+        - n_workers (int) : number of processes, default to the number of cores
+
+    Returns:
+        - (dict) : 'n_runs' (number of runs used), 'converged' (bool), 'estimates' (pd.DataFrame,
+        one row per target with its mean, half width and number of values) and 'history'
+        (pd.DataFrame, estimates after each batch, also saved as output_folder/ensemble_history.csv)
+
+    """
+
+    # params
+    os.makedirs(output_folder, exist_ok=True)
+    root_seed = np.random.SeedSequence(seed)
+    batch_size = batch_size or n_workers or os.cpu_count()
+    running = RunningStatistics(targets)
+    run_list = []
+    history = []
+    converged = False
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        while len(run_list) < max_replicates and not converged:
+
+            # one independent seed & folder per run of the batch
+            runs = []
+            for child_seed in root_seed.spawn(min(batch_size, max_replicates - len(run_list))):
+                run_configuration = dict(configuration)
+                run_configuration.setdefault('frame_every', 0)
+                run_configuration['output_folder'] = f"{output_folder}/replicate_{len(run_list) + len(runs):04d}"
+                arguments = simple_run.simulation_arguments(run_configuration)
+                arguments['seed'] = int.from_bytes(child_seed.generate_state(4).tobytes(), "little")
+                runs.append(arguments)
+
+            # run batch & merge its values
+            values = []
+            for folder in executor.map(run_replicate, runs):
+                metrics = load_metrics(f"{folder}/logs/metrics.npz")
+                values.append([target_value(metrics, target) for target in targets])
+            running.update(values)
+            for arguments, run_values in zip(runs, values):
+                run_list.append({"REPLICATE":len(run_list), "SEED":str(arguments['seed']), "FOLDER":arguments['output_folder'], **dict(zip(targets, run_values))})
+
+            # check precision
+            half_width = running.half_width(confidence)
+            tolerance = np.maximum(absolute_precision, precision * np.abs(running.mean))
+            converged = bool(np.all((running.count >= min_replicates) & (half_width <= tolerance)))
+            for target_id, target in enumerate(targets):
+                history.append({"n_runs":len(run_list), "target":target, "mean":running.mean[target_id], "half_width":half_width[target_id], "n_values":running.count[target_id], "converged":converged})
+
+    # save runs & history (pandas is only loaded by the driver, not by the workers)
+    import pandas as pd
+    pd.DataFrame(run_list).to_csv(f"{output_folder}/ensemble_runs.csv", index=False)
+    history = pd.DataFrame(history)
+    history.to_csv(f"{output_folder}/ensemble_history.csv", index=False)
+
+    return {
+        "n_runs":len(run_list),
+        "converged":converged,
+        "estimates":history[history["n_runs"] == len(run_list)].drop(columns=["n_runs", "converged"]).reset_index(drop=True),
+        "history":history
+    }
+
+
+def parse_ensemble_configuration(configuration_file:str) -> dict:
+    """Parse an ensemble configuration file, a simulation configuration file with the
+    extra parameters (see run_ensemble):
+        - targets (target metrics separated by ';', default to n_activated_b/n_naive_b;density)
+        - precision (float, default to 0.05)
+        - absolute_precision (float, default to 0)
+        - confidence (float, default to 0.95)
+        - batch_size (int, default to the number of workers)
+        - min_replicates (int, default to 10)
+        - max_replicates (int, default to 200)
+        - ensemble_workers (int, number of processes, default to the number of cores, n_workers
+        stays a simulation parameter of the parallel engine)
+        - seed (int, root seed of the ensemble, fresh seed if missing)
+
+    Args:
+        - configuration_file (str) : path to the ensemble configuration file
+
+    Returns:
+        - (dict) : 'valid', 'configuration' (simulation configuration dict), 'output_folder',
+        'seed' and the ensemble parameters
+
+    """
+
+    # load & check configuration
+    configuration = simple_run.parse_configuration(configuration_file)
+    ensemble = {"valid":configuration.pop('valid')}
+    if not ensemble['valid']:
+        return ensemble
+
+    # ensemble parameters
+    ensemble.update(config.typed_configuration(configuration, ENSEMBLE_PARAMETERS))
+    ensemble['targets'] = ensemble['targets'].split(";")
+    for parameter in ENSEMBLE_PARAMETERS:
+        configuration.pop(parameter, None)
+    ensemble['output_folder'] = str(configuration['output_folder'])
+    ensemble['configuration'] = configuration
+
+    return ensemble
+
+
+def run(configuration_file:str) -> None:
+    """Run the ensemble described by an ensemble configuration file and report its estimates
+
+    Args:
+        configuration_file (str) : path to the ensemble configuration file
+
+    """
+
+    # parse configuration
+    ensemble = parse_ensemble_configuration(configuration_file)
+
+    # check config validity
+    if ensemble['valid']:
+        result = run_ensemble(
+            ensemble['configuration'],
+            ensemble['targets'],
+            ensemble['output_folder'],
+            precision=ensemble['precision'],
+            absolute_precision=ensemble['absolute_precision'],
+            confidence=ensemble['confidence'],
+            batch_size=ensemble['batch_size'] or None,
+            min_replicates=ensemble['min_replicates'],
+            max_replicates=ensemble['max_replicates'],
+            seed=ensemble['seed'],
+            n_workers=ensemble['ensemble_workers'] or None
+        )
+        status = "converged" if result['converged'] else "budget reached"
+        print(f"[+] {status} after {result['n_runs']} runs")
+        print(result['estimates'].to_string(index=False))
+
+
+if __name__ == "__main__":
+
+    run(sys.argv[1])
@@ -4,22 +4,39 @@ import numpy as np
 import math
 import os
 import random
-import pandas as pd
 import glob
 
-def detect_interaction(b_agent_list:list, t_agent_list:list) -> None:
+# load modules
+from spatial import CellIndex, OccupancyGrid
+from intracellular import bcell_inputs
+from interactions import evaluate_interactions
+from species import activate_agent
+
+def detect_interaction(b_agent_list:list, t_agent_list:list, method:str="grid") -> None:
     """Detect interaction between Bcells and Tcells, switch activation for Bcells
     if a Tcells is nearby.
 
     Args:
         b_agent_list (list) : list of Bcell object
         t_agent_list (list) : list of Tcell object
+        method (str) : 'grid' to search contacts with a spatial index built on the
+        Tcells, 'brute' to compare every Bcell with every Tcell (kept for validation)
     
     """
 
     # params
     interaction_treshold = 2
 
+    # indexed search
+    if method == "grid":
+        if len(b_agent_list) == 0 or len(t_agent_list) == 0:
+            return
+        t_index = CellIndex([t.x for t in t_agent_list], [t.y for t in t_agent_list], interaction_treshold)
+        contact = t_index.has_neighbour([b.x for b in b_agent_list], [b.y for b in b_agent_list], interaction_treshold)
+        for b_position in np.flatnonzero(contact):
+            b_agent_list[b_position].activate()
+        return
+
     # loop over agent    
     for b_agent in b_agent_list:
         for t_agent in t_agent_list:
@@ -32,11 +49,117 @@ def detect_interaction(b_agent_list:list, t_agent_list:list) -> None:
                 b_agent.activate()
 
 
-def drop_old_cell(agent_list_list:list) -> list:
+def apply_interactions(agent_list_list:list, rules:list, occupancy:OccupancyGrid=None) -> list:
+    """Apply the pairwise interaction rules to every agent (see interactions.evaluate_interactions),
+    activated agents are switched on (turning red) and dead agents removed
+
+    Args:
+        - agent_list_list (list) : list of list of agents, one list per species of the registry
+        - rules (list) : rules returned by interactions.load_interactions
+        - occupancy (OccupancyGrid) : occupancy grid of the agents, dead agents are unregistered
+
+    Returns:
+        - (list) : list of list of surviving agents
+
+    """
+
+    # params
+    agents = [agent for agent_list in agent_list_list for agent in agent_list]
+    species = np.repeat(np.arange(len(agent_list_list)), [len(agent_list) for agent_list in agent_list_list])
+    was_activated = np.array([getattr(a, "activated", False) for a in agents], dtype=bool)
+    activated, alive = evaluate_interactions(rules, [a.x for a in agents], [a.y for a in agents], species, was_activated)
+
+    # switch on newly activated agents
+    for position in np.flatnonzero(activated & ~was_activated):
+        activate_agent(agents[position])
+
+    # drop dead agents
+    if alive.all():
+        return agent_list_list
+    if occupancy is not None:
+        occupancy.remove([agents[p].x for p in np.flatnonzero(~alive)], [agents[p].y for p in np.flatnonzero(~alive)])
+    bounds = np.cumsum([0] + [len(agent_list) for agent_list in agent_list_list])
+    return [[agent for agent, keep in zip(agent_list, alive[bounds[k]:bounds[k + 1]]) if keep] for k, agent_list in enumerate(agent_list_list)]
+
+
+def update_internal(b_agent_list:list, t_agent_list:list, model, fields:list=None) -> None:
+    """Integrate the intracellular model of every Bcell over one step, in one batch,
+    then activate Bcells whose model says so. The state of each Bcell is kept in its
+    internal attribute, and its division_ready attribute is set from the model.
+
+    Args:
+        - b_agent_list (list) : list of Bcell object
+        - t_agent_list (list) : list of Tcell object
+        - model (BCellModel) : intracellular model, see intracellular.BCellModel
+        - fields (list) : cytokine fields, see fields.load_fields
+
+    """
+
+    # params
+    if len(b_agent_list) == 0:
+        return
+    initial = model.initial_state(1)[0]
+    state = np.array([b.internal if getattr(b, "internal", None) is not None else initial for b in b_agent_list], dtype=np.float64)
+
+    # batched integration
+    inputs = bcell_inputs([b.x for b in b_agent_list], [b.y for b in b_agent_list], [t.x for t in t_agent_list], [t.y for t in t_agent_list], fields)
+    state = model.integrate(state, inputs)
+    activated = model.activated(state)
+    ready = model.ready_for_division(state)
+
+    # update agents
+    for position, b_agent in enumerate(b_agent_list):
+        b_agent.internal = state[position]
+        b_agent.division_ready = bool(ready[position])
+        if activated[position]:
+            b_agent.activate()
+
+
+def _divide_internal(agent, new_agent, model) -> None:
+    """Reset the intracellular state of a dividing agent, the daughter gets a copy"""
+    if model is not None and getattr(agent, "internal", None) is not None:
+        agent.internal = model.after_division(agent.internal[None, :])[0]
+        agent.division_ready = False
+        new_agent.internal = agent.internal.copy()
+        new_agent.division_ready = False
+
+
+def register_founders(agent_list_list:list, lineage) -> None:
+    """Register every agent as the founder of its clone in a lineage table, and set its
+    lineage_id attribute (see lineage.LineageTable)
+
+    Args:
+        - agent_list_list (list) : list of list of agents, in the registry order
+        - lineage (LineageTable) : table receiving the births
+
+    """
+    for species_id, agent_list in enumerate(agent_list_list):
+        for agent, lineage_id in zip(agent_list, lineage.register(np.full(len(agent_list), -1), species_id).tolist()):
+            agent.lineage_id = lineage_id
+
+
+def _register_daughters(daughters:list, lineage) -> None:
+    """Register the daughters born by division in a lineage table, in one batch
+
+    Args:
+        - daughters (list) : (species id, mother, daughter) of each division
+        - lineage (LineageTable) : table receiving the births, nothing is done if None
+
+    """
+    if lineage is None or len(daughters) == 0:
+        return
+    species = [species_id for species_id, _, _ in daughters]
+    parents = [agent.lineage_id for _, agent, _ in daughters]
+    for (_, _, new_agent), lineage_id in zip(daughters, lineage.register(parents, species).tolist()):
+        new_agent.lineage_id = lineage_id
+
+
+def drop_old_cell(agent_list_list:list, occupancy:OccupancyGrid=None) -> list:
     """Drop cells that exceed their lifespan
 
     Args:
         - agent_list_list (list) : list of list of agents, e.g [b_agents, t_agents]
+        - occupancy (OccupancyGrid) : occupancy grid of the agents, dropped agents are unregistered
 
     Returns:
         - (list) : updated list of agent list 
@@ -45,6 +168,7 @@ def drop_old_cell(agent_list_list:list) -> list:
 
     # params
     updated_list = []
+    dead = []
 
     # look for old agents
     for agent_list in agent_list_list:
@@ -52,34 +176,79 @@ def drop_old_cell(agent_list_list:list) -> list:
         for agent in agent_list:
             if agent.age <= agent.life_span:
                 agent_list_updated.append(agent)
+            else:
+                dead.append(agent)
         updated_list.append(agent_list_updated)
 
+    if occupancy is not None and len(dead) > 0:
+        occupancy.remove([agent.x for agent in dead], [agent.y for agent in dead])
+
     return updated_list
 
+
+def move_agents(agent_list_list:list, rng:np.random.Generator, occupancy:OccupancyGrid=None) -> None:
+    """Random move & aging of every agent, in a single pass over every species. All
+    displacements are drawn in one batch from the generator of the simulation.
+
+    Args:
+        - agent_list_list (list) : list of list of agents, e.g [b_agents, t_agents]
+        - rng (np.random.Generator) : random generator of the simulation
+        - occupancy (OccupancyGrid) : occupancy grid of the agents, updated with the moves
+
+    """
+    agents = [agent for agent_list in agent_list_list for agent in agent_list]
+    if occupancy is not None:
+        old_x, old_y = [agent.x for agent in agents], [agent.y for agent in agents]
+    for agent, (dx, dy) in zip(agents, rng.integers(-1, 2, size=(len(agents), 2)).tolist()):
+        agent.move(dx, dy)
+        agent.get_older()
+    if occupancy is not None:
+        occupancy.move(old_x, old_y, [agent.x for agent in agents], [agent.y for agent in agents])
+
             
-def look_for_division(agent_list_list:list) -> list:
+def look_for_division(agent_list_list:list, method:str="grid", divides:list=None, model=None, lineage=None, occupancy:OccupancyGrid=None) -> list:
     """Look for cells in conditions for a cell division (basically check empty space around)
     and activate division
 
     Args:
         - agent_list_list (list) : list of list of agents, e.g [b_agents, t_agents]
+        - method (str) : 'grid' to check free space with an occupancy grid and place the
+        daughter cell on a free neighbouring site, 'brute' to compare every agent with
+        every agent and place the daughter cell at x+1 (kept for validation)
+        - divides (list) : one bool per agent list, False for species that never divide
+        (division rule 'none' of the species registry), every species divides if not provided
+        - model (BCellModel) : intracellular model, agents with a division_ready attribute
+        only divide when it is True, and their internal state is updated on division
+        - lineage (LineageTable) : table receiving the births, daughters get their lineage_id
+        attribute (agents must have one, see register_founders)
+        - occupancy (OccupancyGrid) : occupancy grid of the agents kept along the simulation,
+        daughters are registered on it. The 'grid' method builds one from the agents if not provided
 
     Returns:
         - (list) : updated list of agent list 
 
     """
 
+    # params
+    if divides is None:
+        divides = [True] * len(agent_list_list)
+
+    # occupancy based division
+    if method == "grid":
+        return _look_for_division_grid(agent_list_list, divides, model, lineage, occupancy)
+
     # params
     treshold = 2
     updated_list = []
+    daughters = []
 
-    for agent_list in agent_list_list:
+    for species_id, (agent_list, species_divides) in enumerate(zip(agent_list_list, divides)):
         agent_list_updated = []
         for agent in agent_list:
-            ready_for_division = True
+            ready_for_division = species_divides and getattr(agent, "division_ready", True)
 
             # check other agent cell
-            for agent_list_to_check in agent_list_list:
+            for agent_list_to_check in agent_list_list if ready_for_division else []:
                 for agent_to_check in agent_list_to_check:
                     dist = math.sqrt((agent.x - agent_to_check.x)**2 + (agent.y - agent_to_check.y)**2)
                     if agent != agent_to_check and dist  <= treshold:
@@ -92,19 +261,71 @@ def look_for_division(agent_list_list:list) -> list:
             # cell division
             if ready_for_division:
                 new_agent = agent.cell_division()
+                _divide_internal(agent, new_agent, model)
                 agent_list_updated.append(new_agent)
+                daughters.append((species_id, agent, new_agent))
 
         # update list of list
         updated_list.append(agent_list_updated)
+
+    if occupancy is not None and len(daughters) > 0:
+        occupancy.add([new_agent.x for _, _, new_agent in daughters], [new_agent.y for _, _, new_agent in daughters])
+    _register_daughters(daughters, lineage)
             
     return updated_list
 
 
-def init_random_age(agent_list_list:list) -> list:
+def _look_for_division_grid(agent_list_list:list, divides:list, model, lineage=None, occupancy:OccupancyGrid=None) -> list:
+    """Occupancy grid version of look_for_division, see look_for_division"""
+
+    # params
+    treshold = 2
+    agents = [agent for agent_list in agent_list_list for agent in agent_list]
+    if len(agents) == 0:
+        return [list(agent_list) for agent_list in agent_list_list]
+
+    # occupancy grid of the simulation, filled from the agents when there is none
+    x = [agent.x for agent in agents]
+    y = [agent.y for agent in agents]
+    if occupancy is None:
+        occupancy = OccupancyGrid(agents[0].grid_size, x, y)
+
+    # only the agent itself in its neighbourhood
+    species_divides = np.repeat(divides, [len(agent_list) for agent_list in agent_list_list]).astype(bool)
+    division_ready = np.array([getattr(agent, "division_ready", True) for agent in agents], dtype=bool)
+    ready_for_division = (occupancy.neighbour_count(x, y, treshold) == 1) & species_divides & division_ready
+    parents = np.flatnonzero(ready_for_division)
+    site_x, site_y, placed = occupancy.claim_daughter_sites(np.asarray(x)[parents], np.asarray(y)[parents])
+    daughter_sites = {int(p):(int(sx), int(sy)) for p, sx, sy, ok in zip(parents, site_x, site_y, placed) if ok}
+
+    # cell division
+    updated_list = []
+    daughters = []
+    position = 0
+    for species_id, agent_list in enumerate(agent_list_list):
+        agent_list_updated = []
+        for agent in agent_list:
+            agent_list_updated.append(agent)
+            if position in daughter_sites:
+                new_agent = agent.cell_division()
+                new_agent.x, new_agent.y = daughter_sites[position]
+                _divide_internal(agent, new_agent, model)
+                agent_list_updated.append(new_agent)
+                daughters.append((species_id, agent, new_agent))
+            position += 1
+        updated_list.append(agent_list_updated)
+    _register_daughters(daughters, lineage)
+
+    return updated_list
+
+
+def init_random_age(agent_list_list:list, rng:np.random.Generator=None) -> list:
     """assign a random age to cells, used at the begining of the simulation
     
     Args:
         - agent_list_list (list) : list of list of agents, e.g [b_agents, t_agents]
+        - rng (np.random.Generator) : random generator of the simulation, all ages are
+        drawn in one batch from it if provided
 
     Returns:
         - (list) : updated list of agent list 
@@ -114,13 +335,21 @@ def init_random_age(agent_list_list:list) -> list:
     # params
     updated_list = []
 
+    # draw all ages at once
+    if rng is not None:
+        life_spans = np.array([agent.life_span for agent_list in agent_list_list for agent in agent_list], dtype=np.int64)
+        ages = iter(rng.integers(0, life_spans + 1).tolist())
+
     # deal with Bcells
     for agent_list in agent_list_list:
 
         # set random age
         agent_list_updated = []
         for agent in agent_list:
-            agent.age = random.randint(0, agent.life_span)
+            if rng is not None:
+                agent.age = next(ages)
+            else:
+                agent.age = random.randint(0, agent.life_span)
             agent_list_updated.append(agent)
 
         # update list of agent list
@@ -0,0 +1,140 @@
+# load usual dependencies
+import numpy as np
+import math
+
+# load modules
+from config import read_table
+
+
+class CytokineField:
+    """Concentration of one soluble factor (cytokine) on the simulation grid.
+    Agents secrete into the field and sample it by position, each operation is one
+    numpy call whatever the number of agents. Diffusion and decay are solved on the
+    whole grid at once, either with an explicit 5 points stencil (zero flux borders,
+    sub-stepped to stay stable) or with an FFT (exact in time, periodic borders).
+    """
+
+    def __init__(self, name:str, grid_size:int, diffusion:float, decay:float, method:str="stencil"):
+        self.name = name
+        self.grid_size = grid_size
+        self.diffusion = diffusion
+        self.decay = decay
+        self.method = method
+        self.values = np.zeros((grid_size, grid_size), dtype=np.float64)
+        self._kernel = None
+
+    def secrete(self, x, y, amount) -> None:
+        """Add amount at each (x, y) position, several agents on a site add up
+
+        Args:
+            - x (array) : x coordinates of the secreting agents
+            - y (array) : y coordinates of the secreting agents
+            - amount (float or array) : quantity secreted by each agent
+
+        """
+        x = np.asarray(x, dtype=np.int64)
+        y = np.asarray(y, dtype=np.int64)
+        weights = np.broadcast_to(np.asarray(amount, dtype=np.float64), x.shape)
+        self.values += np.bincount(x * self.grid_size + y, weights, minlength=self.grid_size * self.grid_size).reshape(self.grid_size, self.grid_size)
+
+    def sample(self, x, y) -> np.ndarray:
+        """Return the concentration at each (x, y) position"""
+        return self.values[np.asarray(x, dtype=np.int64), np.asarray(y, dtype=np.int64)]
+
+    def step(self, dt:float=1.0) -> None:
+        """Diffuse and decay the field over dt
+
+        Args:
+            - dt (float) : duration, in simulation steps
+
+        """
+        if self.method == "fft":
+            self._step_fft(dt)
+        else:
+            self._step_stencil(dt)
+
+    def _step_stencil(self, dt:float) -> None:
+        """Explicit scheme, sub-steps keep diffusion * sub_dt <= 1/5 (below the 1/4 stability
+        limit of the 2D stencil, where the scheme stops smoothing checkerboard modes)"""
+
+        # params
+        n_substeps = max(1, math.ceil(5 * self.diffusion * dt))
+        sub_dt = dt / n_substeps
+        alpha = self.diffusion * sub_dt
+        decay = math.exp(-self.decay * sub_dt)
+        padded = np.empty((self.grid_size + 2, self.grid_size + 2), dtype=np.float64)
+
+        for _ in range(n_substeps):
+
+            # zero flux borders, ghost cells copy the border values
+            padded[1:-1, 1:-1] = self.values
+            padded[0, 1:-1] = self.values[0]
+            padded[-1, 1:-1] = self.values[-1]
+            padded[1:-1, 0] = self.values[:, 0]
+            padded[1:-1, -1] = self.values[:, -1]
+
+            # laplacian & decay
+            laplacian = padded[:-2, 1:-1] + padded[2:, 1:-1] + padded[1:-1, :-2] + padded[1:-1, 2:] - 4 * self.values
+            self.values = (self.values + alpha * laplacian) * decay
+
+    def _step_fft(self, dt:float) -> None:
+        """Exact solution of the periodic diffusion / decay equation over dt"""
+        if self._kernel is None or self._kernel[0] != dt:
+            k = 2 * np.pi * np.fft.fftfreq(self.grid_size)
+            k2 = (2 - 2 * np.cos(k))[:, None] + (2 - 2 * np.cos(k))[None, :]
+            self._kernel = (dt, np.exp(-(self.diffusion * k2 + self.decay) * dt))
+        self.values = np.fft.irfft2(np.fft.rfft2(self.values) * self._kernel[1][:, :self.grid_size // 2 + 1], s=self.values.shape)
+
+    def total(self) -> float:
+        """Return the quantity of cytokine on the whole grid"""
+        return float(self.values.sum())
+
+
+def load_fields(cytokine_file:str, grid_size:int, registry:list) -> list:
+    """Load the cytokine fields of a simulation from a csv file with the columns name,
+    diffusion, decay, secreted_by (species names of the registry, separated by ';'),
+    secretion_rate and method ('stencil' or 'fft')
+
+    Args:
+        - cytokine_file (str) : path to the cytokine file
+        - grid_size (int) : grid_size (assume grid is a square)
+        - registry (list) : species registry, see species.load_species
+
+    Returns:
+        - (list) : one dict per cytokine with 'field' (CytokineField), 'secreted_by'
+        (list of species ids) and 'secretion_rate'
+
+    """
+
+    # params
+    fields = []
+    species_ids = {species["name"]:species_id for species_id, species in enumerate(registry)}
+
+    for row in read_table(cytokine_file):
+        secreted_by = [s for s in row['secreted_by'].split(";") if s != ""]
+        for species_name in secreted_by:
+            if species_name not in species_ids:
+                raise ValueError(f"Unknown species {species_name} secreting {row['name']}")
+        fields.append({
+            "field":CytokineField(row['name'], grid_size, float(row['diffusion']), float(row['decay']), row.get('method', 'stencil') or 'stencil'),
+            "secreted_by":[species_ids[s] for s in secreted_by],
+            "secretion_rate":float(row['secretion_rate'])
+        })
+
+    return fields
+
+
+def update_fields(fields:list, x, y, species) -> None:
+    """Secretion by every agent then diffusion & decay of each field, for one step
+
+    Args:
+        - fields (list) : fields returned by load_fields
+        - x (array) : x coordinates of every agent
+        - y (array) : y coordinates of every agent
+        - species (array) : species id of every agent
+
+    """
+    for cytokine in fields:
+        secreting = np.isin(species, cytokine["secreted_by"])
+        cytokine["field"].secrete(x[secreting], y[secreting], cytokine["secretion_rate"])
+        cytokine["field"].step()
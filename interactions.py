@@ -0,0 +1,130 @@
+# load usual dependencies
+import numpy as np
+
+# load modules
+from spatial import CellIndex
+from config import read_table
+
+
+# effect of a rule on the target (and source) agents
+INTERACTION_EFFECTS = ["activate", "kill", "phagocytose", "present"]
+
+
+def load_interactions(interaction_file:str, registry:list) -> list:
+    """Load the pairwise interaction rules of a simulation from a csv file with the
+    columns source, target (species names of the registry), radius and effect:
+        - activate : a target with a source closer than radius is activated
+        - kill : a target with a source closer than radius dies
+        - phagocytose : each source engulfs its nearest target closer than radius (one per
+        step), the target dies and the source is activated (it carries the antigen)
+        - present : a target with an activated source closer than radius is activated
+
+    Args:
+        - interaction_file (str) : path to the interaction file
+        - registry (list) : species registry, see species.load_species
+
+    Returns:
+        - (list) : one dict per rule with 'source', 'target' (species ids), 'radius' and 'effect'
+
+    """
+
+    # params
+    rules = []
+    species_ids = {species["name"]:species_id for species_id, species in enumerate(registry)}
+
+    for index, row in enumerate(read_table(interaction_file)):
+        for species_name in [row['source'], row['target']]:
+            if species_name not in species_ids:
+                raise ValueError(f"Unknown species {species_name} in interaction rule {index}")
+        if row['effect'] not in INTERACTION_EFFECTS:
+            raise ValueError(f"Unknown effect {row['effect']} in interaction rule {index}, expected one of {INTERACTION_EFFECTS}")
+        rules.append({
+            "source":species_ids[row['source']],
+            "target":species_ids[row['target']],
+            "radius":float(row['radius']),
+            "effect":row['effect']
+        })
+
+    return rules
+
+
+def evaluate_interactions(rules:list, x, y, species, activated):
+    """Evaluate every rule for every agent with a single neighbour search: pairs of
+    agents closer than the largest radius are found once, then each rule keeps the pairs
+    of its species within its radius.
+    Rules are applied simultaneously, on the state at the beginning of the step, so the
+    result does not depend on the order of the rules or of the agents:
+        - an agent killed or engulfed still acts during the step, death wins over activation
+        - present only uses sources activated before the step
+        - a source engulfs its nearest target (lowest index on ties), a target wanted by
+        several sources, of any phagocytose rule, goes to the lowest source index, the
+        other sources engulf nothing
+
+    Args:
+        - rules (list) : rules returned by load_interactions
+        - x (array) : x coordinates of every agent
+        - y (array) : y coordinates of every agent
+        - species (array) : species id of every agent
+        - activated (array) : activation of every agent
+
+    Returns:
+        - (np.ndarray) : activation of every agent after the step
+        - (np.ndarray) : boolean array, False for agents that died
+
+    """
+
+    # params
+    x = np.asarray(x, dtype=np.int64)
+    y = np.asarray(y, dtype=np.int64)
+    species = np.asarray(species)
+    activated = np.asarray(activated, dtype=bool)
+    new_activated = activated.copy()
+    alive = np.ones(x.shape[0], dtype=bool)
+    if len(rules) == 0 or x.shape[0] == 0:
+        return new_activated, alive
+
+    # one neighbour search among agents of species involved in a rule
+    involved = np.flatnonzero(np.isin(species, [rule["source"] for rule in rules] + [rule["target"] for rule in rules]))
+    max_radius = max(rule["radius"] for rule in rules)
+    index = CellIndex(x[involved], y[involved], max(max_radius, 1))
+    target_pairs, source_pairs = index.query_pairs(x[involved], y[involved], max_radius)
+    target_pairs, source_pairs = involved[target_pairs], involved[source_pairs]
+    distinct = target_pairs != source_pairs
+    target_pairs, source_pairs = target_pairs[distinct], source_pairs[distinct]
+    dx = x[target_pairs] - x[source_pairs]
+    dy = y[target_pairs] - y[source_pairs]
+    distance = np.sqrt(dx*dx + dy*dy)
+    engulf_sources = []
+    engulf_targets = []
+
+    for rule in rules:
+        selected = (species[source_pairs] == rule["source"]) & (species[target_pairs] == rule["target"]) & (distance <= rule["radius"])
+        if rule["effect"] == "present":
+            selected &= activated[source_pairs]
+        targets = target_pairs[selected]
+        sources = source_pairs[selected]
+
+        if rule["effect"] in ["activate", "present"]:
+            new_activated[targets] = True
+        elif rule["effect"] == "kill":
+            alive[targets] = False
+        elif targets.shape[0] > 0:
+
+            # each source picks its nearest target, lowest target index on ties
+            order = np.lexsort((targets, distance[selected], sources))
+            sources, targets = sources[order], targets[order]
+            first = np.concatenate([[True], sources[1:] != sources[:-1]])
+            engulf_sources.append(sources[first])
+            engulf_targets.append(targets[first])
+
+    # a target wanted by several sources (of any phagocytose rule) goes to the lowest source index
+    if engulf_sources:
+        sources = np.concatenate(engulf_sources)
+        targets = np.concatenate(engulf_targets)
+        order = np.lexsort((sources, targets))
+        sources, targets = sources[order], targets[order]
+        first = np.concatenate([[True], targets[1:] != targets[:-1]])
+        alive[targets[first]] = False
+        new_activated[sources[first]] = True
+
+    return new_activated, alive
@@ -0,0 +1,177 @@
+# load usual dependencies
+import numpy as np
+
+
+# integer type of lineage ids and steps, 2**31 - 1 agents at most
+LINEAGE_DTYPE = np.int32
+
+# columns of a lineage table, one row per agent ever born, the row index is the lineage id
+LINEAGE_COLUMNS = {"parent":LINEAGE_DTYPE, "species":np.int8, "birth":LINEAGE_DTYPE, "death":LINEAGE_DTYPE, "clone":LINEAGE_DTYPE, "depth":LINEAGE_DTYPE}
+
+# rows allocated by the first growth of a lineage table, capacity then doubles
+MIN_CAPACITY = 1024
+
+
+class LineageTable:
+    """Family tree of every agent of a simulation, as one row per agent in compact
+    integer arrays (no reference between agents): parent id (-1 for founders), species,
+    birth step, death step (-1 while alive), clone (id of the founder of the lineage) and
+    depth (number of divisions from the founder). Clone and depth are set at birth, so
+    clone sizes or depths at any step are one numpy operation over the table.
+    Arrays are preallocated and their capacity doubles when full, as for the Population
+    store. step is the step of the events being registered, set by the simulation.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.capacity = 0
+        self.step = 0
+        self.buffers = {column:np.zeros(0, dtype=dtype) for column, dtype in LINEAGE_COLUMNS.items()}
+        self._alive = None
+        self._registered = 0
+
+    def __len__(self):
+        return self.n
+
+    def _reserve(self, n_new:int) -> None:
+        """Make room for n_new more agents, doubling the capacity of the buffers"""
+        needed = self.n + n_new
+        if needed <= self.capacity:
+            return
+        if needed > np.iinfo(LINEAGE_DTYPE).max:
+            raise RuntimeError(f"Lineage table full: {needed} agents > {np.iinfo(LINEAGE_DTYPE).max}")
+        capacity = min(max(needed, 2 * self.capacity, MIN_CAPACITY), int(np.iinfo(LINEAGE_DTYPE).max))
+        for column, buffer in self.buffers.items():
+            grown = np.zeros(capacity, dtype=buffer.dtype)
+            grown[:self.n] = buffer[:self.n]
+            self.buffers[column] = grown
+        self.capacity = capacity
+
+    def register(self, parents, species) -> np.ndarray:
+        """Register agents born at the current step
+
+        Args:
+            - parents (array) : lineage id of the parent of each agent, -1 for founders
+            - species (array) : species id of each agent, or a single species id
+
+        Returns:
+            - (np.ndarray) : lineage ids of the new agents
+
+        """
+
+        # params
+        parents = np.asarray(parents, dtype=np.int64).reshape(-1)
+        k = parents.shape[0]
+        ids = np.arange(self.n, self.n + k, dtype=LINEAGE_DTYPE)
+        founder = parents < 0
+        self._reserve(k)
+
+        # new rows, founders start their own clone
+        rows = slice(self.n, self.n + k)
+        self.buffers["parent"][rows] = np.where(founder, -1, parents)
+        self.buffers["species"][rows] = species
+        self.buffers["birth"][rows] = self.step
+        self.buffers["death"][rows] = -1
+        self.buffers["clone"][rows] = np.where(founder, ids, self.buffers["clone"][np.where(founder, 0, parents)])
+        self.buffers["depth"][rows] = np.where(founder, 0, self.buffers["depth"][np.where(founder, 0, parents)] + 1)
+        self.n += k
+
+        return ids
+
+    def record_deaths(self, ids) -> None:
+        """Record the death of agents at the current step
+
+        Args:
+            - ids (array) : lineage ids of the dead agents
+
+        """
+        self.buffers["death"][np.asarray(ids, dtype=np.int64)] = self.step
+
+    def record_survivors(self, ids) -> None:
+        """Record the death, at the current step, of every living agent missing from ids, for
+        stores of agents that do not report their deaths (agent objects)
+
+        Args:
+            - ids (array) : lineage ids of every agent still alive
+
+        """
+        ids = np.sort(np.asarray(ids, dtype=np.int64).reshape(-1))
+        if self._alive is None:
+            candidates = np.flatnonzero(self.death < 0)
+        else:
+            candidates = np.concatenate([self._alive, np.arange(self._registered, self.n)])
+        self.record_deaths(np.setdiff1d(candidates, ids, assume_unique=True))
+        self._alive = ids
+        self._registered = self.n
+
+    def alive(self, step:int=None) -> np.ndarray:
+        """Return True for every agent alive at a step (the current step by default)"""
+        step = self.step if step is None else step
+        return (self.birth <= step) & ((self.death < 0) | (self.death > step))
+
+    def clone_sizes(self, step:int=None, species:int=None):
+        """Size of each clone (agents descending from the same founder) alive at a step
+
+        Args:
+            - step (int) : step of the count, current step by default
+            - species (int) : only count agents of this species (e.g population.B_CELL), every species if not provided
+
+        Returns:
+            - (np.ndarray) : lineage id of the founder of each clone with living agents
+            - (np.ndarray) : number of living agents of each clone
+
+        """
+        selected = self.alive(step)
+        if species is not None:
+            selected &= self.species == species
+        return np.unique(self.clone[selected], return_counts=True)
+
+    def surviving_clones(self, step:int=None, species:int=None) -> np.ndarray:
+        """Return the lineage id of the founder of every clone with living agents at a step (see clone_sizes)"""
+        return self.clone_sizes(step, species)[0]
+
+    def ancestors(self, agent_id:int) -> np.ndarray:
+        """Return the lineage ids from an agent up to the founder of its clone, agent first"""
+        path = np.zeros(int(self.depth[agent_id]) + 1, dtype=np.int64)
+        path[0] = agent_id
+        for generation in range(1, path.shape[0]):
+            path[generation] = self.parent[path[generation - 1]]
+        return path
+
+    def save(self, output_file:str) -> None:
+        """Save the table as a npz file, one array per column and the current step"""
+        np.savez(output_file, step=self.step, **{column:getattr(self, column) for column in LINEAGE_COLUMNS})
+
+
+def load_lineage(lineage_file:str) -> LineageTable:
+    """Load a lineage table saved by LineageTable.save
+
+    Args:
+        - lineage_file (str) : path to the npz file
+
+    Returns:
+        - (LineageTable) : the table, ready to register new events
+
+    """
+    lineage = LineageTable()
+    with np.load(lineage_file) as data:
+        n = data["parent"].shape[0]
+        lineage._reserve(n)
+        for column in LINEAGE_COLUMNS:
+            lineage.buffers[column][:n] = data[column]
+        lineage.step = int(data["step"])
+    lineage.n = n
+    return lineage
+
+
+def _column_property(column:str):
+    """Craft a property exposing the rows in use of one buffer of the LineageTable"""
+
+    def getter(self):
+        return self.buffers[column][:self.n]
+
+    return property(getter)
+
+
+for _column in LINEAGE_COLUMNS:
+    setattr(LineageTable, _column, _column_property(_column))
@@ -0,0 +1,167 @@
+# load usual dependencies
+import numpy as np
+
+
+# one count column per species of the default registry, same order as population.SPECIES
+SPECIES_COLUMNS = [
+    "n_b",
+    "n_t",
+    "n_pathogen",
+    "n_nk",
+    "n_neutro",
+    "n_dendritic",
+    "n_macrophage",
+    "n_mastocyte"
+]
+
+# derived columns, n_total and density only account for B and T cells
+DERIVED_COLUMNS = [
+    "n_activated_b",
+    "n_naive_b",
+    "n_total",
+    "density"
+]
+
+
+class MetricsTable:
+    """Preallocated table of per step metrics, one row per step and one column per
+    metric, stored in a single float array so that recording a step is a row write.
+    """
+
+    def __init__(self, n_rows:int, grid_size:int, extra_columns:list=None, species_columns:list=None):
+        self.grid_size = grid_size
+        self.species_columns = list(species_columns or SPECIES_COLUMNS)
+        self.columns = ["step"] + self.species_columns + DERIVED_COLUMNS + list(extra_columns or [])
+        self.index = {column:position for position, column in enumerate(self.columns)}
+        self.data = np.zeros((n_rows, len(self.columns)), dtype=np.float64)
+        self.n_rows = 0
+
+    def __len__(self):
+        return self.n_rows
+
+    def record(self, step:int, species_counts, n_activated_b:int, **extra) -> None:
+        """Record metrics of one step
+
+        Args:
+            - step (int) : step number
+            - species_counts (array) : number of agents of each species, in the species_columns order
+            - n_activated_b (int) : number of activated Bcells
+            - extra (float) : values of the extra columns
+
+        """
+
+        # grow if the table is full
+        if self.n_rows == self.data.shape[0]:
+            self.data = np.concatenate([self.data, np.zeros((max(1, self.n_rows), len(self.columns)))])
+
+        # fill row
+        row = self.data[self.n_rows]
+        n_b, n_t = species_counts[0], species_counts[1]
+        row[0] = step
+        row[1:1 + len(self.species_columns)] = species_counts
+        row[self.index["n_activated_b"]] = n_activated_b
+        row[self.index["n_naive_b"]] = n_b - n_activated_b
+        row[self.index["n_total"]] = n_b + n_t
+        row[self.index["density"]] = float(n_b + n_t) / (self.grid_size * self.grid_size)
+        for column, value in extra.items():
+            row[self.index[column]] = value
+        self.n_rows += 1
+
+    def update(self, **extra) -> None:
+        """Set extra columns of the last recorded row (e.g timings of the outputs of a step)"""
+        row = self.data[self.n_rows - 1]
+        for column, value in extra.items():
+            row[self.index[column]] = value
+
+    def restore(self, data:np.ndarray) -> None:
+        """Restore rows recorded before (e.g from a checkpoint), in the same column order"""
+        if data.shape[0] > self.data.shape[0]:
+            self.data = np.zeros((data.shape[0], len(self.columns)), dtype=np.float64)
+        self.data[:data.shape[0]] = data
+        self.n_rows = data.shape[0]
+
+    def column(self, column:str) -> np.ndarray:
+        """Return the recorded values of one column"""
+        return self.data[:self.n_rows, self.index[column]]
+
+    def save(self, output_file:str) -> None:
+        """Save the table as a npz file, one array per column"""
+        np.savez(output_file, **{column:self.column(column) for column in self.columns})
+
+    def to_csv(self, output_file:str) -> None:
+        """Export the table as a csv file, one column per metric"""
+        np.savetxt(output_file, self.data[:self.n_rows], delimiter=",", header=",".join(self.columns), comments="", fmt="%.10g")
+
+
+def load_metrics(metrics_file:str) -> dict:
+    """Load a metrics file saved by MetricsTable.save
+
+    Args:
+        - metrics_file (str) : path to the npz file
+
+    Returns:
+        - (dict) : column name as key, array of values as value
+
+    """
+    with np.load(metrics_file) as data:
+        return {column:data[column] for column in data.files}
+
+
+class ReplicaMetricsTable:
+    """Per step metrics of several replicas of a simulation, stored in a single
+    (n_replicas, n_rows, n_columns) float array, with the columns of MetricsTable.
+    Recording a step writes one row of every replica at once.
+    """
+
+    def __init__(self, n_replicas:int, n_rows:int, grid_size:int, species_columns:list=None):
+        self.grid_size = grid_size
+        self.species_columns = list(species_columns or SPECIES_COLUMNS)
+        self.columns = ["step"] + self.species_columns + DERIVED_COLUMNS
+        self.index = {column:position for position, column in enumerate(self.columns)}
+        self.data = np.zeros((n_replicas, n_rows, len(self.columns)), dtype=np.float64)
+        self.n_rows = 0
+
+    def __len__(self):
+        return self.n_rows
+
+    def record(self, step:int, species_counts:np.ndarray, n_activated_b:np.ndarray) -> None:
+        """Record metrics of one step for every replica
+
+        Args:
+            - step (int) : step number
+            - species_counts (np.ndarray) : (n_replicas, n_species) number of agents of each species
+            - n_activated_b (np.ndarray) : number of activated Bcells of each replica
+
+        """
+        rows = self.data[:, self.n_rows]
+        n_b, n_t = species_counts[:, 0], species_counts[:, 1]
+        rows[:, 0] = step
+        rows[:, 1:1 + len(self.species_columns)] = species_counts
+        rows[:, self.index["n_activated_b"]] = n_activated_b
+        rows[:, self.index["n_naive_b"]] = n_b - n_activated_b
+        rows[:, self.index["n_total"]] = n_b + n_t
+        rows[:, self.index["density"]] = (n_b + n_t) / (self.grid_size * self.grid_size)
+        self.n_rows += 1
+
+    def replicate(self, replica:int) -> dict:
+        """Return the metrics of one replica, as returned by load_metrics"""
+        return {column:self.data[replica, :self.n_rows, position] for column, position in self.index.items()}
+
+    def save(self, output_file:str) -> None:
+        """Save the table as a npz file with the 'metrics' array and the 'columns' names"""
+        np.savez(output_file, metrics=self.data[:, :self.n_rows], columns=np.array(self.columns))
+
+
+def load_replica_metrics(metrics_file:str):
+    """Load a metrics file saved by ReplicaMetricsTable.save
+
+    Args:
+        - metrics_file (str) : path to the npz file
+
+    Returns:
+        - (np.ndarray) : (n_replicas, n_steps, n_columns) metrics
+        - (list) : name of the columns
+
+    """
+    with np.load(metrics_file) as data:
+        return data["metrics"], [str(column) for column in data["columns"]]
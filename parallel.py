@@ -0,0 +1,471 @@
+# load usual dependencies
+import numpy as np
+import multiprocessing
+from multiprocessing import shared_memory
+import traceback
+import os
+
+# load modules
+from population import Population, B_CELL, T_CELL
+from spatial import CellIndex, OccupancyGrid
+
+
+# per agent columns of a tile buffer, ready is the division flag computed before division
+TILE_COLUMNS = [
+    ("x", np.int64),
+    ("y", np.int64),
+    ("age", np.int64),
+    ("life_span", np.int64),
+    ("activated", np.bool_),
+    ("species", np.int8),
+    ("ready", np.bool_)
+]
+
+# reach of the interaction and division rules, in sites
+HALO = 2
+
+# min width of a tile, so that tiles of the same color never write the same sites
+MIN_TILE_WIDTH = 4
+
+# seconds given to a worker to stop on close before it is terminated
+JOIN_TIMEOUT = 5
+
+# phases of a step, run by every tile at once ('all') or by even then odd tiles ('colored')
+PHASES = {
+    "interaction":"all",
+    "division":"colored",
+    "death":"colored",
+    "movement":"colored",
+    "pull":"all",
+    "compact":"all"
+}
+
+
+class TileBuffer:
+    """Agents of one tile as a struct of arrays in a shared memory block, so any process
+    attached to the block reads and writes them without copy. A header holds the number
+    of agents and the capacity of the block.
+    """
+
+    def __init__(self, capacity:int=None, name:str=None):
+        if name is None:
+            row_size = sum(np.dtype(dtype).itemsize for _, dtype in TILE_COLUMNS)
+            self.shm = shared_memory.SharedMemory(create=True, size=16 + max(1, capacity) * row_size)
+            self.header = np.ndarray((2,), dtype=np.int64, buffer=self.shm.buf)
+            self.header[:] = [0, capacity]
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.header = np.ndarray((2,), dtype=np.int64, buffer=self.shm.buf)
+        self.name = self.shm.name
+        self.capacity = int(self.header[1])
+
+        # one array per column, laid out one after the other
+        self.arrays = {}
+        offset = 16
+        for column, dtype in TILE_COLUMNS:
+            self.arrays[column] = np.ndarray((self.capacity,), dtype=dtype, buffer=self.shm.buf, offset=offset)
+            offset += self.capacity * np.dtype(dtype).itemsize
+
+    @property
+    def count(self) -> int:
+        return int(self.header[0])
+
+    @count.setter
+    def count(self, value:int):
+        self.header[0] = value
+
+    def columns(self, stop:int=None) -> dict:
+        """Return views on the first stop rows of each column (every agent by default)"""
+        stop = self.count if stop is None else stop
+        return {column:array[:stop] for column, array in self.arrays.items()}
+
+    def append(self, columns:dict) -> None:
+        """Append agents given as one array per column, capacity must be checked before"""
+        n = self.count
+        k = columns["x"].shape[0]
+        for column, array in self.arrays.items():
+            array[n:n + k] = columns[column]
+        self.count = n + k
+
+    def compact(self, keep:np.ndarray) -> None:
+        """Keep only the rows whose index is in keep, in the same order"""
+        for array in self.arrays.values():
+            array[:keep.shape[0]] = array[keep]
+        self.count = keep.shape[0]
+
+    def close(self) -> None:
+        self.arrays = None
+        self.header = None
+        self.shm.close()
+
+    def unlink(self) -> None:
+        self.shm.unlink()
+
+
+class _TileContext:
+    """State of a process running tile phases: grid, rules and attached shared memory"""
+
+    def __init__(self, grid_size:int, bounds:list, occupancy_name:str, divides, life_span, speed, seed:int):
+        self.grid_size = grid_size
+        self.bounds = bounds
+        self.divides = np.asarray(divides, dtype=bool)
+        self.life_span = np.asarray(life_span, dtype=np.int64)
+        self.speed = np.asarray(speed, dtype=np.int64)
+        self.seed = seed
+        self.occupancy_shm = shared_memory.SharedMemory(name=occupancy_name)
+        self.occupancy = OccupancyGrid(grid_size, counts=np.ndarray((grid_size, grid_size), dtype=np.int32, buffer=self.occupancy_shm.buf))
+        self.attached = {}
+
+    def buffers(self, names:list) -> list:
+        """Return the tile buffers, attaching new blocks and closing replaced ones"""
+        for name in list(self.attached):
+            if name not in names:
+                self.attached.pop(name).close()
+        for name in names:
+            if name not in self.attached:
+                self.attached[name] = TileBuffer(name=name)
+        return [self.attached[name] for name in names]
+
+    def close(self) -> None:
+        for buffer in self.attached.values():
+            buffer.close()
+        self.attached = {}
+        self.occupancy = None
+        self.occupancy_shm.close()
+
+
+def _neighbour_agents(buffers:list, tile:int, stop:list, x_min:int, x_max:int) -> dict:
+    """Agents of the tiles next to tile with x in [x_min, x_max), among their first stop rows"""
+    parts = []
+    for neighbour in [tile - 1, tile + 1]:
+        if 0 <= neighbour < len(buffers):
+            columns = buffers[neighbour].columns(stop[neighbour])
+            inside = (columns["x"] >= x_min) & (columns["x"] < x_max)
+            parts.append({column:array[inside] for column, array in columns.items()})
+    if not parts:
+        return {column:np.zeros(0, dtype=dtype) for column, dtype in TILE_COLUMNS}
+    return {column:np.concatenate([part[column] for part in parts]) for column, _ in TILE_COLUMNS}
+
+
+def _run_tile(context:_TileContext, phase:str, tile:int, buffers:list, counts:list, step:int):
+    """Run one phase of a step on one tile
+
+    Returns:
+        - (tuple) : ('grow', capacity) if the tile buffer is too small (nothing was done),
+        ('ok', result) otherwise
+
+    """
+
+    # params
+    buffer = buffers[tile]
+    x0, x1 = context.bounds[tile]
+    n = buffer.count
+    a = buffer.columns()
+
+    # activate Bcells with a Tcell nearby (own & halo), flag cells free to divide
+    if phase == "interaction":
+        halo = _neighbour_agents(buffers, tile, counts, x0 - HALO, x1 + HALO)
+        t_own = a["species"] == T_CELL
+        t_halo = halo["species"] == T_CELL
+        tx = np.concatenate([a["x"][t_own], halo["x"][t_halo]])
+        ty = np.concatenate([a["y"][t_own], halo["y"][t_halo]])
+        b_index = np.flatnonzero(a["species"] == B_CELL)
+        if b_index.shape[0] > 0 and tx.shape[0] > 0:
+            contact = CellIndex(tx, ty, HALO).has_neighbour(a["x"][b_index], a["y"][b_index], HALO)
+            a["activated"][b_index[contact]] = True
+        a["ready"][:] = (context.occupancy.neighbour_count(a["x"], a["y"], HALO) == 1) & context.divides[a["species"]]
+        return ("ok", None)
+
+    # claim a free site next to each flagged cell, daughters stay in the tile buffer until migration
+    if phase == "division":
+        parents = np.flatnonzero(a["ready"])
+        if n + parents.shape[0] > buffer.capacity:
+            return ("grow", n + parents.shape[0])
+        site_x, site_y, placed = context.occupancy.claim_daughter_sites(a["x"][parents], a["y"][parents])
+        parents, site_x, site_y = parents[placed], site_x[placed], site_y[placed]
+        a["ready"][:] = False
+        species = a["species"][parents]
+        buffer.append({
+            "x":site_x, "y":site_y,
+            "age":np.zeros(parents.shape[0], dtype=np.int64),
+            "life_span":context.life_span[species],
+            "activated":np.zeros(parents.shape[0], dtype=bool),
+            "species":species,
+            "ready":np.zeros(parents.shape[0], dtype=bool)
+        })
+        return ("ok", None)
+
+    # drop cells that exceed their lifespan
+    if phase == "death":
+        alive = a["age"] <= a["life_span"]
+        context.occupancy.remove(a["x"][~alive], a["y"][~alive])
+        buffer.compact(np.flatnonzero(alive))
+        return ("ok", None)
+
+    # random move (one generator per step & tile) and aging
+    if phase == "movement":
+        rng = np.random.default_rng([context.seed, step, tile])
+        dx, dy = rng.integers(-1, 2, size=(2, n))
+        x = np.clip(a["x"] + dx, 0, context.grid_size - 1)
+        y = np.clip(a["y"] + dy * context.speed[a["species"]], 0, context.grid_size - 1)
+        context.occupancy.move(a["x"], a["y"], x, y)
+        a["x"][:] = x
+        a["y"][:] = y
+        a["age"] += 1
+        return ("ok", None)
+
+    # copy agents that entered the tile from the buffers of the neighbouring tiles
+    if phase == "pull":
+        incoming = _neighbour_agents(buffers, tile, counts, x0, x1)
+        if n + incoming["x"].shape[0] > buffer.capacity:
+            return ("grow", n + incoming["x"].shape[0])
+        buffer.append(incoming)
+        return ("ok", None)
+
+    # drop agents that left the tile, count agents
+    if phase == "compact":
+        own = np.arange(n) < counts[tile]
+        keep = ~own | ((a["x"] >= x0) & (a["x"] < x1))
+        buffer.compact(np.flatnonzero(keep))
+        a = buffer.columns()
+        species_counts = np.bincount(a["species"], minlength=context.life_span.shape[0])
+        n_activated_b = int(np.sum(a["activated"][a["species"] == B_CELL]))
+        return ("ok", (species_counts, n_activated_b))
+
+    raise ValueError(f"Unknown phase {phase}")
+
+
+def _run_tiles(context:_TileContext, phase:str, tiles:list, names:list, counts:list, step:int) -> dict:
+    """Run one phase on several tiles, returns the result of each tile"""
+    buffers = context.buffers(names)
+    return {tile:_run_tile(context, phase, tile, buffers, counts, step) for tile in tiles}
+
+
+def _worker(connection, settings:dict) -> None:
+    """Worker process: run the phases sent by the ParallelPopulation until None is received"""
+    context = _TileContext(**settings)
+    try:
+        while True:
+            message = connection.recv()
+            if message is None:
+                break
+            try:
+                connection.send(_run_tiles(context, *message))
+            except Exception:
+                connection.send(("error", traceback.format_exc()))
+    finally:
+        context.close()
+        connection.close()
+
+
+class ParallelPopulation:
+    """Population split into vertical strips of the grid (tiles), each one stored in
+    shared memory and stepped by a worker process. Each phase of a step runs on every
+    tile at once. Tiles read a halo of HALO sites from their neighbours for interaction
+    and division. Agents that cross a tile border migrate to the tile buffer of their
+    new strip at the end of the step. Phases writing the shared occupancy grid near the
+    borders (division, death, movement) run on even tiles then odd tiles, so that two
+    tiles working at the same time never touch the same site.
+    Random draws come from one generator per (seed, step, tile): results only depend
+    on seed and n_tiles, whatever the number of workers (0 runs every tile in the
+    calling process, the deterministic mode used for testing).
+    """
+
+    def __init__(self, grid_size:int, seed:int, n_tiles:int=None, n_workers:int=None, registry:list=None):
+        self.grid_size = grid_size
+        self.seed = seed
+        self.n_workers = os.cpu_count() if n_workers is None else n_workers
+        self.n_tiles = n_tiles if n_tiles is not None else 2 * max(1, self.n_workers)
+        self.n_tiles = max(1, min(self.n_tiles, grid_size // MIN_TILE_WIDTH))
+        self.bounds = [(tile * grid_size // self.n_tiles, (tile + 1) * grid_size // self.n_tiles) for tile in range(self.n_tiles)]
+        self.prototype = Population(grid_size, registry=registry)
+        self.step_number = 0
+        self.species_counts = np.zeros(len(self.prototype.registry), dtype=np.int64)
+        self.n_activated_b = 0
+        self.results = {}
+
+        # shared occupancy grid & one buffer per tile
+        self.occupancy_shm = shared_memory.SharedMemory(create=True, size=grid_size * grid_size * np.dtype(np.int32).itemsize)
+        self.occupancy = np.ndarray((grid_size, grid_size), dtype=np.int32, buffer=self.occupancy_shm.buf)
+        self.occupancy[:] = 0
+        self.buffers = [TileBuffer(1024) for _ in range(self.n_tiles)]
+
+        # tile runners
+        settings = {
+            "grid_size":grid_size,
+            "bounds":self.bounds,
+            "occupancy_name":self.occupancy_shm.name,
+            "divides":self.prototype.divides,
+            "life_span":self.prototype.default_life_span,
+            "speed":self.prototype.speed,
+            "seed":seed
+        }
+        self.context = _TileContext(**settings) if self.n_workers == 0 else None
+        self.workers = []
+        for _ in range(self.n_workers):
+            parent_connection, child_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_worker, args=(child_connection, settings), daemon=True)
+            process.start()
+            child_connection.close()
+            self.workers.append((process, parent_connection))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return sum(buffer.count for buffer in self.buffers)
+
+    def _tile(self, x) -> np.ndarray:
+        """Return the tile owning each x coordinate, as given by the tile bounds"""
+        starts = np.array([x0 for x0, _ in self.bounds], dtype=np.int64)
+        return np.searchsorted(starts, np.asarray(x, dtype=np.int64), side="right") - 1
+
+    def _grow(self, tile:int, capacity:int) -> None:
+        """Move a tile to a larger shared memory block"""
+        old = self.buffers[tile]
+        new = TileBuffer(max(capacity, 2 * old.capacity))
+        new.append(old.columns())
+        old.close()
+        old.unlink()
+        self.buffers[tile] = new
+
+    def _run_phase(self, phase:str, counts:list=None) -> None:
+        """Run a phase on every tile, growing the buffers of tiles that ask for it.
+        counts is the number of agents of each tile seen by the phase, current counts
+        if not provided."""
+        groups = [list(range(self.n_tiles))] if PHASES[phase] == "all" else [list(range(0, self.n_tiles, 2)), list(range(1, self.n_tiles, 2))]
+        counts = counts if counts is not None else [buffer.count for buffer in self.buffers]
+        for pending in groups:
+            while pending:
+                results = self._dispatch(phase, pending, counts)
+                pending = []
+                for tile, (status, result) in sorted(results.items()):
+                    if status == "grow":
+                        self._grow(tile, result)
+                        pending.append(tile)
+                    elif phase == "compact":
+                        self.results[tile] = result
+
+    def _dispatch(self, phase:str, tiles:list, counts:list) -> dict:
+        """Send a phase to the workers owning the tiles (tile // 2 modulo n_workers, so
+        that even and odd tiles are both spread over every worker) and collect results"""
+        names = [buffer.name for buffer in self.buffers]
+        if self.n_workers == 0:
+            return _run_tiles(self.context, phase, tiles, names, counts, self.step_number)
+        assignment = {}
+        for tile in tiles:
+            assignment.setdefault((tile // 2) % self.n_workers, []).append(tile)
+        for worker, worker_tiles in assignment.items():
+            self.workers[worker][1].send((phase, worker_tiles, names, counts, self.step_number))
+        results = {}
+        for worker in assignment:
+            answer = self.workers[worker][1].recv()
+            if isinstance(answer, tuple) and answer[0] == "error":
+                raise RuntimeError(f"Tile worker failed:\n{answer[1]}")
+            results.update(answer)
+        return results
+
+    def scatter(self, population:Population) -> None:
+        """Load the agents of a Population into the tiles
+
+        Args:
+            - population (Population) : agents to distribute, by x coordinate
+
+        """
+        tiles = self._tile(population.x)
+        for tile in range(self.n_tiles):
+            selected = np.flatnonzero(tiles == tile)
+            if selected.shape[0] > self.buffers[tile].capacity:
+                self._grow(tile, 2 * selected.shape[0])
+            self.buffers[tile].count = 0
+            self.buffers[tile].append({
+                "x":population.x[selected], "y":population.y[selected],
+                "age":population.age[selected], "life_span":population.life_span[selected],
+                "activated":population.activated[selected], "species":population.species[selected],
+                "ready":np.zeros(selected.shape[0], dtype=bool)
+            })
+        self.occupancy[:] = population.occupancy.counts
+        self.species_counts = population.count()
+        self.n_activated_b = int(np.sum(population.activated[population.species == B_CELL]))
+
+    def columns(self) -> dict:
+        """Return every agent as one array per column, tile by tile"""
+        return {column:np.concatenate([buffer.columns()[column] for buffer in self.buffers]) for column, _ in TILE_COLUMNS}
+
+    def gather(self, rng:np.random.Generator=None) -> Population:
+        """Return a copy of every agent as a Population (e.g for a checkpoint)"""
+        population = Population(self.grid_size, rng, self.prototype.registry)
+        population.restore(self.columns())
+        return population
+
+    def frame_groups(self) -> list:
+        """Return one (x, y, colors) tuple per species, as expected by displayer.FrameRenderer"""
+        columns = self.columns()
+        groups = []
+        for species_id, parameters in enumerate(self.prototype.parameters):
+            mask = columns["species"] == species_id
+            groups.append((columns["x"][mask], columns["y"][mask], np.where(columns["activated"][mask], 'red', parameters["color"])))
+        return groups
+
+    def detect_interaction(self) -> None:
+        """Activate Bcells with a Tcell nearby and flag cells free to divide"""
+        self._run_phase("interaction")
+
+    def look_for_division(self) -> None:
+        """Divide flagged cells on a free neighbouring site"""
+        self._run_phase("division")
+
+    def drop_old_cell(self) -> None:
+        """Drop cells that exceed their lifespan"""
+        self._run_phase("death")
+
+    def move(self) -> None:
+        """Random move & aging of every agent, then migration of agents between tiles"""
+        self._run_phase("movement")
+
+        # migration, tiles only read the agents their neighbours had before the pull
+        counts = [buffer.count for buffer in self.buffers]
+        self.results = {}
+        self._run_phase("pull", counts)
+        self._run_phase("compact", counts)
+        self.species_counts = np.sum([self.results[tile][0] for tile in range(self.n_tiles)], axis=0)
+        self.n_activated_b = sum(self.results[tile][1] for tile in range(self.n_tiles))
+        self.step_number += 1
+
+    def count(self) -> np.ndarray:
+        """Return the number of agents of each species, as of the last step"""
+        return self.species_counts
+
+    def close(self) -> None:
+        """Stop the workers and release the shared memory. A worker that does not stop
+        within JOIN_TIMEOUT seconds is terminated, the shared memory is released anyway.
+        Closing twice does nothing."""
+        try:
+            for process, connection in self.workers:
+                if process.is_alive():
+                    try:
+                        connection.send(None)
+                    except (BrokenPipeError, OSError):
+                        pass
+                    process.join(JOIN_TIMEOUT)
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+                connection.close()
+        finally:
+            self.workers = []
+            if self.context is not None:
+                self.context.close()
+                self.context = None
+            for buffer in self.buffers:
+                buffer.close()
+                buffer.unlink()
+            self.buffers = []
+            self.occupancy = None
+            if self.occupancy_shm is not None:
+                self.occupancy_shm.close()
+                self.occupancy_shm.unlink()
+                self.occupancy_shm = None
@@ -0,0 +1,618 @@
+# load usual dependencies
+import numpy as np
+import functools
+
+# load modules
+from spatial import CellIndex, OccupancyGrid
+from species import load_species, new_agent, activate_agent
+from intracellular import bcell_inputs
+from interactions import evaluate_interactions
+
+
+# species ids, same order as the agent lists used in run_simulation, the first two
+# species of a registry are the Bcells and Tcells
+SPECIES = [species["agent_class"] for species in load_species()]
+B_CELL = 0
+T_CELL = 1
+
+# per agent columns of the store
+COLUMNS = ["x", "y", "age", "life_span", "activated", "species"]
+COLUMN_DTYPES = {"x":np.int64, "y":np.int64, "age":np.int64, "life_span":np.int64, "activated":bool, "species":np.int8}
+
+# rows allocated by the first growth of a Population buffer, capacity then doubles
+MIN_CAPACITY = 64
+
+# what happens to new agents beyond the cap of a Population (see Population.set_limits)
+OVERFLOW_POLICIES = ["refuse", "raise"]
+
+
+def species_parameters(grid_size:int, registry:list=None) -> list:
+    """Extract parameters of each species from the species registry, completed by the
+    attributes of its agent class (e.g grid_size) used by agent views.
+
+    Args:
+        - grid_size (int) : grid_size (assume grid is a square)
+        - registry (list) : species registry, see species.load_species, default registry if not provided
+
+    Returns:
+        - (list) : one dict per species with 'name', 'color', 'life_span', 'speed',
+        'division' and 'extra' (remaining attributes of the agent class)
+
+    """
+
+    # params
+    parameters = []
+
+    for species in registry or load_species():
+        prototype = species["agent_class"](0, 0, grid_size)
+        extra = {k:v for k, v in vars(prototype).items() if k not in COLUMNS + ["internal"]}
+        extra.update({"color":species["color"], "speed":species["speed"]})
+        parameters.append({
+            "name":species["name"],
+            "color":species["color"],
+            "life_span":species["life_span"],
+            "speed":species["speed"],
+            "division":species["division"],
+            "extra":extra
+        })
+
+    return parameters
+
+
+class _AgentView:
+    """Mixin turning an agent class into a view on one row of a Population:
+    x, y, age, life_span and activated are read from and written to the arrays,
+    so the usual methods (move, get_older, activate ...) keep working.
+    A view is only valid until the next division or death in the Population.
+    """
+
+    def __init__(self, population, index):
+        self._population = population
+        self._index = index
+        for k, v in population.parameters[population.species[index]]["extra"].items():
+            setattr(self, k, v)
+        if self.activated:
+            self.color = 'red'
+
+
+def _column_property(column:str):
+    """Craft a property reading / writing one column of the Population"""
+
+    def getter(self):
+        return getattr(self._population, column)[self._index]
+
+    def setter(self, value):
+        array = getattr(self._population, column)
+        if column in ["x", "y"]:
+            self._population.occupancy.remove(self._population.x[self._index], self._population.y[self._index])
+            array[self._index] = value
+            self._population.occupancy.add(self._population.x[self._index], self._population.y[self._index])
+        else:
+            array[self._index] = value
+
+    return property(getter, setter)
+
+
+for _column in ["x", "y", "age", "life_span", "activated"]:
+    setattr(_AgentView, _column, _column_property(_column))
+
+
+@functools.lru_cache(maxsize=None)
+def view_class(agent_class):
+    """Return the view class of an agent class, still an instance of the original agent class"""
+    return type(agent_class.__name__, (_AgentView, agent_class), {})
+
+
+class Population:
+    """Struct of arrays store for every agent of a simulation.
+    Each agent is a row shared by the x, y, age, life_span, activated and species
+    arrays, so that movement, aging, activation and death are one numpy operation
+    per step whatever the number of agents.
+    Columns are views on the first rows of preallocated buffers: new agents are
+    written in the spare rows (capacity doubles when full) and dead agents are
+    removed by compacting the buffers in place, so the allocations do not follow
+    the swings of the population. An optional cap on the number of agents or on
+    the memory of the buffers protects from runaway proliferation (see set_limits).
+    """
+
+    # buffer holding the occupancy layer of each agent, None for a single grid (see replicas.ReplicaPopulation)
+    layer_column = None
+
+    def __init__(self, grid_size:int, rng:np.random.Generator=None, registry:list=None):
+        self.grid_size = grid_size
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.registry = registry or load_species()
+        self.parameters = species_parameters(grid_size, self.registry)
+        self.speed = np.array([p["speed"] for p in self.parameters], dtype=np.int64)
+        self.default_life_span = np.array([p["life_span"] for p in self.parameters], dtype=np.int64)
+        self.divides = np.array([p["division"] != "none" for p in self.parameters], dtype=bool)
+        self.n = 0
+        self.capacity = 0
+        self.buffers = {column:np.zeros(0, dtype=dtype) for column, dtype in COLUMN_DTYPES.items()}
+        self.occupancy = OccupancyGrid(grid_size)
+        self.model = None
+        self.max_agents = None
+        self.max_memory = None
+        self.overflow = "refuse"
+        self.n_refused = 0
+        self.lineage = None
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def internal(self):
+        """(n_agents, n_states) intracellular states, None without intracellular model"""
+        if "internal" not in self.buffers:
+            return None
+        return self.buffers["internal"][:self.n]
+
+    @internal.setter
+    def internal(self, value) -> None:
+        if value is None:
+            self.buffers.pop("internal", None)
+            return
+        value = np.asarray(value, dtype=np.float64)
+        if "internal" not in self.buffers or self.buffers["internal"].shape[1:] != value.shape[1:]:
+            self.buffers["internal"] = np.zeros((self.capacity,) + value.shape[1:], dtype=np.float64)
+        self._set_column("internal", value)
+
+    @property
+    def lineage_ids(self):
+        """Lineage id of each agent (see lineage.LineageTable), None without lineage tracking"""
+        if self.lineage is None:
+            return None
+        return self.buffers["lineage"][:self.n]
+
+    def track_lineage(self, lineage, ids=None) -> None:
+        """Record births and deaths of the agents in a lineage table, the lineage id of each
+        agent is kept in the lineage buffer and given to its daughters as their parent
+
+        Args:
+            - lineage (LineageTable) : table receiving the events
+            - ids (array) : lineage ids of the current agents (e.g from a checkpoint), current
+            agents are registered as founders if not provided
+
+        """
+        if ids is None:
+            ids = lineage.register(np.full(self.n, -1), self.species)
+        self.lineage = lineage
+        self.buffers["lineage"] = np.zeros(self.capacity, dtype=np.int32)
+        self._set_column("lineage", ids)
+
+    def _set_column(self, column:str, value) -> None:
+        """Write a whole column, the number of agents can't change (see keep & restore)"""
+        value = np.asarray(value)
+        if value.shape[0] != self.n:
+            raise ValueError(f"Column {column} has {value.shape[0]} rows, expected {self.n}")
+        self.buffers[column][:self.n] = value
+
+    def _reserve(self, n_new:int) -> None:
+        """Make room for n_new more agents, doubling the capacity of the buffers
+        (never above the cap of the population)"""
+        needed = self.n + n_new
+        if needed <= self.capacity:
+            return
+        capacity = max(needed, 2 * self.capacity, MIN_CAPACITY)
+        limit = self.agent_limit()
+        if limit is not None:
+            capacity = max(needed, min(capacity, limit))
+        for column, buffer in self.buffers.items():
+            grown = np.zeros((capacity,) + buffer.shape[1:], dtype=buffer.dtype)
+            grown[:self.n] = buffer[:self.n]
+            self.buffers[column] = grown
+        self.capacity = capacity
+
+    def row_bytes(self) -> int:
+        """Return the memory used by one agent in the buffers, in bytes"""
+        return sum(buffer.itemsize * int(np.prod(buffer.shape[1:])) for buffer in self.buffers.values())
+
+    def set_limits(self, max_agents:int=None, max_memory:int=None, overflow:str="refuse") -> None:
+        """Cap the size of the population
+
+        Args:
+            - max_agents (int) : max number of agents, no cap if not provided
+            - max_memory (int) : max memory of the agent buffers in bytes, converted to a number
+            of agents with the size of a row, no cap if not provided
+            - overflow (str) : 'refuse' to drop new agents beyond the cap (first parents in
+            store order divide, refused agents are counted in n_refused), 'raise' to stop
+            the simulation with a RuntimeError
+
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow}, expected one of {OVERFLOW_POLICIES}")
+        self.max_agents = max_agents
+        self.max_memory = max_memory
+        self.overflow = overflow
+
+    def agent_limit(self):
+        """Return the max number of agents allowed by the limits, None if not capped"""
+        limits = []
+        if self.max_agents is not None:
+            limits.append(int(self.max_agents))
+        if self.max_memory is not None:
+            limits.append(int(self.max_memory) // self.row_bytes())
+        return min(limits) if limits else None
+
+    def _admit(self, n_new:int) -> int:
+        """Return how many of n_new agents can be added without going over the cap"""
+        limit = self.agent_limit()
+        if limit is None or self.n + n_new <= limit:
+            return n_new
+        if self.overflow == "raise":
+            raise RuntimeError(f"Population cap reached: {self.n} agents + {n_new} new agents > {limit}")
+        admitted = max(0, limit - self.n)
+        self.n_refused += n_new - admitted
+        return admitted
+
+    def add(self, species_id:int, x, y, age=None, activated=None, **columns) -> None:
+        """Append agents of one species to the store
+
+        Args:
+            - species_id (int) : index of the species in the registry
+            - x (array) : x coordinates of the new agents
+            - y (array) : y coordinates of the new agents
+            - age (array) : age of the new agents, 0 if not provided
+            - activated (array) : activation status of the new agents, False if not provided
+            - columns (array) : values of other buffers of the store (e.g replica), 0 if not provided
+
+        """
+
+        # params
+        x = np.asarray(x, dtype=np.int64).reshape(-1)
+        y = np.asarray(y, dtype=np.int64).reshape(-1)
+        n = x.shape[0]
+        if age is None:
+            age = np.zeros(n, dtype=np.int64)
+        if activated is None:
+            activated = np.zeros(n, dtype=bool)
+
+        columns = {column:np.broadcast_to(value, (n,)) for column, value in columns.items()}
+
+        # agents over the cap
+        n = self._admit(n)
+        x, y = x[:n], y[:n]
+        age = np.asarray(age, dtype=np.int64).reshape(-1)[:n]
+        activated = np.asarray(activated, dtype=bool).reshape(-1)[:n]
+        columns = {column:value[:n] for column, value in columns.items()}
+
+        self.occupancy.add(x, y, columns.get(self.layer_column) if self.layer_column is not None else None)
+        self._append(species_id, x, y, age, activated, **columns)
+
+    def _append(self, species_id, x, y, age, activated, internal=None, **columns) -> None:
+        """Append rows to the arrays, without registering them in the occupancy grid
+        (the cap is checked by the callers, see _admit). species_id is a single id or one
+        id per row, so agents of every species are appended at once. internal is the
+        intracellular state of the new rows, initial state of the model if not provided,
+        columns the values of the other buffers (0 if not provided). With lineage tracking,
+        the lineage column holds the parent of each row (-1 for founders) and is replaced
+        by the lineage ids of the new agents."""
+        n, k = self.n, x.shape[0]
+        species = np.broadcast_to(np.asarray(species_id, dtype=np.int8), x.shape)
+        self._reserve(k)
+        for column, buffer in self.buffers.items():
+            if column not in COLUMN_DTYPES and column != "internal":
+                buffer[n:n + k] = columns.get(column, 0)
+        if self.model is not None:
+            self.buffers["internal"][n:n + k] = internal if internal is not None else self.model.initial_state(k)
+        self.buffers["x"][n:n + k] = x
+        self.buffers["y"][n:n + k] = y
+        self.buffers["age"][n:n + k] = np.asarray(age, dtype=np.int64).reshape(-1)
+        self.buffers["life_span"][n:n + k] = self.default_life_span[species]
+        self.buffers["activated"][n:n + k] = np.asarray(activated, dtype=bool).reshape(-1)
+        self.buffers["species"][n:n + k] = species
+        if self.lineage is not None:
+            self.buffers["lineage"][n:n + k] = self.lineage.register(np.broadcast_to(columns.get("lineage", -1), (k,)), species)
+        self.n = n + k
+
+    def keep(self, mask) -> None:
+        """Keep only the rows selected by mask
+
+        Args:
+            - mask (array) : boolean array, True for agents to keep
+
+        """
+        mask = np.asarray(mask, dtype=bool)
+        self.occupancy.remove(self.x[~mask], self.y[~mask], self._layer(~mask))
+        kept = np.flatnonzero(mask)
+        if self.lineage is not None:
+            self.lineage.record_deaths(self.lineage_ids[~mask])
+
+        # kept rows move to the front of the buffers, spare rows are reused by new agents
+        for buffer in self.buffers.values():
+            buffer[:kept.shape[0]] = buffer[kept]
+        self.n = kept.shape[0]
+
+    def set_model(self, model, internal:np.ndarray=None) -> None:
+        """Attach an intracellular model to the Bcells (see intracellular.BCellModel),
+        its state is stored as one row of the internal matrix per agent
+
+        Args:
+            - model (BCellModel) : intracellular model
+            - internal (np.ndarray) : (n_agents, n_states) states of the current agents,
+            initial state of the model if not provided
+
+        """
+        self.model = model
+        self.internal = np.asarray(internal, dtype=np.float64) if internal is not None else model.initial_state(len(self))
+
+    def restore(self, arrays:dict) -> None:
+        """Replace every column by the given arrays (e.g from a checkpoint) and rebuild the occupancy grid.
+        Arrays of the right type become the buffers of the store without copy (memory mapped
+        arrays stay mapped) until the store grows, other buffers are reset.
+
+        Args:
+            - arrays (dict) : column name as key, array as value
+
+        """
+        n = np.asarray(arrays["x"]).shape[0]
+        for column, buffer in self.buffers.items():
+            if column in COLUMN_DTYPES:
+                self.buffers[column] = np.asarray(arrays[column], dtype=COLUMN_DTYPES[column])
+            else:
+                self.buffers[column] = np.zeros((n,) + buffer.shape[1:], dtype=buffer.dtype)
+        self.n = n
+        self.capacity = n
+        self.occupancy = OccupancyGrid(self.grid_size, self.x, self.y)
+
+    @classmethod
+    def from_agents(cls, agent_list_list:list, grid_size:int, rng:np.random.Generator=None, registry:list=None, model=None):
+        """Build a Population from lists of agent objects
+
+        Args:
+            - agent_list_list (list) : list of list of agents, in the registry order, e.g [b_agents, t_agents, ...]
+            - grid_size (int) : grid_size (assume grid is a square)
+            - rng (np.random.Generator) : random generator used for every draw of the Population
+            - registry (list) : species registry, default registry if not provided
+            - model (BCellModel) : intracellular model, states are read from the internal
+            attribute of the agents (initial state for agents without one)
+
+        Returns:
+            - (Population) : the store holding all agents
+
+        """
+        population = cls(grid_size, rng, registry)
+        for species_id, agent_list in enumerate(agent_list_list):
+            population.add(
+                species_id,
+                [agent.x for agent in agent_list],
+                [agent.y for agent in agent_list],
+                [agent.age for agent in agent_list],
+                [getattr(agent, "activated", False) for agent in agent_list]
+            )
+            population.life_span[population.species == species_id] = [agent.life_span for agent in agent_list]
+        if model is not None:
+            initial = model.initial_state(1)[0]
+            population.set_model(model, np.array([getattr(agent, "internal", None) if getattr(agent, "internal", None) is not None else initial for agent_list in agent_list_list for agent in agent_list], dtype=np.float64).reshape(-1, model.n_states))
+        return population
+
+    def to_agents(self) -> list:
+        """Materialise the store as lists of independent agent objects
+
+        Returns:
+            - (list) : list of list of agents, in the registry order
+
+        """
+        agent_list_list = []
+        for species_id, species in enumerate(self.registry):
+            agent_list = []
+            for index in np.flatnonzero(self.species == species_id):
+                agent = new_agent(species, int(self.x[index]), int(self.y[index]), self.grid_size)
+                agent.age = int(self.age[index])
+                agent.life_span = int(self.life_span[index])
+                if self.activated[index]:
+                    activate_agent(agent)
+                if self.model is not None and species_id == B_CELL:
+                    agent.internal = self.internal[index].copy()
+                if self.lineage is not None:
+                    agent.lineage_id = int(self.lineage_ids[index])
+                agent_list.append(agent)
+            agent_list_list.append(agent_list)
+        return agent_list_list
+
+    def view(self, index:int):
+        """Return a thin view (instance of the original agent class) on one row"""
+        return view_class(self.registry[self.species[index]]["agent_class"])(self, index)
+
+    def views(self, species_id:int) -> list:
+        """Return thin views on every agent of one species"""
+        return [self.view(index) for index in np.flatnonzero(self.species == species_id)]
+
+    def frame_groups(self) -> list:
+        """Return one (x, y, colors) tuple per species, as expected by displayer.FrameRenderer"""
+        groups = []
+        for species_id, parameters in enumerate(self.parameters):
+            mask = self.species == species_id
+            colors = np.where(self.activated[mask], 'red', parameters["color"])
+            groups.append((self.x[mask], self.y[mask], colors))
+        return groups
+
+    def count(self) -> np.ndarray:
+        """Return the number of agents of each species"""
+        return np.bincount(self.species, minlength=len(self.registry))
+
+    def init_random_age(self) -> None:
+        """assign a random age to cells, used at the begining of the simulation"""
+        self.age = self.rng.integers(0, self.life_span + 1)
+
+    def _layer(self, index=slice(None)):
+        """Return the occupancy layer of the rows selected by index, None for a single grid"""
+        if self.layer_column is None:
+            return None
+        return self.buffers[self.layer_column][:self.n][index]
+
+    def _displacements(self):
+        """Draw the random (dx, dy) steps of every agent, in one batch from the Population generator"""
+        return self.rng.integers(-1, 2, size=(2, len(self)))
+
+    def move(self) -> None:
+        """Random move of every agent, vertical step scaled by the species speed.
+        All displacements are drawn in one batch from the Population generator."""
+        dx, dy = self._displacements()
+        dy = dy * self.speed[self.species]
+        x = np.clip(self.x + dx, 0, self.grid_size - 1)
+        y = np.clip(self.y + dy, 0, self.grid_size - 1)
+        self.occupancy.move(self.x, self.y, x, y, self._layer())
+        self.x = x
+        self.y = y
+
+    def get_older(self) -> None:
+        self.age += 1
+
+    def drop_old_cell(self) -> None:
+        """Drop cells that exceed their lifespan"""
+        self.keep(self.age <= self.life_span)
+
+    def detect_interaction(self, interaction_treshold:float=2, method:str="grid") -> None:
+        """Activate Bcells with a Tcell nearby
+
+        Args:
+            - interaction_treshold (float) : max distance between a Bcell and a Tcell for activation
+            - method (str) : 'grid' to use a spatial index built on the Tcells, 'brute'
+            to compute every Bcell / Tcell distance (kept for validation)
+
+        """
+
+        # params
+        b_index = np.flatnonzero(self.species == B_CELL)
+        t_index = np.flatnonzero(self.species == T_CELL)
+        if b_index.shape[0] == 0 or t_index.shape[0] == 0:
+            return
+
+        # indexed search
+        if method == "grid":
+            index = CellIndex(self.x[t_index], self.y[t_index], interaction_treshold)
+            contact = index.has_neighbour(self.x[b_index], self.y[b_index], interaction_treshold)
+
+        # pairwise distances
+        else:
+            dx = self.x[b_index][:, None] - self.x[t_index][None, :]
+            dy = self.y[b_index][:, None] - self.y[t_index][None, :]
+            contact = (np.sqrt(dx*dx + dy*dy) <= interaction_treshold).any(axis=1)
+
+        self.activated[b_index[contact]] = True
+
+    def apply_interactions(self, rules:list) -> None:
+        """Apply the pairwise interaction rules to every agent (see interactions.evaluate_interactions),
+        activated agents are updated and dead agents removed
+
+        Args:
+            - rules (list) : rules returned by interactions.load_interactions
+
+        """
+        self.activated, alive = evaluate_interactions(rules, self.x, self.y, self.species, self.activated)
+        if not alive.all():
+            self.keep(alive)
+
+    def update_internal(self, fields:list=None, interaction_treshold:float=2) -> None:
+        """Integrate the intracellular model of every Bcell over one step, then activate
+        Bcells whose model says so. Tcell contact and cytokine fields are the inputs of the model.
+
+        Args:
+            - fields (list) : cytokine fields, see fields.load_fields
+            - interaction_treshold (float) : max distance between a Bcell and a Tcell for a contact
+
+        """
+
+        # params
+        b_index = np.flatnonzero(self.species == B_CELL)
+        t_index = np.flatnonzero(self.species == T_CELL)
+        if b_index.shape[0] == 0:
+            return
+
+        # batched integration
+        inputs = bcell_inputs(self.x[b_index], self.y[b_index], self.x[t_index], self.y[t_index], fields, interaction_treshold)
+        self.internal[b_index] = self.model.integrate(self.internal[b_index], inputs)
+        self.activated[b_index[self.model.activated(self.internal[b_index])]] = True
+
+    def look_for_division(self, treshold:float=2, method:str="grid", chunk_size:int=1024) -> None:
+        """Divide cells with no other cell nearby
+
+        Args:
+            - treshold (float) : min distance to any other cell required for division
+            - method (str) : 'grid' to look up the occupancy grid and place the daughter
+            cell on a free neighbouring site, 'brute' to compute every pairwise distance
+            and place the daughter cell at x+1 (kept for validation)
+            - chunk_size (int) : number of rows compared at once by the 'brute' method
+
+        """
+
+        # params
+        n = len(self)
+
+        # occupancy lookup, only the agent itself in its neighbourhood
+        if method == "grid":
+            ready = (self.occupancy.neighbour_count(self.x, self.y, treshold, self._layer()) == 1) & self._division_allowed()
+            parents = np.flatnonzero(ready)
+            site_x, site_y, placed = self.occupancy.claim_daughter_sites(self.x[parents], self.y[parents], self._layer(parents))
+            parents, site_x, site_y = parents[placed], site_x[placed], site_y[placed]
+
+            # daughters over the cap are not created, their sites are released
+            try:
+                n_new = self._admit(parents.shape[0])
+            except RuntimeError:
+                self.occupancy.remove(site_x, site_y, self._layer(parents))
+                raise
+            self.occupancy.remove(site_x[n_new:], site_y[n_new:], self._layer(parents[n_new:]))
+            parents, site_x, site_y = parents[:n_new], site_x[:n_new], site_y[:n_new]
+
+            # daughters appended grouped by species, in one call
+            order = np.argsort(self.species[parents], kind="stable")
+            parents, site_x, site_y = parents[order], site_x[order], site_y[order]
+            self._append(self.species[parents], site_x, site_y, np.zeros(parents.shape[0], dtype=np.int64), np.zeros(parents.shape[0], dtype=bool), self._divide_internal(parents), **self._inherited(parents))
+            return
+
+        # look for neighbours, chunk by chunk
+        ready_for_division = np.ones(n, dtype=bool)
+        for start in range(0, n, chunk_size):
+            stop = min(start + chunk_size, n)
+            dx = self.x[start:stop][:, None] - self.x[None, :]
+            dy = self.y[start:stop][:, None] - self.y[None, :]
+            close = (dx*dx + dy*dy) <= treshold*treshold
+            close[np.arange(stop - start), np.arange(start, stop)] = False
+            ready_for_division[start:stop] = ~close.any(axis=1)
+
+        # cell division
+        parents = np.flatnonzero(ready_for_division & self._division_allowed())
+        for species_id in np.unique(self.species[parents]):
+            selected = parents[self.species[parents] == species_id]
+            selected = selected[:self._admit(selected.shape[0])]
+            internal = self._divide_internal(selected)
+            self.occupancy.add(self.x[selected] + 1, self.y[selected], self._layer(selected))
+            self._append(species_id, self.x[selected] + 1, self.y[selected], np.zeros(selected.shape[0], dtype=np.int64), np.zeros(selected.shape[0], dtype=bool), internal, **self._inherited(selected))
+
+    def _inherited(self, parents:np.ndarray) -> dict:
+        """Return the values of the other buffers (e.g replica) given by parents to their daughters"""
+        return {column:self.buffers[column][:self.n][parents] for column in self.buffers if column not in COLUMN_DTYPES and column != "internal"}
+
+    def _division_allowed(self) -> np.ndarray:
+        """Return True for agents whose species divides and, with an intracellular model,
+        for Bcells whose model allows division"""
+        allowed = self.divides[self.species]
+        if self.model is not None:
+            b_index = np.flatnonzero(self.species == B_CELL)
+            allowed[b_index] &= self.model.ready_for_division(self.internal[b_index])
+        return allowed
+
+    def _divide_internal(self, parents:np.ndarray):
+        """Update the intracellular state of dividing agents, returns the state of their daughters"""
+        if self.model is None:
+            return None
+        self.internal[parents] = self.model.after_division(self.internal[parents])
+        return self.internal[parents].copy()
+
+
+def _buffer_property(column:str):
+    """Craft a property exposing the rows in use of one buffer of the Population"""
+
+    def getter(self):
+        return self.buffers[column][:self.n]
+
+    def setter(self, value):
+        self._set_column(column, value)
+
+    return property(getter, setter)
+
+
+for _column in COLUMNS:
+    setattr(Population, _column, _buffer_property(_column))
@@ -0,0 +1,122 @@
+# load usual dependencies
+import time
+import cProfile
+import pstats
+import json
+import contextlib
+
+
+# phases of a simulation step, recorded in the metrics as time_<phase> (the last three are
+# the outputs written after the metrics of the step: live telemetry, checkpoint & trajectory)
+STEP_PHASES = ["interaction", "division", "death", "movement", "fields", "render", "telemetry", "checkpoint", "trajectory"]
+
+# shared no-op context, returned by a disabled Profiler
+_NO_TIMER = contextlib.nullcontext()
+
+
+class _Timer:
+    """Context manager adding its duration to a phase of the profiler"""
+
+    def __init__(self, profiler, name:str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration = time.perf_counter() - self.start
+        self.profiler.timings[self.name] = self.profiler.timings.get(self.name, 0.0) + duration
+        self.profiler.totals[self.name] = self.profiler.totals.get(self.name, 0.0) + duration
+
+
+class Profiler:
+    """Named timers and counters around the phases of a simulation step.
+    When disabled, phase() returns a shared no-op context and count() returns at
+    once, so the instrumentation costs almost nothing.
+    Optionally runs cProfile over a window of steps and calls user callbacks at the
+    end of each step with the step number, its phase durations and its counters.
+    """
+
+    def __init__(self, enabled:bool=True, callbacks:list=None, profile_steps:tuple=None, profile_file:str=None):
+        self.enabled = enabled
+        self.callbacks = list(callbacks or [])
+        self.profile_steps = tuple(profile_steps) if profile_steps else None
+        self.profile_file = profile_file
+        self.profile = None
+        self.timings = {}
+        self.counters = {}
+        self.totals = {}
+
+    def columns(self) -> list:
+        """Extra metrics columns filled by the profiler"""
+        if not self.enabled:
+            return []
+        return [f"time_{phase}" for phase in STEP_PHASES] + ["n_agents"]
+
+    def phase(self, name:str):
+        """Context manager timing one phase, e.g with profiler.phase('division'): ..."""
+        if not self.enabled:
+            return _NO_TIMER
+        return _Timer(self, name)
+
+    def count(self, name:str, value) -> None:
+        """Set a counter of the current step"""
+        if self.enabled:
+            self.counters[name] = value
+
+    def start_step(self, step:int) -> None:
+        """Reset per step timers & counters, start cProfile at the beginning of the window"""
+        if not self.enabled:
+            return
+        self.timings = {}
+        self.counters = {}
+        if self.profile_steps is not None and step == self.profile_steps[0]:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    def end_step(self, step:int) -> dict:
+        """Close the step: call callbacks, stop cProfile at the end of the window
+
+        Args:
+            - step (int) : step number, as given to start_step
+
+        Returns:
+            - (dict) : values of the extra metrics columns for this step
+
+        """
+        if not self.enabled:
+            return {}
+        for callback in self.callbacks:
+            callback(step, self.timings, self.counters)
+        if self.profile is not None and step + 1 >= self.profile_steps[1]:
+            self.profile.disable()
+            self.dump_profile()
+            self.profile = None
+        values = {f"time_{phase}":self.timings.get(phase, 0.0) for phase in STEP_PHASES}
+        values["n_agents"] = self.counters.get("n_agents", 0)
+        return values
+
+    def dump_profile(self) -> None:
+        """Save the cProfile window as a .prof file (readable by snakeviz, flameprof ...)
+        and a text report sorted by cumulative time"""
+        if self.profile is None or self.profile_file is None:
+            return
+        self.profile.dump_stats(self.profile_file)
+        with open(f"{self.profile_file}.txt", "w") as f:
+            stats = pstats.Stats(self.profile, stream=f)
+            stats.sort_stats("cumulative").print_stats(50)
+
+    def save_totals(self, output_file:str) -> None:
+        """Save the total time spent in each phase over the run as a json file"""
+        if self.enabled:
+            with open(output_file, "w") as f:
+                json.dump(self.totals, f, indent=2)
+
+    def close(self) -> None:
+        """Stop and dump a cProfile window still open at the end of the run"""
+        if self.profile is not None:
+            self.profile.disable()
+            self.dump_profile()
+            self.profile = None
@@ -0,0 +1,154 @@
+# load usual dependencies
+import numpy as np
+import matplotlib.colors as mcolors
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# load modules
+import displayer
+from trajectory import TrajectoryReader
+
+
+def _species_colors(reader:TrajectoryReader, colors:dict=None) -> list:
+    """Return the color of each species id, recorded colors overridden by colors (species name as key)"""
+    recorded = reader.colors if reader.colors is not None else ["black"] * len(reader.species)
+    return [(colors or {}).get(name, color) for name, color in zip(reader.species, recorded)]
+
+
+def _render_chunk(arguments:dict) -> list:
+    """Render the frames of a chunk of steps, in a worker process. The trajectory is
+    opened (memory mapped) by the worker, only steps and file names are sent to it.
+
+    Args:
+        - arguments (dict) : trajectory_folder, steps, species_colors, render, scale, figsize,
+        images_folder (png saved there if not None) and return_frames
+
+    Returns:
+        - (list) : RGB frames of the steps if return_frames, else an empty list
+
+    """
+
+    # params
+    reader = TrajectoryReader(arguments["trajectory_folder"])
+    palettes = [np.array([[int(255 * c) for c in mcolors.to_rgb(color)] for color in [species_color, 'red']], dtype=np.uint8) for species_color in arguments["species_colors"]]
+    renderer = displayer.FrameRenderer(reader.grid_size, arguments["render"], arguments["scale"], arguments["figsize"])
+    frames = []
+
+    try:
+        for step in arguments["steps"]:
+
+            # one group per species, activated cells in red as in the simulation
+            records = np.array(reader.load_step(step))
+            order = np.argsort(records["species"], kind="stable")
+            bounds = np.searchsorted(records["species"][order], np.arange(len(palettes) + 1))
+            groups = []
+            for species_id, palette in enumerate(palettes):
+                selected = order[bounds[species_id]:bounds[species_id + 1]]
+                groups.append((records["x"][selected], records["y"][selected], palette[records["activated"][selected].astype(np.int64)]))
+
+            frame = renderer.draw(groups)
+            if arguments["images_folder"] is not None:
+                displayer.save_frame(frame, f"{arguments['images_folder']}/step_{step}.png")
+            if arguments["return_frames"]:
+                frames.append(frame)
+    finally:
+        renderer.close()
+
+    return frames
+
+
+def render_trajectory(output_folder:str, render:str="raster", steps:list=None, colors:dict=None, scale:int=None, figsize:tuple=(5, 5), save_frames:bool=True, animation_file:str=None, n_workers:int=None, chunk_size:int=16) -> int:
+    """Render the frames of a recorded trajectory (see simple_run.run_simulation, trajectory_every)
+    without running the model again. Steps are split in chunks rendered by a pool of
+    worker processes, frames are saved as png in the images folder and / or streamed in
+    step order to an animation file. At most 2 chunks per worker are pending at once,
+    so memory does not depend on the number of steps.
+
+    Args:
+        - output_folder (str) : output folder of the simulation, containing the trajectory folder
+        - render (str) : 'raster' or 'scatter', see displayer.FrameRenderer
+        - steps (list) : steps to render, every recorded step by default
+        - colors (dict) : color of species, species name as key, default to the recorded colors
+        - scale (int) : pixels per site of the raster mode, see displayer.FrameRenderer
+        - figsize (tuple) : figure size of the scatter mode
+        - save_frames (bool) : save each frame as a png in the images folder
+        - animation_file (str) : if provided, frames are streamed to this gif (or mp4) file
+        - n_workers (int) : number of worker processes, default to the number of cores, 0 to
+        render in this process
+        - chunk_size (int) : number of steps rendered by a worker at once
+
+    Returns:
+        - (int) : number of rendered frames
+
+    """
+
+    # params
+    trajectory_folder = f"{output_folder}/trajectory"
+    reader = TrajectoryReader(trajectory_folder)
+    steps = [int(step) for step in (reader.steps if steps is None else steps)]
+    n_workers = os.cpu_count() if n_workers is None else n_workers
+    images_folder = f"{output_folder}/images" if save_frames else None
+    if images_folder is not None and not os.path.isdir(images_folder):
+        os.mkdir(images_folder)
+
+    # one job per chunk of steps
+    jobs = [{
+        "trajectory_folder":trajectory_folder,
+        "steps":steps[start:start + chunk_size],
+        "species_colors":_species_colors(reader, colors),
+        "render":render,
+        "scale":scale,
+        "figsize":figsize,
+        "images_folder":images_folder,
+        "return_frames":animation_file is not None
+    } for start in range(0, len(steps), chunk_size)]
+
+    animation_writer = displayer.AnimationWriter(animation_file) if animation_file is not None else None
+    try:
+
+        # render in this process
+        if n_workers == 0:
+            for job in jobs:
+                for frame in _render_chunk(job):
+                    animation_writer.append(frame)
+
+        # render in worker processes, frames received in step order
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                pending = []
+                for job in jobs:
+                    pending.append(executor.submit(_render_chunk, job))
+                    if len(pending) >= 2 * n_workers:
+                        for frame in pending.pop(0).result():
+                            animation_writer.append(frame)
+                for future in pending:
+                    for frame in future.result():
+                        animation_writer.append(frame)
+    finally:
+        if animation_writer is not None:
+            animation_writer.close()
+
+    return len(steps)
+
+
+def run(output_folder:str, animation_file:str=None) -> None:
+    """Render every recorded step of a simulation, then craft the animation from the
+    png files (or stream it when animation_file is provided)
+
+    Args:
+        - output_folder (str) : output folder of the simulation
+        - animation_file (str) : path to the animation, frames are streamed to it without png
+
+    """
+    if animation_file is None:
+        render_trajectory(output_folder)
+        displayer.craft_simulation_animation(f"{output_folder}/images", f"{output_folder}/figures/simulation.gif")
+    else:
+        render_trajectory(output_folder, save_frames=False, animation_file=animation_file)
+
+
+if __name__ == "__main__":
+
+    # python render.py output_folder [animation_file]
+    run(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
@@ -0,0 +1,170 @@
+# load usual dependencies
+import numpy as np
+import math
+import os
+
+# load modules
+from population import Population, B_CELL, T_CELL
+from species import load_species
+from spatial import CellIndex, OccupancyGrid
+from metrics import ReplicaMetricsTable
+
+
+class ReplicaPopulation(Population):
+    """Agents of n_replicas independent simulations of one configuration in a single
+    Population store: every agent has a replica column, the occupancy grid has one
+    layer per replica and contacts are searched on positions shifted by replica, so
+    replicas never see each other while every step is still one numpy operation over
+    every agent of every replica.
+    Each replica draws from its own generator, default_rng([seed, replica]), in the
+    same order as a single simulation: replica r follows exactly the run of the arrays
+    engine of run_simulation with seed [seed, r].
+    """
+
+    layer_column = "replica"
+
+    def __init__(self, grid_size:int, n_replicas:int, seed:int, registry:list=None):
+        super().__init__(grid_size, None, registry)
+        self.n_replicas = n_replicas
+        self.seed = seed
+        self.rngs = [np.random.default_rng([seed, replica]) for replica in range(n_replicas)]
+        self.buffers["replica"] = np.zeros(0, dtype=np.int32)
+        self.occupancy = OccupancyGrid(grid_size, n_layers=n_replicas)
+
+    @property
+    def replica(self) -> np.ndarray:
+        """Replica of each agent"""
+        return self.buffers["replica"][:self.n]
+
+    def _replica_rows(self) -> list:
+        """Return the rows of each replica, in store order"""
+        order = np.argsort(self.replica, kind="stable")
+        bounds = np.searchsorted(self.replica[order], np.arange(self.n_replicas + 1))
+        return [order[bounds[replica]:bounds[replica + 1]] for replica in range(self.n_replicas)]
+
+    def populate(self, initial_counts:list) -> None:
+        """Draw the initial agents of every replica, as run_simulation does for one
+        simulation: positions of each species, then ages, from the replica generator
+
+        Args:
+            - initial_counts (list) : initial number of agents of each species of the registry
+
+        """
+
+        # params
+        counts = [int(count) for count in initial_counts]
+        bounds = np.concatenate([[0], np.cumsum(counts)])
+        life_spans = np.repeat([self.default_life_span[species_id] for species_id in range(len(counts))], counts).astype(np.int64)
+        positions = np.zeros((self.n_replicas, bounds[-1], 2), dtype=np.int64)
+        ages = np.zeros((self.n_replicas, bounds[-1]), dtype=np.int64)
+
+        # draws of each replica
+        for replica, rng in enumerate(self.rngs):
+            for species_id, count in enumerate(counts):
+                positions[replica, bounds[species_id]:bounds[species_id + 1]] = rng.integers(0, self.grid_size, size=(count, 2))
+            ages[replica] = rng.integers(0, life_spans + 1)
+
+        # one add per species for every replica, rows of a replica keep the order of a single run
+        for species_id in range(len(counts)):
+            rows = slice(bounds[species_id], bounds[species_id + 1])
+            self.add(species_id, positions[:, rows, 0].reshape(-1), positions[:, rows, 1].reshape(-1), ages[:, rows].reshape(-1), replica=np.repeat(np.arange(self.n_replicas), counts[species_id]))
+
+    def _displacements(self):
+        """Draw the random (dx, dy) steps of every agent, one batch per replica from its generator"""
+        dx = np.zeros(self.n, dtype=np.int64)
+        dy = np.zeros(self.n, dtype=np.int64)
+        for replica, rows in enumerate(self._replica_rows()):
+            dx[rows], dy[rows] = self.rngs[replica].integers(-1, 2, size=(2, rows.shape[0]))
+        return dx, dy
+
+    def detect_interaction(self, interaction_treshold:float=2) -> None:
+        """Activate Bcells with a Tcell nearby, in the same replica
+
+        Args:
+            - interaction_treshold (float) : max distance between a Bcell and a Tcell for activation
+
+        """
+
+        # params
+        b_index = np.flatnonzero(self.species == B_CELL)
+        t_index = np.flatnonzero(self.species == T_CELL)
+        if b_index.shape[0] == 0 or t_index.shape[0] == 0:
+            return
+
+        # replicas side by side, further apart than the threshold
+        x = self.x + self.replica.astype(np.int64) * (self.grid_size + math.ceil(interaction_treshold) + 1)
+        index = CellIndex(x[t_index], self.y[t_index], interaction_treshold)
+        contact = index.has_neighbour(x[b_index], self.y[b_index], interaction_treshold)
+        self.activated[b_index[contact]] = True
+
+    def replica_counts(self) -> np.ndarray:
+        """Return the (n_replicas, n_species) number of agents of each species in each replica"""
+        n_species = len(self.registry)
+        return np.bincount(self.replica.astype(np.int64) * n_species + self.species, minlength=self.n_replicas * n_species).reshape(self.n_replicas, n_species)
+
+    def replica_activated_b(self) -> np.ndarray:
+        """Return the number of activated Bcells in each replica"""
+        return np.bincount(self.replica[(self.species == B_CELL) & self.activated], minlength=self.n_replicas)
+
+
+def run_replicas(arguments:dict, n_replicas:int) -> np.ndarray:
+    """Run n_replicas replicas of one configuration together (see ReplicaPopulation), far
+    cheaper than n_replicas runs of run_simulation for small grids. Replicas are headless,
+    they follow the arrays engine without cytokine fields, intracellular model, interaction
+    rules, population cap or lineage tracking. Metrics are saved in output_folder/logs/replica_metrics.npz
+    (see metrics.load_replica_metrics).
+
+    Args:
+        - arguments (dict) : arguments of run_simulation (e.g from simple_run.simulation_arguments),
+        frames, checkpoints, profiling, telemetry and engine settings are ignored (a progress
+        bar is shown unless the frame_every output option is 0)
+        - n_replicas (int) : number of replicas
+
+    Returns:
+        - (np.ndarray) : (n_replicas, n_steps + 1, n_columns) metrics, columns of metrics.MetricsTable
+
+    """
+
+    # params
+    outputs = arguments.get("outputs") or {}
+    for key, value in [(k, arguments.get(k)) for k in ["cytokine_file", "intracellular", "interaction_file", "max_agents", "max_memory_mb"]] + [("lineage", outputs.get("lineage"))]:
+        if value:
+            raise ValueError(f"{key} is not supported by the replica engine")
+    output_folder = arguments["output_folder"]
+    grid_size = arguments["grid_size"]
+    n_steps = arguments["n_steps"]
+    seed = arguments.get("seed")
+    if seed is None:
+        seed = int(np.random.SeedSequence().generate_state(1)[0])
+    os.makedirs(f"{output_folder}/logs", exist_ok=True)
+
+    # species registry & initial number of agents of each species
+    registry = load_species(arguments.get("species_file"))
+    initial_counts = {k:v for k, v in arguments.items() if k.startswith("n_") and k.endswith("_agents")}
+    initial_counts.update(arguments.get("agent_counts") or {})
+
+    # init replicas & metrics
+    population = ReplicaPopulation(grid_size, n_replicas, seed, registry)
+    population.populate([initial_counts.get(species["count_key"], 0) for species in registry])
+    metrics = ReplicaMetricsTable(n_replicas, n_steps + 1, grid_size, [species["metric"] for species in registry])
+    metrics.record(0, population.replica_counts(), 0)
+
+    # progress bar, none in headless mode (tqdm is only imported to show it)
+    steps = range(n_steps)
+    if outputs.get("frame_every", 0) > 0:
+        from tqdm import tqdm
+        steps = tqdm(steps, desc="Simulation en cours (replicas)")
+
+    # Simulation, every replica at once
+    for i in steps:
+        population.detect_interaction()
+        population.look_for_division()
+        population.drop_old_cell()
+        population.move()
+        population.get_older()
+        metrics.record(i + 1, population.replica_counts(), population.replica_activated_b())
+
+    # save metrics in logs
+    metrics.save(f"{output_folder}/logs/replica_metrics.npz")
+
+    return metrics.data[:, :metrics.n_rows]
@@ -1,24 +1,70 @@
 # load usual dependencies
 import numpy as np
-import matplotlib.pyplot as plt
-from tqdm import tqdm
 import os
 import random
-import pandas as pd
-
-# load agents
-from agents.b_cell import LymphocyteB
-from agents.t_cell import LymphocyteT
-from agents.pathogen import Pathogen
-from agents.nk_cell import NaturalKiller
-from agents.neutro_cell import Neutrophile
-from agents.dendritic_cell import Dendritic
-from agents.macrophage_cell import Macrophage
-from agents.mastocyte_cell import Mastocyte
+import copy
 
 # load modules
-import displayer
+import config
 import environment
+from population import Population, B_CELL, T_CELL, OVERFLOW_POLICIES
+from species import load_species, new_agent
+from metrics import MetricsTable
+from checkpoint import save_checkpoint, load_checkpoint
+from profiling import Profiler
+from fields import load_fields, update_fields
+from intracellular import BCellModel
+from parallel import ParallelPopulation
+from writer import BackgroundWriter
+from trajectory import TrajectoryWriter
+from telemetry import TelemetryChannel
+from lineage import LineageTable
+from interactions import load_interactions
+from spatial import OccupancyGrid
+
+
+# converter and default of each parameter of a configuration file, see config.typed_configuration
+CONFIGURATION_PARAMETERS = {
+    "n_steps":(int, config.REQUIRED),
+    "output_folder":(str, config.REQUIRED),
+    "grid_size":(int, config.REQUIRED),
+    "engine":(config.choice(["objects", "arrays", "parallel"]), "objects"),
+    "seed":(int, None),
+    "frame_every":(int, 1),
+    "render":(config.choice(["scatter", "raster"]), "scatter"),
+    "animation":(config.choice(["png", "stream"]), "png"),
+    "metrics_csv":(config.boolean, False),
+    "checkpoint_every":(int, 0),
+    "profile":(config.boolean, False),
+    "profile_steps":(config.int_range, None),
+    "species_file":(str, None),
+    "cytokine_file":(str, None),
+    "intracellular":(config.boolean, False),
+    "n_workers":(int, None),
+    "n_tiles":(int, None),
+    "io_queue_size":(int, 8),
+    "trajectory_every":(int, 0),
+    "telemetry":(str, None),
+    "lineage":(config.boolean, False),
+    "interaction_file":(str, None),
+    "max_agents":(int, None),
+    "max_memory_mb":(float, None),
+    "overflow":(config.choice(OVERFLOW_POLICIES), "refuse")
+}
+
+# output options of run_simulation (frames, files written along the run) and their defaults
+OUTPUT_OPTIONS = {
+    "frame_every":1,
+    "render":"scatter",
+    "animation_file":None,
+    "save_frames":True,
+    "metrics_csv":False,
+    "io_queue_size":8,
+    "checkpoint_every":0,
+    "trajectory_every":0,
+    "telemetry":None,
+    "lineage":False
+}
 
 
 def parse_configuration(configuration_file:str)->dict:
@@ -29,9 +75,31 @@ def parse_configuration(configuration_file:str)->dict:
         - n_steps
         - output_folder
         - grid_size
-        - n_b_agents
-        - n_t_agents
-        - n_pathogen_agents
+        - the count_key of each species of the registry (n_b_agents, n_t_agents, n_pathogen_agents ...)
+    Optional parameters are:
+        - species_file (path to the species registry, default to ressources/species.csv)
+        - cytokine_file (path to the cytokine fields description, no field if missing)
+        - interaction_file (path to the pairwise interaction rules, Bcell / Tcell contact activation if missing)
+        - max_agents (int, cap on the number of agents of the arrays engine, no cap if missing)
+        - max_memory_mb (float, cap on the memory of the agent buffers of the arrays engine, no cap if missing)
+        - overflow ('refuse' or 'raise', what happens to new agents beyond the cap, default to 'refuse')
+        - intracellular (bool, drive Bcells with the intracellular model, default to False)
+        - n_workers (int, worker processes of the parallel engine, default to the number of cores)
+        - n_tiles (int, tiles of the parallel engine, default to 2 * n_workers)
+        - io_queue_size (int, max output jobs waiting for the background writer, 0 to write in the loop, default to 8)
+        - engine ('objects', 'arrays' or 'parallel', default to 'objects')
+        - seed (int, random generator seed, fresh seed if missing)
+        - frame_every (int, save a frame every frame_every steps, 0 for headless, default to 1)
+        - render ('scatter' or 'raster', default to 'scatter')
+        - animation ('png' to craft the gif from saved png, 'stream' to write the gif
+        during the simulation without png, default to 'png')
+        - metrics_csv (bool, export metrics as csv in addition to npz, default to False)
+        - checkpoint_every (int, save a checkpoint every checkpoint_every steps, 0 to disable, default to 0)
+        - profile (bool, record phase durations in the metrics, default to False)
+        - profile_steps (start:stop, window of steps run under cProfile)
+        - trajectory_every (int, record every agent in the trajectory folder every trajectory_every steps, 0 to disable, default to 0)
+        - telemetry (str, name of the live telemetry channel watched by telemetry_viewer, no telemetry if missing)
+        - lineage (bool, record the family tree of every agent in logs/lineage.npz, default to False)
 
     Args:
         - configuration_file (str) : path to configuration file, supposed to be a ces file with two columns : 'PARAMETER' and 'VALUE'
@@ -46,15 +114,7 @@ def parse_configuration(configuration_file:str)->dict:
     mandatory_params = [
         "n_steps",
         "output_folder",
-        "grid_size",
-        "n_b_agents",
-        "n_t_agents",
-        "n_pathogen_agents",
-        "n_nk_agents",
-        "n_neutro_agents",
-        "n_dendritic_agents",
-        "n_macrophage_agents",
-        "n_mastocyte_agents"
+        "grid_size"
     ]
 
     # check if config file exist
@@ -63,9 +123,10 @@ def parse_configuration(configuration_file:str)->dict:
         return configuration
 
     # load parameters from configuration
-    df = pd.read_csv(configuration_file)
-    for index, row in df.iterrows():
-        configuration[row['PARAMETER']] = row['VALUE']
+    configuration.update(config.read_configuration(configuration_file))
+
+    # one initial count per species of the registry
+    mandatory_params += [species["count_key"] for species in load_species(configuration.get('species_file'))]
 
     # look for mandatory parameters
     configuration['valid'] = True
@@ -78,7 +139,68 @@ def parse_configuration(configuration_file:str)->dict:
     return configuration
 
 
-def run_simulation(n_steps:int, output_folder:str, grid_size:int, n_b_agents:int, n_t_agents:int, n_pathogen_agents:int, n_nk_agents:int, n_neutro_agents:int, n_dendritic_agents:int, n_macrophage_agents:int, n_mastocyte_agents:int) -> None:
+def output_options(outputs:dict=None) -> dict:
+    """Complete output options with the defaults of OUTPUT_OPTIONS, raise a ValueError on
+    an unknown option
+
+    Args:
+        - outputs (dict) : output options, option name as key (see run_simulation)
+
+    Returns:
+        - (dict) : value of every output option
+
+    """
+    unknown = sorted(set(outputs or {}) - set(OUTPUT_OPTIONS))
+    if len(unknown) > 0:
+        raise ValueError(f"Unknown output options {unknown}, expected {list(OUTPUT_OPTIONS)}")
+    return {**OUTPUT_OPTIONS, **(outputs or {})}
+
+
+def agent_records(engine:str, population) -> np.ndarray:
+    """Return the current agents as trajectory records, see trajectory.TrajectoryWriter
+
+    Args:
+        - engine (str) : 'objects', 'arrays' or 'parallel'
+        - population (Population, ParallelPopulation or list) : agents, one list per species for the objects engine
+
+    Returns:
+        - (np.ndarray) : one record per agent
+
+    """
+    if engine == "arrays":
+        return TrajectoryWriter.records(population.x, population.y, population.age, population.species, population.activated)
+    if engine == "parallel":
+        columns = population.columns()
+        return TrajectoryWriter.records(columns["x"], columns["y"], columns["age"], columns["species"], columns["activated"])
+    agents = [agent for agent_list in population for agent in agent_list]
+    return TrajectoryWriter.records(
+        [a.x for a in agents], [a.y for a in agents], [a.age for a in agents],
+        np.repeat(np.arange(len(population)), [len(agent_list) for agent_list in population]),
+        [getattr(a, "activated", False) for a in agents]
+    )
+
+
+def agent_positions(engine:str, population):
+    """Return the x and y coordinates of the current agents
+
+    Args:
+        - engine (str) : 'objects', 'arrays' or 'parallel'
+        - population (Population, ParallelPopulation or list) : agents, one list per species for the objects engine
+
+    Returns:
+        - (array) : x coordinates
+        - (array) : y coordinates
+
+    """
+    if engine == "arrays":
+        return population.x, population.y
+    if engine == "parallel":
+        columns = population.columns()
+        return columns["x"], columns["y"]
+    return [a.x for agent_list in population for a in agent_list], [a.y for agent_list in population for a in agent_list]
+
+
+def run_simulation(n_steps:int, output_folder:str, grid_size:int, n_b_agents:int, n_t_agents:int, n_pathogen_agents:int, n_nk_agents:int, n_neutro_agents:int, n_dendritic_agents:int, n_macrophage_agents:int, n_mastocyte_agents:int, engine:str="objects", seed:int=None, outputs:dict=None, profile:bool=False, profile_steps:tuple=None, callbacks:list=None, species_file:str=None, agent_counts:dict=None, cytokine_file:str=None, intracellular:bool=False, n_workers:int=None, n_tiles:int=None, interaction_file:str=None, max_agents:int=None, max_memory_mb:float=None, overflow:str="refuse", resume:dict=None) -> None:
     """Run Simulation
 
     Args:
@@ -93,6 +215,59 @@ def run_simulation(n_steps:int, output_folder:str, grid_size:int, n_b_agents:int
         - n_dendritic_agents (int) : number of dendritic cell at initial condition
         - n_macrophage_agents (int) : number of macrophage cell at initial condition
         - n_mastocyte_agents (int) : number of mastocyte cell at initial condition
+        - engine (str) : 'objects' to update one python object per agent, 'arrays' to
+        update all agents at once with the vectorized Population store, 'parallel' to
+        split the grid in tiles stepped by worker processes (see parallel.ParallelPopulation)
+        - seed (int) : seed of the random generator, two runs with the same seed give
+        the same results, use a fresh seed if not provided
+        - outputs (dict) : output options, missing ones take their OUTPUT_OPTIONS default:
+            - frame_every (int) : save a frame every frame_every steps, 0 for headless mode (no frame nor progress bar)
+            - render (str) : 'scatter' for one scatter per species on a reused figure, 'raster'
+            to draw agents straight into an RGB image (faster)
+            - animation_file (str) : if provided, frames are streamed to this gif (or mp4) file
+            while the simulation runs
+            - save_frames (bool) : save each frame as a png in the images folder, set to False
+            to skip the png to animation round trip when animation_file is used
+            - metrics_csv (bool) : also export the metrics as a csv file, next to the npz file
+            - io_queue_size (int) : max number of output jobs (frame files, animation frames,
+            checkpoints) waiting for the background writer before the simulation waits, 0 to
+            write outputs in the simulation loop
+            - checkpoint_every (int) : save a checkpoint in the checkpoints folder every checkpoint_every steps
+            (metrics are flushed to the logs folder at the same time), 0 to disable
+            - trajectory_every (int) : append the position, species, age and activation of every
+            agent to the trajectory folder every trajectory_every steps (see trajectory.TrajectoryReader
+            to load steps afterwards), 0 to disable
+            - telemetry (str) : name of a live telemetry channel, every step publishes its metrics and
+            a downsampled occupancy raster in shared memory for telemetry_viewer (see telemetry.TelemetryChannel)
+            - lineage (bool) : record the parent, birth and death step of every agent in a lineage table
+            saved as logs/lineage.npz (see lineage.LineageTable), not supported by the parallel engine
+        - profile (bool) : time each phase of each step, durations and population size are
+        added to the metrics and totals saved in logs/profile_totals.json
+        - profile_steps (tuple) : (start, stop) window of steps run under cProfile, report saved
+        in the logs folder (implies profile)
+        - callbacks (list) : functions called at the end of each step as callback(step, timings, counters)
+        (implies profile, not saved with checkpoints)
+        - species_file (str) : path to the species registry (csv), default to ressources/species.csv
+        - agent_counts (dict) : number of agents at initial condition of other species of
+        the registry, count_key as key
+        - cytokine_file (str) : path to the cytokine fields description (csv, see fields.load_fields),
+        secreted by agents, diffused and decayed each step, total of each field added to the metrics
+        - intracellular (bool) : drive Bcell activation and division with the intracellular
+        model (see intracellular.BCellModel) instead of the Tcell contact rule, mean
+        state of Bcells added to the metrics (not supported by the parallel engine)
+        - n_workers (int) : number of worker processes of the parallel engine, default to the
+        number of cores, 0 to step every tile in this process
+        - n_tiles (int) : number of tiles of the parallel engine, default to 2 * n_workers,
+        results only depend on seed and n_tiles
+        - interaction_file (str) : path to the pairwise interaction rules (csv, see interactions.load_interactions),
+        evaluated for every agent each step in place of the Bcell / Tcell contact activation
+        (not supported by the parallel engine)
+        - max_agents (int) : cap on the number of agents, arrays engine only, see population.Population.set_limits
+        - max_memory_mb (float) : cap on the memory of the agent buffers in MB, arrays engine only
+        - overflow (str) : 'refuse' to drop new agents beyond the cap (number of refused
+        agents added to the metrics), 'raise' to stop the simulation with an error
+        - resume (dict) : state loaded by checkpoint.load_checkpoint, the simulation continues
+        from there (see resume_from)
     
     """
 
@@ -106,125 +281,410 @@ def run_simulation(n_steps:int, output_folder:str, grid_size:int, n_b_agents:int
     if not os.path.isdir(f"{output_folder}/logs"):
         os.mkdir(f"{output_folder}/logs")
 
-    # Initialisation de la simulation
-    b_agents = [LymphocyteB(np.random.randint(0, grid_size), np.random.randint(0, grid_size), grid_size) for _ in range(n_b_agents)]
-    t_agents = [LymphocyteT(np.random.randint(0, grid_size), np.random.randint(0, grid_size), grid_size) for _ in range(n_t_agents)]
-    pathogen_agents = [Pathogen(np.random.randint(0, grid_size), np.random.randint(0, grid_size), grid_size) for _ in range(n_pathogen_agents)]
-    nk_agents = [NaturalKiller(np.random.randint(0, grid_size), np.random.randint(0, grid_size), grid_size) for _ in range(n_nk_agents)]
-    neutro_agents = [Neutrophile(np.random.randint(0, grid_size), np.random.randint(0, grid_size), grid_size) for _ in range(n_neutro_agents)]
-    dendritic_agents = [Dendritic(np.random.randint(0, grid_size), np.random.randint(0, grid_size), grid_size) for _ in range(n_dendritic_agents)]
-    macrophage_agents = [Macrophage(np.random.randint(0, grid_size), np.random.randint(0, grid_size), grid_size) for _ in range(n_macrophage_agents)]
-    mastocyte_agents = [Mastocyte(np.random.randint(0, grid_size), np.random.randint(0, grid_size), grid_size) for _ in range(n_mastocyte_agents)]
-
-    # init metrics
-    step_to_nb = [{"STEP":0, "VALUE":n_b_agents}]
-    step_to_nt = [{"STEP":0, "VALUE":n_t_agents}]
-    step_to_nab = [{"STEP":0, "VALUE":0}]
-    step_to_nnb = [{"STEP":0, "VALUE":0}]
-    step_to_n_total = [{"STEP":0,"VALUE":n_b_agents+n_t_agents}]
-    step_to_density = [{"STEP":0, "VALUE":float(n_b_agents+n_t_agents) / (grid_size*grid_size)}]
-
-    # init random age for cells
-    b_agents, t_agents, pathogen_agents, nk_agents, neutro_agents, dendritic_agents, macrophage_agents, mastocyte_agents = environment.init_random_age([b_agents, t_agents, pathogen_agents, nk_agents, neutro_agents, dendritic_agents, macrophage_agents, mastocyte_agents])
-
-    # Simulation
-    for i in tqdm(range(n_steps), desc="Simulation en cours"):
-
-        # init cmpts
-        n_activated_b = 0
-        n_naive_b = 0
-
-        # detect b activation
-        environment.detect_interaction(b_agents, t_agents)
-
-        # cell division
-        b_agents, t_agents, pathogen_agents, nk_agents, neutro_agents, dendritic_agents, macrophage_agents, mastocyte_agents = environment.look_for_division([b_agents, t_agents, pathogen_agents, nk_agents, neutro_agents, dendritic_agents, macrophage_agents, mastocyte_agents])
-
-        # drop old cells
-        b_agents, t_agents, pathogen_agents, nk_agents, neutro_agents, dendritic_agents, macrophage_agents, mastocyte_agents = environment.drop_old_cell([b_agents, t_agents, pathogen_agents, nk_agents, neutro_agents, dendritic_agents, macrophage_agents, mastocyte_agents])
-        
-        plt.figure(figsize=(5, 5))
-        plt.xlim(0, grid_size)
-        plt.ylim(0, grid_size)
-
-        # deal with b cells
-        for b_agent in b_agents:
-            b_agent.move()
-            b_agent.get_older()
-            plt.scatter(b_agent.x, b_agent.y, c=b_agent.color)
-
-            # compute nb of activated b cells
-            if b_agent.activated:
-                n_activated_b +=1
-            else:
-                n_naive_b += 1
-            
-        # deal wth t cells
-        for t_agent in t_agents:
-            t_agent.move()
-            t_agent.get_older()
-            plt.scatter(t_agent.x, t_agent.y, c=t_agent.color)
-
-        # deal with pathogen
-        for pathogen_agent in pathogen_agents:
-            pathogen_agent.move()
-            pathogen_agent.get_older()
-            plt.scatter(pathogen_agent.x, pathogen_agent.y, c=pathogen_agent.color)
-
-        # deal with nk cells
-        for nk_agent in nk_agents:
-            nk_agent.move()
-            nk_agent.get_older()
-            plt.scatter(nk_agent.x, nk_agent.y, c=nk_agent.color)
-            
-        # deal with neutrophile cells
-        for neutro_agent in neutro_agents:
-            neutro_agent.move()
-            neutro_agent.get_older()
-            plt.scatter(neutro_agent.x, neutro_agent.y, c=neutro_agent.color)
-
-        # deal with dendritic cells
-        for dendritic_agent in dendritic_agents:
-            dendritic_agent.move()
-            dendritic_agent.get_older()
-            plt.scatter(dendritic_agent.x, dendritic_agent.y, c=dendritic_agent.color)
-
-        # deal with macrophage cells
-        for macrophage_agent in macrophage_agents:
-            macrophage_agent.move()
-            macrophage_agent.get_older()
-            plt.scatter(macrophage_agent.x, macrophage_agent.y, c=macrophage_agent.color)
-
-        # deal with mastocyte cells
-        for mastocyte_agent in mastocyte_agents:
-            mastocyte_agent.move()
-            mastocyte_agent.get_older()
-            plt.scatter(mastocyte_agent.x, mastocyte_agent.y, c=mastocyte_agent.color)
-        
-        plt.savefig(f"{output_folder}/images/step_{i}.png")
-        plt.close()
-
-        # update metrics
-        step_to_nb.append({"STEP":i, "VALUE":len(b_agents)})
-        step_to_nt.append({"STEP":i, "VALUE":len(t_agents)})
-        step_to_nab.append({"STEP":i, "VALUE":n_activated_b})
-        step_to_nnb.append({"STEP":i, "VALUE":n_naive_b})
-        step_to_n_total.append({"STEP":i, "VALUE":len(b_agents)+len(t_agents)})
-        step_to_density.append({"STEP":i, "VALUE":float(len(b_agents)+len(t_agents)) / (grid_size*grid_size)})
+    # output options
+    outputs = output_options(outputs)
+    frame_every = outputs["frame_every"]
+    render = outputs["render"]
+    animation_file = outputs["animation_file"]
+    save_frames = outputs["save_frames"]
+    metrics_csv = outputs["metrics_csv"]
+    io_queue_size = outputs["io_queue_size"]
+    checkpoint_every = outputs["checkpoint_every"]
+    trajectory_every = outputs["trajectory_every"]
+    telemetry = outputs["telemetry"]
+    lineage = outputs["lineage"]
+
+    # species registry & initial number of agents of each species
+    registry = load_species(species_file)
+    initial_counts = {
+        "n_b_agents":n_b_agents, "n_t_agents":n_t_agents, "n_pathogen_agents":n_pathogen_agents,
+        "n_nk_agents":n_nk_agents, "n_neutro_agents":n_neutro_agents, "n_dendritic_agents":n_dendritic_agents,
+        "n_macrophage_agents":n_macrophage_agents, "n_mastocyte_agents":n_mastocyte_agents
+    }
+    initial_counts.update(agent_counts or {})
+    divides = [species["division"] != "none" for species in registry]
+
+    # cytokine fields
+    fields = load_fields(cytokine_file, grid_size, registry) if cytokine_file is not None else []
+    field_columns = [f"c_{cytokine['field'].name}" for cytokine in fields]
+
+    # intracellular model of Bcells
+    model = BCellModel() if intracellular else None
+    internal_columns = [f"mean_{name}" for name in model.state_names] if model is not None else []
+
+    # pairwise interaction rules
+    rules = load_interactions(interaction_file, registry) if interaction_file is not None else []
+
+    # the parallel engine draws from one generator per step & tile, derived from the seed
+    if engine == "parallel" and model is not None:
+        raise ValueError("The intracellular model is not supported by the parallel engine")
+    if engine == "parallel" and len(rules) > 0:
+        raise ValueError("Interaction rules are not supported by the parallel engine")
+    if engine == "parallel" and lineage:
+        raise ValueError("Lineage tracking is not supported by the parallel engine")
+
+    # cap on the population, enforced by the capacity managed buffers of the arrays engine
+    capped = max_agents is not None or max_memory_mb is not None
+    if capped and engine != "arrays":
+        raise ValueError("max_agents and max_memory_mb are only supported by the arrays engine")
+    cap_columns = ["n_refused"] if capped else []
+    if engine == "parallel" and seed is None:
+        seed = int(np.random.SeedSequence().generate_state(1)[0])
+
+    # run parameters, saved with checkpoints
+    parameters = {
+        "n_steps":n_steps, "output_folder":output_folder, "grid_size":grid_size,
+        "n_b_agents":n_b_agents, "n_t_agents":n_t_agents, "n_pathogen_agents":n_pathogen_agents,
+        "n_nk_agents":n_nk_agents, "n_neutro_agents":n_neutro_agents, "n_dendritic_agents":n_dendritic_agents,
+        "n_macrophage_agents":n_macrophage_agents, "n_mastocyte_agents":n_mastocyte_agents,
+        "engine":engine, "seed":seed, "outputs":outputs, "profile":profile,
+        "profile_steps":list(profile_steps) if profile_steps is not None else None,
+        "species_file":species_file, "agent_counts":agent_counts, "cytokine_file":cytokine_file,
+        "intracellular":intracellular, "n_workers":n_workers, "n_tiles":n_tiles,
+        "interaction_file":interaction_file, "max_agents":max_agents, "max_memory_mb":max_memory_mb,
+        "overflow":overflow
+    }
+
+    # phase timers, near no-op when profiling is disabled
+    profiler = Profiler(
+        profile or profile_steps is not None or bool(callbacks),
+        callbacks,
+        profile_steps,
+        f"{output_folder}/logs/profile_{profile_steps[0]}_{profile_steps[1]}.prof" if profile_steps is not None else None
+    )
+
+    # init metrics, one row per step plus the initial state
+    metrics = MetricsTable(n_steps + 1, grid_size, profiler.columns() + field_columns + internal_columns + cap_columns, [species["metric"] for species in registry])
+
+    if resume is None:
+
+        # random generator of the simulation, every draw comes from it
+        rng = np.random.default_rng(seed)
+
+        # Initialisation de la simulation, one agent list per species
+        agent_list_list = []
+        for species in registry:
+            positions = rng.integers(0, grid_size, size=(int(initial_counts.get(species["count_key"], 0)), 2)).tolist()
+            agent_list_list.append([new_agent(species, x, y, grid_size) for x, y in positions])
+
+        # init random age for cells
+        agent_list_list = environment.init_random_age(agent_list_list, rng)
+
+        # family tree, initial agents are founders
+        lineage_table = LineageTable() if lineage else None
+        if lineage_table is not None and engine == "objects":
+            environment.register_founders(agent_list_list, lineage_table)
+
+        # init metrics
+        metrics.record(0, [len(agent_list) for agent_list in agent_list_list], 0)
+
+        start = 0
+
+    else:
+
+        # restore state from checkpoint
+        rng = resume["rng"]
+        lineage_table = resume["population"].lineage
+        if model is not None:
+            resume["population"].set_model(model, resume["internal"])
+        if engine == "objects":
+            agent_list_list = resume["population"].to_agents()
+            if resume["colors"] is not None:
+                for agent, color in zip([a for agent_list in agent_list_list for a in agent_list], resume["colors"]):
+                    agent.color = color
+        for cytokine in fields:
+            cytokine["field"].values = np.array(resume["fields"][cytokine["field"].name])
+        metrics.restore(resume["metrics"])
+        start = resume["step"]
+
+    # occupancy grid of the agent objects, kept up to date along the run (rebuilt on resume)
+    occupancy = None
+    if engine == "objects":
+        occupancy = OccupancyGrid(grid_size, *agent_positions(engine, agent_list_list))
+
+    # switch to the vectorized store
+    if engine != "objects" and resume is not None:
+        population = resume["population"]
+    elif engine != "objects":
+        population = Population.from_agents(agent_list_list, grid_size, rng, registry, model)
+        if lineage_table is not None:
+            population.track_lineage(lineage_table)
+    if engine == "arrays":
+        population.set_limits(max_agents, int(max_memory_mb * 2**20) if max_memory_mb is not None else None, overflow)
+
+    # workers & outputs are created in the guarded block, so they are closed even when one of them fails
+    renderer = None
+    animation_writer = None
+    trajectory = None
+    channel = None
+    try:
+
+        # frame renderer & progress bar, none in headless mode (plotting modules and tqdm are only imported to draw frames)
+        steps = range(start, n_steps)
+        if frame_every > 0:
+            import displayer
+            from tqdm import tqdm
+            renderer = displayer.FrameRenderer(grid_size, render)
+            steps = tqdm(steps, desc="Simulation en cours", initial=start, total=n_steps)
+
+        # frames streamed to the animation file as soon as they are drawn
+        if renderer is not None and animation_file is not None:
+            animation_writer = displayer.AnimationWriter(animation_file)
+
+        # split the store in tiles
+        if engine == "parallel":
+            store = population
+            population = ParallelPopulation(grid_size, seed, n_tiles, n_workers, registry)
+            population.scatter(store)
+            population.step_number = start
+
+        # trajectory, steps recorded after the checkpoint of a resumed run are dropped
+        if trajectory_every > 0:
+            trajectory = TrajectoryWriter(f"{output_folder}/trajectory", grid_size, [species["name"] for species in registry], [species["color"] for species in registry], start if resume is not None else None)
+            if resume is None:
+                trajectory.append(0, agent_records(engine, population if engine != "objects" else agent_list_list))
+
+        # live telemetry, last recorded step published first
+        if telemetry is not None:
+            channel = TelemetryChannel(telemetry, metrics.columns, grid_size)
+            channel.publish(metrics.data[metrics.n_rows - 1], *agent_positions(engine, population if engine != "objects" else agent_list_list))
+
+        # output jobs run on a background thread
+        with BackgroundWriter(io_queue_size) as writer:
+
+            # Simulation
+            for i in steps:
+                profiler.start_step(i)
+                if lineage_table is not None:
+                    lineage_table.step = i + 1
+
+                if engine != "objects":
+
+                    # detect b activation
+                    with profiler.phase("interaction"):
+                        if model is not None:
+                            population.update_internal(fields)
+                        elif len(rules) == 0:
+                            population.detect_interaction()
+                        if len(rules) > 0:
+                            population.apply_interactions(rules)
+
+                    # cell division
+                    with profiler.phase("division"):
+                        population.look_for_division()
+
+                    # drop old cells
+                    with profiler.phase("death"):
+                        population.drop_old_cell()
+
+                    # move & get older (parallel engine: aging & migration between tiles in move)
+                    with profiler.phase("movement"):
+                        population.move()
+                        if engine == "arrays":
+                            population.get_older()
+
+                    # compute metrics
+                    species_counts = population.count()
+                    if engine == "arrays":
+                        n_activated_b = int(np.sum(population.activated[population.species == B_CELL]))
+                    else:
+                        n_activated_b = population.n_activated_b
+
+                else:
+
+                    # detect b activation
+                    with profiler.phase("interaction"):
+                        if model is not None:
+                            environment.update_internal(agent_list_list[B_CELL], agent_list_list[T_CELL], model, fields)
+                        elif len(rules) == 0:
+                            environment.detect_interaction(agent_list_list[B_CELL], agent_list_list[T_CELL])
+                        if len(rules) > 0:
+                            agent_list_list = environment.apply_interactions(agent_list_list, rules, occupancy)
+
+                    # cell division
+                    with profiler.phase("division"):
+                        agent_list_list = environment.look_for_division(agent_list_list, divides=divides, model=model, lineage=lineage_table, occupancy=occupancy)
+
+                    # drop old cells, agents missing from the lists died during the step
+                    with profiler.phase("death"):
+                        agent_list_list = environment.drop_old_cell(agent_list_list, occupancy)
+                        if lineage_table is not None:
+                            lineage_table.record_survivors([agent.lineage_id for agent_list in agent_list_list for agent in agent_list])
+
+                    # move & get older, a single pass over every species
+                    with profiler.phase("movement"):
+                        environment.move_agents(agent_list_list, rng, occupancy)
+
+                    # compute metrics
+                    species_counts = [len(agent_list) for agent_list in agent_list_list]
+                    n_activated_b = sum(1 for b_agent in agent_list_list[B_CELL] if b_agent.activated)
+
+                # secretion, diffusion & decay of cytokines
+                if len(fields) > 0:
+                    with profiler.phase("fields"):
+                        if engine == "arrays":
+                            update_fields(fields, population.x, population.y, population.species)
+                        elif engine == "parallel":
+                            columns = population.columns()
+                            update_fields(fields, columns["x"], columns["y"], columns["species"])
+                        else:
+                            agents = [agent for agent_list in agent_list_list for agent in agent_list]
+                            species_ids = np.repeat(np.arange(len(agent_list_list)), species_counts)
+                            update_fields(fields, np.array([a.x for a in agents], dtype=np.int64), np.array([a.y for a in agents], dtype=np.int64), species_ids)
+
+                # render frame
+                if renderer is not None and i % frame_every == 0:
+                    with profiler.phase("render"):
+                        if engine != "objects":
+                            groups = population.frame_groups()
+                        else:
+                            groups = [([a.x for a in agent_list], [a.y for a in agent_list], [a.color for a in agent_list]) for agent_list in agent_list_list]
+                        frame = renderer.draw(groups)
+                        if save_frames:
+                            writer.submit(displayer.save_frame, frame, f"{output_folder}/images/step_{i}.png")
+                        if animation_writer is not None:
+                            writer.submit(animation_writer.append, frame)
+
+                # update metrics
+                profiler.count("n_agents", int(np.sum(species_counts)))
+                field_totals = {column:cytokine["field"].total() for column, cytokine in zip(field_columns, fields)}
+                internal_means = {}
+                if model is not None:
+                    if engine == "arrays":
+                        internal = population.internal[population.species == B_CELL]
+                    else:
+                        internal = np.array([b.internal for b in agent_list_list[B_CELL]], dtype=np.float64).reshape(-1, model.n_states)
+                    internal_means = dict(zip(internal_columns, internal.mean(axis=0) if internal.shape[0] > 0 else np.zeros(model.n_states)))
+                cap_counts = {}
+                if capped:
+                    cap_counts = {"n_refused":population.n_refused}
+                    population.n_refused = 0
+                metrics.record(i + 1, species_counts, n_activated_b, **field_totals, **internal_means, **cap_counts)
+
+                # publish the step to the live telemetry
+                if channel is not None:
+                    with profiler.phase("telemetry"):
+                        channel.publish(metrics.data[metrics.n_rows - 1], *agent_positions(engine, population if engine != "objects" else agent_list_list))
+
+                # checkpoint & metrics flush, written from a copy of the state
+                if checkpoint_every > 0 and (i + 1) % checkpoint_every == 0:
+                    with profiler.phase("checkpoint"):
+                        field_values = {cytokine["field"].name:cytokine["field"].values.copy() for cytokine in fields}
+                        colors = None
+                        if engine == "arrays":
+                            snapshot = copy.deepcopy(population)
+                        elif engine == "parallel":
+                            snapshot = population.gather(copy.deepcopy(rng))
+                        else:
+                            colors = [agent.color for agent_list in agent_list_list for agent in agent_list]
+                            snapshot = Population.from_agents(agent_list_list, grid_size, copy.deepcopy(rng), registry, model)
+                            if lineage_table is not None:
+                                snapshot.track_lineage(copy.deepcopy(lineage_table), [agent.lineage_id for agent_list in agent_list_list for agent in agent_list])
+                        metrics_snapshot = copy.deepcopy(metrics)
+                        writer.submit(save_checkpoint, f"{output_folder}/checkpoints", i + 1, snapshot, metrics_snapshot, parameters, colors=colors, fields=field_values)
+                        writer.submit(metrics_snapshot.save, f"{output_folder}/logs/metrics.npz")
+
+                # record agents in the trajectory
+                if trajectory is not None and (i + 1) % trajectory_every == 0:
+                    with profiler.phase("trajectory"):
+                        writer.submit(trajectory.append, i + 1, agent_records(engine, population if engine != "objects" else agent_list_list))
+
+                # step timings, outputs included
+                metrics.update(**profiler.end_step(i))
+
+    finally:
+
+        # stop workers, release the figure, close the animation
+        if engine == "parallel" and isinstance(population, ParallelPopulation):
+            population.close()
+        if renderer is not None:
+            renderer.close()
+        if animation_writer is not None:
+            animation_writer.close()
+        if trajectory is not None:
+            trajectory.close()
+        if channel is not None:
+            channel.close()
 
     # save metrics in logs
-    df = pd.DataFrame(step_to_nb)
-    df.to_csv(f"{output_folder}/logs/nb_bcell.csv", index=False)
-    df = pd.DataFrame(step_to_nt)
-    df.to_csv(f"{output_folder}/logs/nb_tcell.csv", index=False)
-    df = pd.DataFrame(step_to_nab)
-    df.to_csv(f"{output_folder}/logs/nb_activated_bcell.csv", index=False)
-    df = pd.DataFrame(step_to_nnb)
-    df.to_csv(f"{output_folder}/logs/nb_naive_bcell.csv", index=False)
-    df = pd.DataFrame(step_to_n_total)
-    df.to_csv(f"{output_folder}/logs/nb_total.csv", index=False)
-    df = pd.DataFrame(step_to_density)
-    df.to_csv(f"{output_folder}/logs/density.csv", index=False)
+    with profiler.phase("save_metrics"):
+        metrics.save(f"{output_folder}/logs/metrics.npz")
+        if metrics_csv:
+            metrics.to_csv(f"{output_folder}/logs/metrics.csv")
+        if lineage_table is not None:
+            lineage_table.save(f"{output_folder}/logs/lineage.npz")
+
+    # save profiling
+    profiler.close()
+    profiler.save_totals(f"{output_folder}/logs/profile_totals.json")
+
+
+def simulation_arguments(configuration:dict) -> dict:
+    """Convert a parsed configuration into the arguments of run_simulation, raise a
+    ValueError when a value does not match CONFIGURATION_PARAMETERS
+
+    Args:
+        - configuration (dict) : configuration returned by parse_configuration
+
+    Returns:
+        - (dict) : arguments of run_simulation, optional parameters set to their default when missing
+
+    """
+
+    # params
+    species_file = str(configuration['species_file']) if 'species_file' in configuration else None
+    named_counts = ["n_b_agents", "n_t_agents", "n_pathogen_agents", "n_nk_agents", "n_neutro_agents", "n_dendritic_agents", "n_macrophage_agents", "n_mastocyte_agents"]
+    count_keys = [species["count_key"] for species in load_species(species_file)]
+    typed = config.typed_configuration(configuration, {**CONFIGURATION_PARAMETERS, **{k:(int, 0) for k in named_counts + count_keys}})
+    stream_animation = typed['animation'] == 'stream'
+
+    return {
+        "n_steps":typed['n_steps'],
+        "output_folder":typed['output_folder'],
+        "grid_size":typed['grid_size'],
+        **{k:typed[k] for k in named_counts},
+        "engine":typed['engine'],
+        "seed":typed['seed'],
+        "outputs":{
+            "frame_every":typed['frame_every'],
+            "render":typed['render'],
+            "animation_file":f"{typed['output_folder']}/figures/simulation.gif" if stream_animation else None,
+            "save_frames":not stream_animation,
+            "metrics_csv":typed['metrics_csv'],
+            "io_queue_size":typed['io_queue_size'],
+            "checkpoint_every":typed['checkpoint_every'],
+            "trajectory_every":typed['trajectory_every'],
+            "telemetry":typed['telemetry'],
+            "lineage":typed['lineage']
+        },
+        "profile":typed['profile'],
+        "profile_steps":typed['profile_steps'],
+        "species_file":typed['species_file'],
+        "agent_counts":{k:typed[k] for k in count_keys if k not in named_counts},
+        "cytokine_file":typed['cytokine_file'],
+        "intracellular":typed['intracellular'],
+        "n_workers":typed['n_workers'],
+        "n_tiles":typed['n_tiles'],
+        "interaction_file":typed['interaction_file'],
+        "max_agents":typed['max_agents'],
+        "max_memory_mb":typed['max_memory_mb'],
+        "overflow":typed['overflow']
+    }
+
+
+def create_representations(arguments:dict) -> None:
+    """Plot the logs and craft the animation of a finished simulation
+
+    Args:
+        - arguments (dict) : arguments given to run_simulation
+
+    """
+    import displayer
+    output_folder = arguments["output_folder"]
+    outputs = output_options(arguments.get("outputs"))
+    displayer.display_logs(f"{output_folder}/logs", f"{output_folder}/figures/logs.png")
+    if outputs["frame_every"] > 0 and outputs["save_frames"]:
+        displayer.craft_simulation_animation(f"{output_folder}/images", f"{output_folder}/figures/simulation.gif")
 
 
 def run(configuration_file:str):
@@ -242,24 +702,40 @@ def run(configuration_file:str):
     if configuration['valid']:
 
         # run
-        run_simulation(
-                       int(configuration['n_steps']),
-                       str(configuration['output_folder']),
-                       int(configuration['grid_size']),
-                       int(configuration['n_b_agents']),
-                       int(configuration['n_t_agents']),
-                       int(configuration['n_pathogen_agents']),
-                       int(configuration['n_nk_agents']),
-                       int(configuration['n_neutro_agents']),
-                       int(configuration['n_dendritic_agents']),
-                       int(configuration['n_macrophage_agents']),
-                       int(configuration['n_mastocyte_agents'])
-        )
+        arguments = simulation_arguments(configuration)
+        run_simulation(**arguments)
 
         # create representations
-        displayer.display_logs(f"{configuration['output_folder']}/logs", f"{configuration['output_folder']}/figures/logs.png")
-        displayer.craft_simulation_animation(f"{configuration['output_folder']}/images", f"{configuration['output_folder']}/figures/simulation.gif")
-    
+        create_representations(arguments)
+
+
+def resume_from(checkpoint:str, n_steps:int=None) -> None:
+    """Resume a simulation from a checkpoint and create associated graphical representations.
+    With the same n_steps, the result is identical to an uninterrupted run (a streamed
+    animation only contains frames drawn after the resume).
+
+    Args:
+        - checkpoint (str) : path to a checkpoint, or to the checkpoints folder of a run (last checkpoint is used)
+        - n_steps (int) : total number of steps, default to the n_steps of the interrupted run
+
+    """
+
+    # load state
+    state = load_checkpoint(checkpoint)
+    parameters = dict(state["parameters"])
+    if n_steps is not None:
+        parameters["n_steps"] = n_steps
+
+    # output options saved as flat parameters by older checkpoints
+    flat_outputs = {k:parameters.pop(k) for k in list(parameters) if k in OUTPUT_OPTIONS}
+    parameters["outputs"] = {**flat_outputs, **(parameters.get("outputs") or {})}
+
+    # run
+    run_simulation(**parameters, resume=state)
+
+    # create representations
+    create_representations(parameters)
+
 
 if __name__ == "__main__":
 
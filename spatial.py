@@ -0,0 +1,259 @@
+# load usual dependencies
+import numpy as np
+import math
+
+
+class CellIndex:
+    """Spatial hash of a set of points, using a sorted cell key layout:
+    points are bucketed in square cells of side cell_size, sorted by cell key,
+    and each bucket is a contiguous slice of the sorted arrays.
+    Built once per step, it turns a contact search into a scan of the
+    neighbouring buckets only.
+    """
+
+    def __init__(self, x, y, cell_size:float):
+        self.x = np.asarray(x).reshape(-1)
+        self.y = np.asarray(y).reshape(-1)
+        self.cell_size = cell_size
+
+        # cell coordinates, shifted so that they start at 0
+        if self.x.shape[0] > 0:
+            self.x_min = self.x.min()
+            self.y_min = self.y.min()
+            cy = ((self.y - self.y_min) // cell_size).astype(np.int64)
+            self.n_cells_y = int(cy.max()) + 1
+        else:
+            self.x_min = 0
+            self.y_min = 0
+            cy = np.zeros(0, dtype=np.int64)
+            self.n_cells_y = 1
+        cx = ((self.x - self.x_min) // cell_size).astype(np.int64)
+
+        # sort points by cell key
+        keys = cx * self.n_cells_y + cy
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.order]
+
+    def __len__(self):
+        return self.x.shape[0]
+
+    def query_pairs(self, qx, qy, radius:float):
+        """Find every (query point, indexed point) pair closer than radius
+
+        Args:
+            - qx (array) : x coordinates of the query points
+            - qy (array) : y coordinates of the query points
+            - radius (float) : max distance between the two points of a pair
+
+        Returns:
+            - (array) : index of the query point for each pair
+            - (array) : index of the indexed point for each pair
+
+        """
+
+        # params
+        qx = np.asarray(qx).reshape(-1)
+        qy = np.asarray(qy).reshape(-1)
+        reach = int(math.ceil(radius / self.cell_size))
+        query_list = []
+        point_list = []
+        if len(self) == 0 or qx.shape[0] == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        # cell of each query point
+        qcx = ((qx - self.x_min) // self.cell_size).astype(np.int64)
+        qcy = ((qy - self.y_min) // self.cell_size).astype(np.int64)
+
+        # scan neighbouring buckets
+        for dcx in range(-reach, reach + 1):
+            for dcy in range(-reach, reach + 1):
+                cx = qcx + dcx
+                cy = qcy + dcy
+                valid = (cx >= 0) & (cy >= 0) & (cy < self.n_cells_y)
+                keys = cx * self.n_cells_y + cy
+                start = np.searchsorted(self.sorted_keys, keys, side="left")
+                stop = np.searchsorted(self.sorted_keys, keys, side="right")
+                counts = np.where(valid, stop - start, 0)
+                total = int(counts.sum())
+                if total == 0:
+                    continue
+
+                # expand each bucket slice into candidate pairs
+                query_index = np.repeat(np.arange(qx.shape[0]), counts)
+                offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+                point_index = self.order[np.repeat(start, counts) + offsets]
+
+                # keep candidates within radius
+                dx = qx[query_index] - self.x[point_index]
+                dy = qy[query_index] - self.y[point_index]
+                close = np.sqrt(dx*dx + dy*dy) <= radius
+                query_list.append(query_index[close])
+                point_list.append(point_index[close])
+
+        if not query_list:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(query_list), np.concatenate(point_list)
+
+    def has_neighbour(self, qx, qy, radius:float) -> np.ndarray:
+        """Check for each query point if at least one indexed point is closer than radius
+
+        Args:
+            - qx (array) : x coordinates of the query points
+            - qy (array) : y coordinates of the query points
+            - radius (float) : max distance to the indexed point
+
+        Returns:
+            - (array) : boolean array, True if the query point has a neighbour
+
+        """
+        found = np.zeros(np.asarray(qx).reshape(-1).shape[0], dtype=bool)
+        query_index, _ = self.query_pairs(qx, qy, radius)
+        found[query_index] = True
+        return found
+
+
+# neighbouring sites tried for a daughter cell, x+1 first
+DAUGHTER_SITES = [(1, 0), (0, 1), (-1, 0), (0, -1), (1, 1), (-1, 1), (-1, -1), (1, -1)]
+
+
+class OccupancyGrid:
+    """Number of agents on each site of the grid, updated incrementally when agents
+    move, divide or die, so that free space around an agent is a constant time lookup.
+    Coordinates outside the grid are counted on the nearest border site.
+    counts can be an existing (grid_size, grid_size) int32 array, e.g in shared memory.
+    With n_layers, the grid holds n_layers independent grids (e.g one per replica of a
+    simulation) and every method takes the layer of each agent.
+    Sites are addressed by their flat index in counts, (layer * grid_size + x) * grid_size + y.
+    """
+
+    def __init__(self, grid_size:int, x=None, y=None, counts:np.ndarray=None, n_layers:int=None, layer=None):
+        self.grid_size = grid_size
+        self.n_layers = n_layers
+        shape = (grid_size, grid_size) if n_layers is None else (n_layers, grid_size, grid_size)
+        self.counts = counts if counts is not None else np.zeros(shape, dtype=np.int32)
+        self.flat = self.counts.reshape(-1)
+        if x is not None:
+            self.add(x, y, layer)
+
+    def __setstate__(self, state):
+        # the flat view must share memory with counts again after a copy
+        self.__dict__.update(state)
+        self.flat = self.counts.reshape(-1)
+
+    def _sites(self, x, y):
+        x = np.clip(np.asarray(x, dtype=np.int64).reshape(-1), 0, self.grid_size - 1)
+        y = np.clip(np.asarray(y, dtype=np.int64).reshape(-1), 0, self.grid_size - 1)
+        return x, y
+
+    def _flat_index(self, layer, x, y) -> np.ndarray:
+        """Flat index of sites in counts, layer is ignored for a grid without layers"""
+        if self.n_layers is None:
+            return x * self.grid_size + y
+        return (np.asarray(layer, dtype=np.int64).reshape(-1) * self.grid_size + x) * self.grid_size + y
+
+    def _update(self, sites:np.ndarray, value:int) -> None:
+        """Add value to counts once per site in sites (repeated sites add up). Only the
+        given sites are written, so tiles of the parallel engine sharing counts in shared
+        memory never overwrite each other: distinct sites are counted first when agents
+        are dense, an unbuffered add is done on their sites otherwise"""
+        if sites.shape[0] * 32 >= self.flat.shape[0]:
+            touched, n_agents = np.unique(sites, return_counts=True)
+            self.flat[touched] += (value * n_agents).astype(np.int32)
+        else:
+            np.add.at(self.flat, sites, value)
+
+    def add(self, x, y, layer=None) -> None:
+        """Register agents on their sites"""
+        self._update(self._flat_index(layer, *self._sites(x, y)), 1)
+
+    def remove(self, x, y, layer=None) -> None:
+        """Unregister agents from their sites"""
+        self._update(self._flat_index(layer, *self._sites(x, y)), -1)
+
+    def move(self, old_x, old_y, new_x, new_y, layer=None) -> None:
+        """Update the grid for agents going from (old_x, old_y) to (new_x, new_y)"""
+        moved = (np.asarray(old_x) != np.asarray(new_x)) | (np.asarray(old_y) != np.asarray(new_y))
+        if moved.any():
+            layer = np.asarray(layer)[moved] if layer is not None else None
+            self.remove(np.asarray(old_x)[moved], np.asarray(old_y)[moved], layer)
+            self.add(np.asarray(new_x)[moved], np.asarray(new_y)[moved], layer)
+
+    def neighbour_count(self, x, y, radius:float, layer=None) -> np.ndarray:
+        """Count agents on every site closer than radius from each (x, y), own site included
+
+        Args:
+            - x (array) : x coordinates of the query sites
+            - y (array) : y coordinates of the query sites
+            - radius (float) : max distance of the counted sites
+            - layer (array) : layer of each query site, for a grid with layers
+
+        Returns:
+            - (array) : number of agents around each query site
+
+        """
+
+        # params
+        x, y = self._sites(x, y)
+        sites = self._flat_index(layer, x, y)
+        reach = int(math.floor(radius))
+        total = np.zeros(x.shape[0], dtype=np.int64)
+
+        # look up each site of the disc
+        for dx in range(-reach, reach + 1):
+            for dy in range(-reach, reach + 1):
+                if dx*dx + dy*dy > radius*radius:
+                    continue
+                valid = (x + dx >= 0) & (x + dx < self.grid_size) & (y + dy >= 0) & (y + dy < self.grid_size)
+                total[valid] += self.flat[sites[valid] + dx * self.grid_size + dy]
+
+        return total
+
+    def claim_daughter_sites(self, x, y, layer=None):
+        """Find a free neighbouring site for each parent (x, y) and register it.
+        Sites are tried in the DAUGHTER_SITES order, a site claimed by two parents
+        goes to the first one.
+
+        Args:
+            - x (array) : x coordinates of the parents
+            - y (array) : y coordinates of the parents
+            - layer (array) : layer of each parent, for a grid with layers
+
+        Returns:
+            - (array) : x coordinates of the daughter sites
+            - (array) : y coordinates of the daughter sites
+            - (array) : boolean array, False if the parent has no free site around
+
+        """
+
+        # params
+        x, y = self._sites(x, y)
+        parent_sites = self._flat_index(layer, x, y)
+        site_x = np.zeros(x.shape[0], dtype=np.int64)
+        site_y = np.zeros(x.shape[0], dtype=np.int64)
+        placed = np.zeros(x.shape[0], dtype=bool)
+
+        for dx, dy in DAUGHTER_SITES:
+            todo = np.flatnonzero(~placed)
+            if todo.shape[0] == 0:
+                break
+
+            # candidate sites inside the grid and free
+            cx = x[todo] + dx
+            cy = y[todo] + dy
+            valid = (cx >= 0) & (cx < self.grid_size) & (cy >= 0) & (cy < self.grid_size)
+            todo, cx, cy = todo[valid], cx[valid], cy[valid]
+            sites = parent_sites[todo] + dx * self.grid_size + dy
+            free = self.flat[sites] == 0
+            todo, cx, cy, sites = todo[free], cx[free], cy[free], sites[free]
+
+            # first parent wins a shared site
+            _, first = np.unique(sites, return_index=True)
+            todo, cx, cy, sites = todo[first], cx[first], cy[first], sites[first]
+
+            # claim sites
+            self.flat[sites] += 1
+            site_x[todo] = cx
+            site_y[todo] = cy
+            placed[todo] = True
+
+        return site_x, site_y, placed
@@ -0,0 +1,105 @@
+# load usual dependencies
+import importlib
+import functools
+import os
+
+# load modules
+from config import read_table
+
+# load agents
+from agents.generic_cell import GenericCell
+
+
+# default registry, one row per species, row order gives the species id
+SPECIES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ressources", "species.csv")
+
+# division rules a species can use
+# - isolated : divide when no other cell is nearby
+# - none : never divide
+DIVISION_RULES = ["isolated", "none"]
+
+
+@functools.lru_cache(maxsize=None)
+def _read_species(species_file:str) -> tuple:
+    """Read and check a species file, cached so every run share the same agent classes"""
+
+    # params
+    registry = []
+
+    for row in read_table(species_file):
+
+        # check division rule
+        if row['division'] not in DIVISION_RULES:
+            raise ValueError(f"Unknown division rule {row['division']} for species {row['name']}, expected one of {DIVISION_RULES}")
+
+        # agent class, generic class carrying the registry parameters if not provided
+        if row['agent_class'] != "":
+            module, class_name = row['agent_class'].rsplit(".", 1)
+            agent_class = getattr(importlib.import_module(module), class_name)
+        else:
+            agent_class = type(row['name'].capitalize(), (GenericCell,), {
+                "color":row['color'],
+                "life_span":int(row['life_span']),
+                "speed":int(row['speed'])
+            })
+
+        registry.append({
+            "name":row['name'],
+            "agent_class":agent_class,
+            "color":row['color'],
+            "life_span":int(row['life_span']),
+            "speed":int(row['speed']),
+            "division":row['division'],
+            "count_key":row['count_key'],
+            "metric":f"n_{row['name']}"
+        })
+
+    return tuple(registry)
+
+
+def load_species(species_file:str=None) -> list:
+    """Load the species registry: parameters of each cell type, declared in a csv file
+    with the columns name, agent_class, color, life_span, speed, division and count_key.
+    Adding a species only requires a new row, agent_class can be left empty to use a
+    generic cell moving at the given speed.
+
+    Args:
+        - species_file (str) : path to the species file, default to ressources/species.csv
+
+    Returns:
+        - (list) : one dict per species, in the file order, with 'name', 'agent_class',
+        'color', 'life_span', 'speed', 'division', 'count_key' (configuration parameter
+        giving the initial number of agents) and 'metric' (metrics column)
+
+    """
+    return list(_read_species(os.path.abspath(species_file or SPECIES_FILE)))
+
+
+def new_agent(species:dict, x:int, y:int, grid_size:int):
+    """Create an agent object of a species, with the parameters of the registry
+
+    Args:
+        - species (dict) : one entry of the species registry
+        - x (int) : x coordinate
+        - y (int) : y coordinate
+        - grid_size (int) : grid_size (assume grid is a square)
+
+    Returns:
+        - (object) : instance of the agent class of the species
+
+    """
+    agent = species["agent_class"](x, y, grid_size)
+    agent.color = species["color"]
+    agent.life_span = species["life_span"]
+    agent.speed = species["speed"]
+    return agent
+
+
+def activate_agent(agent) -> None:
+    """Switch an agent object to the activated state, with its activate method when it
+    has one (Bcells), else by setting activated and the red color used for activated agents"""
+    if hasattr(agent, "activate"):
+        agent.activate()
+    else:
+        agent.activated = True
+        agent.color = 'red'
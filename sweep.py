@@ -0,0 +1,165 @@
+# load usual dependencies
+import numpy as np
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# load modules
+import simple_run
+import config
+from metrics import load_metrics, load_replica_metrics
+from replicas import run_replicas
+
+
+def parse_sweep_configuration(configuration_file:str) -> dict:
+    """Parse a sweep configuration file. Same PARAMETER,VALUE format as a simulation
+    configuration file, but a VALUE can list several values separated by ';', every
+    combination of values (grid) is a parameter set. Extra parameters are:
+        - n_replicates (int, number of runs per parameter set, default to 1)
+        - n_workers (int, number of processes, default to the number of cores)
+        - seed (int, root seed of the sweep, fresh seed if missing)
+        - batched (bool, run the replicates of a parameter set together, see replicas.run_replicas, default to False)
+
+    Args:
+        - configuration_file (str) : path to the sweep configuration file
+
+    Returns:
+        - (dict) : 'valid', 'parameter_sets' (list of configuration dict), 'n_replicates',
+        'n_workers', 'seed', 'batched' and 'output_folder'
+
+    """
+
+    # load & check configuration
+    configuration = simple_run.parse_configuration(configuration_file)
+    sweep = {"valid":configuration.pop('valid')}
+    if not sweep['valid']:
+        return sweep
+
+    # sweep parameters
+    sweep['n_replicates'] = int(configuration.pop('n_replicates', 1))
+    sweep['n_workers'] = int(configuration.pop('n_workers', os.cpu_count()))
+    sweep['seed'] = int(configuration.pop('seed')) if 'seed' in configuration else None
+    sweep['batched'] = config.boolean(str(configuration.pop('batched', False)))
+    sweep['output_folder'] = str(configuration['output_folder'])
+
+    # grid of parameter sets
+    values = {k:str(v).split(";") for k, v in configuration.items()}
+    sweep['parameter_sets'] = [dict(zip(values.keys(), combination)) for combination in itertools.product(*values.values())]
+
+    return sweep
+
+
+def run_replicate(arguments:dict) -> str:
+    """Run one simulation of a sweep or an ensemble (picklable job of a process pool), returns its output folder"""
+    simple_run.run_simulation(**arguments)
+    return arguments["output_folder"]
+
+
+def _run_batch(job:tuple) -> str:
+    """Run every replicate of a parameter set of the sweep in one replica batch, returns its output folder"""
+    arguments, n_replicates = job
+    run_replicas(arguments, n_replicates)
+    return arguments["output_folder"]
+
+
+def run_sweep(parameter_sets:list, n_replicates:int, output_folder:str, seed:int=None, n_workers:int=None, quantiles:tuple=(0.05, 0.5, 0.95), batched:bool=False) -> "pd.DataFrame":
+    """Run n_replicates simulations of each parameter set over a pool of processes,
+    then aggregate their metrics.
+    Each run gets its own random stream (spawned from the root seed) and its own output
+    folder, output_folder/set_<i>/replicate_<j>. Runs are headless unless frame_every is set.
+    When batched, the replicates of a parameter set run together in one process (see
+    replicas.run_replicas), with one seed per set and metrics in output_folder/set_<i>/logs.
+
+    Args:
+        - parameter_sets (list) : list of configuration dict (PARAMETER as key), output_folder is ignored
+        - n_replicates (int) : number of runs per parameter set
+        - output_folder (str) : path to the sweep output folder
+        - seed (int) : root seed of the sweep, fresh seed if not provided
+        - n_workers (int) : number of processes, default to the number of cores
+        - quantiles (tuple) : quantiles computed for each metric
+        - batched (bool) : run the replicates of each parameter set as one replica batch
+
+    Returns:
+        - (pd.DataFrame) : one row per parameter set and step, with parameters and for each
+        metric its mean and quantiles over replicates, also saved as output_folder/sweep_metrics.csv
+
+    """
+
+    # params
+    os.makedirs(output_folder, exist_ok=True)
+    seeds = np.random.SeedSequence(seed).spawn(len(parameter_sets) * (1 if batched else n_replicates))
+    runs = []
+    run_list = []
+
+    # one independent seed & folder per run, or per parameter set when batched (replicate r uses the seed [seed, r])
+    for set_id, parameter_set in enumerate(parameter_sets):
+        if batched:
+            configuration = dict(parameter_set)
+            configuration['output_folder'] = f"{output_folder}/set_{set_id:03d}"
+            arguments = simple_run.simulation_arguments(configuration)
+            arguments['seed'] = int.from_bytes(seeds[len(runs)].generate_state(4).tobytes(), "little")
+            runs.append((arguments, n_replicates))
+            run_list += [{"SET":set_id, "REPLICATE":replicate, "SEED":f"[{arguments['seed']}, {replicate}]", "FOLDER":arguments['output_folder']} for replicate in range(n_replicates)]
+            continue
+        for replicate in range(n_replicates):
+            configuration = dict(parameter_set)
+            configuration.setdefault('frame_every', 0)
+            configuration['output_folder'] = f"{output_folder}/set_{set_id:03d}/replicate_{replicate:03d}"
+            os.makedirs(f"{output_folder}/set_{set_id:03d}", exist_ok=True)
+            arguments = simple_run.simulation_arguments(configuration)
+            arguments['seed'] = int.from_bytes(seeds[len(runs)].generate_state(4).tobytes(), "little")
+            runs.append(arguments)
+            run_list.append({"SET":set_id, "REPLICATE":replicate, "SEED":str(arguments['seed']), "FOLDER":arguments['output_folder']})
+
+    # fan out runs, workers only import the simulation modules (pandas is loaded for the aggregation)
+    import pandas as pd
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        list(executor.map(_run_batch if batched else run_replicate, runs))
+    pd.DataFrame(run_list).to_csv(f"{output_folder}/sweep_runs.csv", index=False)
+
+    # aggregate metrics of each parameter set
+    tables = []
+    for set_id, parameter_set in enumerate(parameter_sets):
+        if batched:
+            metrics, columns = load_replica_metrics(f"{output_folder}/set_{set_id:03d}/logs/replica_metrics.npz")
+            replicates = [dict(zip(columns, replicate.T)) for replicate in metrics]
+        else:
+            replicates = [load_metrics(f"{output_folder}/set_{set_id:03d}/replicate_{replicate:03d}/logs/metrics.npz") for replicate in range(n_replicates)]
+        table = {"SET":np.full(replicates[0]["step"].shape[0], set_id), "step":replicates[0]["step"].astype(int)}
+        for k, v in parameter_set.items():
+            if k != 'output_folder':
+                table[k] = v
+        for column in replicates[0]:
+            if column == "step":
+                continue
+            stacked = np.stack([r[column] for r in replicates])
+            table[f"{column}_mean"] = stacked.mean(axis=0)
+            for q in quantiles:
+                table[f"{column}_q{int(round(100 * q)):02d}"] = np.quantile(stacked, q, axis=0)
+        tables.append(pd.DataFrame(table))
+    summary = pd.concat(tables, ignore_index=True)
+    summary.to_csv(f"{output_folder}/sweep_metrics.csv", index=False)
+
+    return summary
+
+
+def run(configuration_file:str) -> None:
+    """Run the sweep described by a sweep configuration file
+
+    Args:
+        configuration_file (str) : path to the sweep configuration file
+
+    """
+
+    # parse configuration
+    sweep = parse_sweep_configuration(configuration_file)
+
+    # check config validity
+    if sweep['valid']:
+        run_sweep(sweep['parameter_sets'], sweep['n_replicates'], sweep['output_folder'], sweep['seed'], sweep['n_workers'], batched=sweep['batched'])
+
+
+if __name__ == "__main__":
+
+    run(sys.argv[1])
@@ -0,0 +1,160 @@
+# load usual dependencies
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+import json
+
+
+# slots of the ring buffer, steps a viewer can lag behind before losing some
+TELEMETRY_CAPACITY = 256
+
+# side of the downsampled occupancy raster
+TELEMETRY_RASTER = 64
+
+# header fields, then the metrics column names as json in a fixed size area
+HEADER_FIELDS = ["capacity", "n_columns", "raster_size", "grid_size", "write_count"]
+COLUMNS_BYTES = 4096
+
+
+def occupancy_raster(x, y, grid_size:int, raster_size:int) -> np.ndarray:
+    """Number of agents in each block of a raster_size x raster_size downsampling of the grid
+
+    Args:
+        - x (array) : x coordinates of the agents
+        - y (array) : y coordinates of the agents
+        - grid_size (int) : grid_size (assume grid is a square)
+        - raster_size (int) : side of the raster
+
+    Returns:
+        - (np.ndarray) : (raster_size, raster_size) counts, x along the first axis
+
+    """
+    x = np.clip(np.asarray(x, dtype=np.int64), 0, grid_size - 1) * raster_size // grid_size
+    y = np.clip(np.asarray(y, dtype=np.int64), 0, grid_size - 1) * raster_size // grid_size
+    return np.bincount(x * raster_size + y, minlength=raster_size * raster_size).reshape(raster_size, raster_size)
+
+
+class _Layout:
+    """Views on the shared memory block of a telemetry channel: header, column names,
+    and for each slot of the ring its sequence number, metrics row and raster"""
+
+    def __init__(self, buffer, capacity:int, n_columns:int, raster_size:int):
+        offset = 0
+        self.header = np.ndarray((len(HEADER_FIELDS),), dtype=np.int64, buffer=buffer, offset=offset)
+        offset += self.header.nbytes
+        self.columns = np.ndarray((COLUMNS_BYTES,), dtype=np.uint8, buffer=buffer, offset=offset)
+        offset += COLUMNS_BYTES
+        self.sequence = np.ndarray((capacity,), dtype=np.int64, buffer=buffer, offset=offset)
+        offset += self.sequence.nbytes
+        self.metrics = np.ndarray((capacity, n_columns), dtype=np.float64, buffer=buffer, offset=offset)
+        offset += self.metrics.nbytes
+        self.rasters = np.ndarray((capacity, raster_size, raster_size), dtype=np.float32, buffer=buffer, offset=offset)
+
+    @staticmethod
+    def size(capacity:int, n_columns:int, raster_size:int) -> int:
+        return 8 * len(HEADER_FIELDS) + COLUMNS_BYTES + capacity * (8 + 8 * n_columns + 4 * raster_size * raster_size)
+
+
+class TelemetryChannel:
+    """Publisher side of a live telemetry channel: per step metrics and a downsampled
+    occupancy raster written into a fixed size ring buffer in a named shared memory block.
+    Publishing is a copy into the next slot, it never waits for a reader and never touches
+    the disk; a reader that lags more than capacity steps behind loses the oldest ones.
+    Each slot carries a sequence number, set to -1 while the slot is written (seqlock), so
+    readers detect and skip a slot overwritten while they copy it.
+    """
+
+    def __init__(self, name:str, columns:list, grid_size:int, capacity:int=TELEMETRY_CAPACITY, raster_size:int=TELEMETRY_RASTER):
+        self.name = name
+        self.columns = list(columns)
+        self.grid_size = grid_size
+        self.capacity = capacity
+        self.raster_size = min(raster_size, grid_size)
+        encoded = np.frombuffer(json.dumps(self.columns).encode(), dtype=np.uint8)
+        if encoded.shape[0] > COLUMNS_BYTES:
+            raise ValueError(f"Too many metrics columns for a telemetry channel ({encoded.shape[0]} > {COLUMNS_BYTES} bytes)")
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=_Layout.size(capacity, len(self.columns), self.raster_size))
+        except FileExistsError:
+            raise ValueError(f"Telemetry channel {name} is already used by another run") from None
+        self.layout = _Layout(self.shm.buf, capacity, len(self.columns), self.raster_size)
+        self.layout.columns[:encoded.shape[0]] = encoded
+        self.layout.sequence[:] = -1
+        self.layout.header[:] = [capacity, len(self.columns), self.raster_size, grid_size, 0]
+
+    def publish(self, row, x, y) -> None:
+        """Publish the metrics row and the agent positions of one step
+
+        Args:
+            - row (array) : metrics of the step, one value per column
+            - x (array) : x coordinates of the agents
+            - y (array) : y coordinates of the agents
+
+        """
+        count = int(self.layout.header[4])
+        slot = count % self.capacity
+        self.layout.sequence[slot] = -1
+        self.layout.metrics[slot] = row
+        self.layout.rasters[slot] = occupancy_raster(x, y, self.grid_size, self.raster_size)
+        self.layout.sequence[slot] = count
+        self.layout.header[4] = count + 1
+
+    def close(self) -> None:
+        """Release and remove the block, attached readers keep their mapping"""
+        self.layout = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+class TelemetryReader:
+    """Reader side of a telemetry channel (see TelemetryChannel), attached by name from any
+    local process. The reader never writes to the block nor removes it, n_lost counts the
+    steps it missed by lagging behind.
+    """
+
+    def __init__(self, name:str):
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # python < 3.13, untrack the block so the reader does not remove it at exit
+            self.shm = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        header = np.ndarray((len(HEADER_FIELDS),), dtype=np.int64, buffer=self.shm.buf)
+        self.capacity, n_columns, self.raster_size, self.grid_size = [int(v) for v in header[:4]]
+        self.layout = _Layout(self.shm.buf, self.capacity, n_columns, self.raster_size)
+        self.columns = json.loads(self.layout.columns.tobytes().rstrip(b"\0").decode())
+        self.read_count = 0
+        self.n_lost = 0
+
+    def poll(self):
+        """Return the steps published since the previous poll, still in the ring
+
+        Returns:
+            - (np.ndarray) : (n, n_columns) metrics rows, oldest first
+            - (np.ndarray) : (raster_size, raster_size) raster of the last step, None if no new step
+
+        """
+
+        # params
+        write_count = int(self.layout.header[4])
+        first = max(self.read_count, write_count - self.capacity)
+        self.n_lost += first - self.read_count
+        rows = []
+        raster = None
+
+        # copy slots, skip the ones rewritten during the copy
+        for count in range(first, write_count):
+            slot = count % self.capacity
+            row = self.layout.metrics[slot].copy()
+            last = self.layout.rasters[slot].copy() if count == write_count - 1 else None
+            if self.layout.sequence[slot] != count:
+                self.n_lost += 1
+                continue
+            rows.append(row)
+            raster = last
+        self.read_count = write_count
+
+        return np.array(rows, dtype=np.float64).reshape(-1, len(self.columns)), raster
+
+    def close(self) -> None:
+        self.layout = None
+        self.shm.close()
@@ -0,0 +1,110 @@
+# load usual dependencies
+import numpy as np
+from matplotlib.figure import Figure
+import solara
+import subprocess
+import os
+import sys
+
+# load modules
+from telemetry import TelemetryReader
+
+
+# channel watched by the viewer, see run
+CHANNEL = os.environ.get("TELEMETRY_CHANNEL", "lymphorium")
+
+# seconds between two polls of the channel
+REFRESH_SECONDS = 0.5
+
+# metrics plotted as population curves
+CURVE_COLUMNS = ["n_b", "n_t", "n_activated_b", "n_total"]
+
+
+def curves_figure(history:np.ndarray, columns:list) -> Figure:
+    """Plot the population curves of the steps received so far
+
+    Args:
+        - history (np.ndarray) : (n_steps, n_columns) metrics rows
+        - columns (list) : name of the metrics columns
+
+    Returns:
+        - (Figure) : figure with one curve per column of CURVE_COLUMNS
+
+    """
+    figure = Figure(figsize=(6, 4))
+    ax = figure.subplots()
+    for column in CURVE_COLUMNS:
+        if column in columns:
+            ax.plot(history[:, columns.index("step")], history[:, columns.index(column)], label=column)
+    ax.set_xlabel("step")
+    ax.set_ylabel("agents")
+    ax.legend(loc="upper left")
+    return figure
+
+
+def raster_figure(raster:np.ndarray, grid_size:int) -> Figure:
+    """Plot the downsampled occupancy raster of the last step
+
+    Args:
+        - raster (np.ndarray) : (raster_size, raster_size) number of agents in each block
+        - grid_size (int) : grid_size (assume grid is a square)
+
+    Returns:
+        - (Figure) : figure of the raster, x horizontal
+
+    """
+    figure = Figure(figsize=(4, 4))
+    ax = figure.subplots()
+    image = ax.imshow(raster.T, origin="lower", extent=(0, grid_size, 0, grid_size), cmap="viridis", interpolation="nearest")
+    figure.colorbar(image, ax=ax, label="agents")
+    return figure
+
+
+@solara.component
+def Page():
+
+    # channel state kept between renders, refreshed by a polling thread
+    state = solara.use_memo(lambda: {"reader":None, "history":[], "raster":None}, [])
+    tick, set_tick = solara.use_state(0)
+
+    def poll(cancel):
+        while not cancel.is_set():
+            try:
+                if state["reader"] is None:
+                    state["reader"] = TelemetryReader(CHANNEL)
+                rows, raster = state["reader"].poll()
+                if rows.shape[0] > 0:
+                    state["history"].append(rows)
+                    state["raster"] = raster if raster is not None else state["raster"]
+                    set_tick(lambda t: t + 1)
+            except FileNotFoundError:
+                pass
+            cancel.wait(REFRESH_SECONDS)
+
+    solara.use_thread(poll, dependencies=[])
+
+    reader = state["reader"]
+    if reader is None or not state["history"]:
+        solara.Markdown(f"Waiting for telemetry channel `{CHANNEL}` ...")
+        return
+    history = np.concatenate(state["history"])
+    solara.Markdown(f"**{CHANNEL}** : step {int(history[-1, reader.columns.index('step')])}, {reader.n_lost} steps missed")
+    with solara.Columns([3, 2]):
+        solara.FigureMatplotlib(curves_figure(history, reader.columns))
+        if state["raster"] is not None:
+            solara.FigureMatplotlib(raster_figure(state["raster"], reader.grid_size))
+
+
+def run(channel:str) -> None:
+    """Serve the viewer of a telemetry channel with solara
+
+    Args:
+        channel (str) : name of the channel, the telemetry parameter of the run
+
+    """
+    subprocess.run([sys.executable, "-m", "solara", "run", os.path.abspath(__file__)], env={**os.environ, "TELEMETRY_CHANNEL":channel})
+
+
+if __name__ == "__main__":
+
+    run(sys.argv[1] if len(sys.argv) > 1 else CHANNEL)
@@ -0,0 +1,6 @@
+# load usual dependencies
+import os
+import sys
+
+# modules of the simulation live at the root of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,38 @@
+# load usual dependencies
+import json
+
+# load modules
+import benchmark
+
+
+def test_species_mix():
+    for mix in benchmark.SPECIES_MIX:
+        for n_agents in [1, 97, 1000]:
+            counts = benchmark._species_counts(n_agents, mix)
+            assert sum(counts) == n_agents and min(counts) >= 0
+    assert benchmark._species_counts(10, "b_only") == [10, 0, 0, 0, 0, 0, 0, 0]
+
+
+def test_benchmark_cases():
+    results = {engine:benchmark.benchmark_case(engine, 200, 30, n_steps=3, memory_steps=1) for engine in benchmark.ENGINES}
+    for result in results.values():
+        assert result["steps_per_second"] > 0 and result["peak_memory_mb"] > 0
+        assert set(result["phase_seconds"]) == set(benchmark.PHASES)
+
+    # seeded cases, only the timings change between two measures
+    for engine, result in results.items():
+        assert benchmark.benchmark_case(engine, 200, 30, n_steps=3, memory_steps=0)["mean_population"] == result["mean_population"], engine
+
+
+def test_compare_reports_regressions(tmp_path):
+    benchmark.run_benchmarks(f"{tmp_path}/baseline.json", agent_counts=(100,), grid_sizes=(20,), engines=("arrays",), n_steps=2)
+    with open(f"{tmp_path}/baseline.json") as f:
+        baseline = json.load(f)
+    assert [(r["engine"], r["n_agents"], r["grid_size"], r["mix"]) for r in baseline["results"]] == [("arrays", 100, 20, "default")]
+
+    # a throughput drop within the tolerance is accepted, a larger one is reported
+    for factor, n_regressions in [(0.9, 0), (0.5, 1)]:
+        current = {**baseline, "results":[{**r, "steps_per_second":factor * r["steps_per_second"]} for r in baseline["results"]]}
+        with open(f"{tmp_path}/current.json", "w") as f:
+            json.dump(current, f)
+        assert len(benchmark.compare(f"{tmp_path}/baseline.json", f"{tmp_path}/current.json", tolerance=0.2)) == n_regressions
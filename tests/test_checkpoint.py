@@ -0,0 +1,78 @@
+# load usual dependencies
+import numpy as np
+import os
+import mmap
+import pytest
+
+# load modules
+from population import Population, B_CELL, T_CELL, COLUMNS
+from metrics import MetricsTable
+from species import load_species
+from checkpoint import save_checkpoint, load_checkpoint, list_checkpoints
+
+
+def small_state(grid_size:int=20, n_agents:int=50):
+    """Population of Bcells & Tcells with a random generator, and its metrics"""
+    rng = np.random.default_rng(2)
+    population = Population(grid_size, rng)
+    population.add(B_CELL, rng.integers(0, grid_size, n_agents), rng.integers(0, grid_size, n_agents))
+    population.add(T_CELL, rng.integers(0, grid_size, n_agents), rng.integers(0, grid_size, n_agents))
+    population.init_random_age()
+    metrics = MetricsTable(4, grid_size, species_columns=[species["metric"] for species in load_species()])
+    metrics.record(0, population.count(), 0)
+    return population, metrics
+
+
+def test_only_last_checkpoints_are_kept(tmp_path):
+    population, metrics = small_state()
+    for step in range(1, 6):
+        save_checkpoint(str(tmp_path), step, population, metrics, {"grid_size":20}, keep_last=2)
+    assert [os.path.basename(c) for c in list_checkpoints(str(tmp_path))] == ["step_00000004", "step_00000005"]
+    assert sorted(os.listdir(tmp_path)) == ["step_00000004", "step_00000005"]
+    assert load_checkpoint(str(tmp_path))["step"] == 5
+
+
+def test_failed_save_leaves_no_partial_checkpoint(tmp_path):
+    population, metrics = small_state()
+    save_checkpoint(str(tmp_path), 1, population, metrics, {"grid_size":20})
+
+    # a save failing before the rename only leaves its temporary folder, never a checkpoint
+    with pytest.raises(TypeError):
+        save_checkpoint(str(tmp_path), 2, population, metrics, {"grid_size":20, "callback":object()})
+    assert os.path.isdir(f"{tmp_path}/step_00000002.tmp")
+    assert [os.path.basename(c) for c in list_checkpoints(str(tmp_path))] == ["step_00000001"]
+    assert load_checkpoint(str(tmp_path))["step"] == 1
+
+    # the next save of that step replaces the leftover
+    save_checkpoint(str(tmp_path), 2, population, metrics, {"grid_size":20})
+    assert sorted(os.listdir(tmp_path)) == ["step_00000001", "step_00000002"]
+
+
+def test_checkpoint_round_trip(tmp_path):
+    population, metrics = small_state()
+    population.rng.integers(0, 10, 5)
+    save_checkpoint(str(tmp_path), 3, population, metrics, {"grid_size":20})
+    state = load_checkpoint(f"{tmp_path}/step_00000003")
+    for column in COLUMNS:
+        assert np.array_equal(getattr(state["population"], column), getattr(population, column)), column
+    assert np.array_equal(state["metrics"], metrics.data[:len(metrics)])
+    assert np.array_equal(state["rng"].integers(0, 1000, 10), population.rng.integers(0, 1000, 10))
+
+
+def test_memory_mapped_load(tmp_path):
+    population, metrics = small_state()
+    checkpoint = save_checkpoint(str(tmp_path), 1, population, metrics, {"grid_size":20})
+    mapped = load_checkpoint(checkpoint, mmap=True)["population"]
+
+    # the store works on the mapped files, without a copy
+    for column in COLUMNS:
+        assert np.array_equal(getattr(mapped, column), getattr(population, column)), column
+        base = mapped.buffers[column]
+        while not isinstance(base, mmap.mmap) and base is not None:
+            base = base.base
+        assert isinstance(base, mmap.mmap), column
+
+    # copy on write, the checkpoint is left untouched by the resumed run
+    mapped.move()
+    mapped.get_older()
+    assert np.array_equal(load_checkpoint(checkpoint)["population"].age, population.age)
@@ -0,0 +1,55 @@
+# load usual dependencies
+import pytest
+
+# load modules
+import config
+import simple_run
+import benchmark
+from config import REQUIRED, typed_configuration
+from test_sweep import SMALL, write_configuration
+
+
+PARAMETERS = {
+    "n_steps":(int, REQUIRED),
+    "density":(float, 0.5),
+    "metrics_csv":(config.boolean, False),
+    "engine":(config.choice(["objects", "arrays"]), "objects"),
+    "profile_steps":(config.int_range, None)
+}
+
+
+def test_values_are_converted():
+    typed = typed_configuration({"n_steps":" 12 ", "metrics_csv":"yes", "profile_steps":"2:5", "ignored":"x"}, PARAMETERS)
+    assert typed == {"n_steps":12, "density":0.5, "metrics_csv":True, "engine":"objects", "profile_steps":(2, 5)}
+    assert typed_configuration({"n_steps":3, "density":0.25, "metrics_csv":False}, PARAMETERS)["density"] == 0.25
+
+
+@pytest.mark.parametrize("parameter, value, error", [
+    ("n_steps", "12.5", "Invalid value 12.5 for parameter n_steps"),
+    ("density", "dense", "Invalid value dense for parameter density"),
+    ("metrics_csv", "maybe", "expected one of"),
+    ("engine", "gpu", r"expected one of \['objects', 'arrays'\]"),
+    ("profile_steps", "1:2:3", "expected start:stop"),
+    ("profile_steps", "a:b", "Invalid value a:b for parameter profile_steps"),
+])
+def test_bad_values_are_rejected(parameter, value, error):
+    with pytest.raises(ValueError, match=error):
+        typed_configuration({"n_steps":"3", parameter:value}, PARAMETERS)
+
+
+def test_missing_parameters(tmp_path):
+    with pytest.raises(ValueError, match="Missing mandatory parameter n_steps"):
+        typed_configuration({}, PARAMETERS)
+
+    # a configuration file without a species count is invalid, a bad value stops the run
+    configuration = {**SMALL, "output_folder":tmp_path}
+    assert not simple_run.parse_configuration(write_configuration(tmp_path / "missing.conf", **{k:v for k, v in configuration.items() if k != "n_nk_agents"}))["valid"]
+    parsed = simple_run.parse_configuration(write_configuration(tmp_path / "bad.conf", **configuration, frame_every="often"))
+    with pytest.raises(ValueError, match="parameter frame_every"):
+        simple_run.simulation_arguments(parsed)
+
+
+@pytest.mark.parametrize("job", list(benchmark.STARTUP_JOBS))
+def test_headless_jobs_import_no_heavy_module(tmp_path, job):
+    configuration_file = write_configuration(tmp_path / "job.conf", **SMALL, output_folder=tmp_path)
+    assert benchmark.measure_startup(configuration_file, n_repeats=1, job=job)["heavy_modules"] == []
@@ -0,0 +1,57 @@
+# load usual dependencies
+import numpy as np
+import statistics
+
+# load modules
+from ensemble import RunningStatistics, target_value, run_ensemble, parse_ensemble_configuration
+from test_sweep import SMALL, write_configuration
+
+
+def test_batches_merge_to_the_whole_sample():
+    rng = np.random.default_rng(0)
+    values = rng.normal([5.0, -2.0, 1e6], [1.0, 3.0, 0.1], size=(60, 3))
+    values[rng.random((60, 3)) < 0.2] = np.nan
+    values[3, 0] = np.inf
+    running = RunningStatistics(["a", "b", "c"])
+    for start, stop in [(0, 1), (1, 8), (8, 8), (8, 31), (31, 60)]:
+        running.update(values[start:stop])
+
+    finite = np.where(np.isfinite(values), values, np.nan)
+    assert running.count.tolist() == np.isfinite(values).sum(axis=0).tolist()
+    assert np.allclose(running.mean, np.nanmean(finite, axis=0), rtol=1e-12)
+    assert np.allclose(running.variance(), np.nanvar(finite, axis=0, ddof=1), rtol=1e-9)
+    z = statistics.NormalDist().inv_cdf(0.975)
+    assert np.allclose(running.half_width(0.95), z * np.nanstd(finite, axis=0, ddof=1) / np.sqrt(running.count))
+
+    # below two values the interval is unknown
+    running = RunningStatistics(["a", "b"])
+    running.update([[1.0, np.nan]])
+    assert running.mean.tolist() == [1.0, 0.0] and np.isnan(running.half_width(0.95)).all()
+
+
+def test_target_value():
+    metrics = {"n_activated_b":np.array([0.0, 3.0]), "n_naive_b":np.array([2.0, 4.0]), "density":np.array([0.1, 0.2])}
+    assert target_value(metrics, "density") == 0.2
+    assert target_value(metrics, "n_activated_b/n_naive_b") == 0.75
+    assert np.isnan(target_value({**metrics, "n_naive_b":np.array([1.0, 0.0])}, "n_activated_b/n_naive_b"))
+
+
+def test_ensemble_stops_at_precision_or_budget(tmp_path):
+    configuration = {**SMALL, "output_folder":str(tmp_path)}
+
+    # loose precision, converges as soon as min_replicates values are in
+    result = run_ensemble(configuration, ["n_b", "density"], f"{tmp_path}/loose", precision=10, batch_size=2, min_replicates=4, max_replicates=20, seed=1, n_workers=2)
+    assert result["converged"] and result["n_runs"] == 4
+    assert result["history"]["n_runs"].unique().tolist() == [2, 4] and not result["history"]["converged"].iloc[0]
+    assert result["estimates"]["n_values"].tolist() == [4, 4]
+
+    # unreachable precision, stops at the budget
+    result = run_ensemble(configuration, ["n_b"], f"{tmp_path}/strict", precision=0, batch_size=2, min_replicates=2, max_replicates=5, seed=1, n_workers=2)
+    assert not result["converged"] and result["n_runs"] == 5
+    assert result["history"]["n_runs"].tolist() == [2, 4, 5]
+
+
+def test_ensemble_workers_are_not_simulation_workers(tmp_path):
+    ensemble = parse_ensemble_configuration(write_configuration(tmp_path / "ensemble.conf", **{**SMALL, "output_folder":tmp_path, "engine":"parallel", "n_workers":2, "ensemble_workers":3, "targets":"density", "seed":4}))
+    assert ensemble["valid"] and (ensemble["ensemble_workers"], ensemble["targets"], ensemble["seed"]) == (3, ["density"], 4)
+    assert str(ensemble["configuration"]["n_workers"]) == "2" and "ensemble_workers" not in ensemble["configuration"]
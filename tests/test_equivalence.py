@@ -0,0 +1,115 @@
+# load usual dependencies
+import numpy as np
+import pytest
+
+# load modules
+import environment
+import simple_run
+from population import Population, B_CELL, T_CELL
+from species import load_species, new_agent
+from checkpoint import load_checkpoint
+from metrics import load_metrics
+
+
+# small run shared by the seeded tests, every species of the default registry
+RUN = {
+    "n_steps":12, "grid_size":40, "n_b_agents":120, "n_t_agents":60, "n_pathogen_agents":20,
+    "n_nk_agents":10, "n_neutro_agents":10, "n_dendritic_agents":10, "n_macrophage_agents":10,
+    "n_mastocyte_agents":10, "seed":5, "outputs":{"frame_every":0}
+}
+
+
+def random_agents(grid_size:int, n_agents:int, rng:np.random.Generator) -> list:
+    """Agent objects of every species of the registry, at random positions & ages"""
+    agent_list_list = [[new_agent(species, x, y, grid_size) for x, y in rng.integers(0, grid_size, size=(n_agents, 2)).tolist()] for species in load_species()]
+    return environment.init_random_age(agent_list_list, rng)
+
+
+def object_records(agent_list_list:list) -> list:
+    """Sorted (species, x, y, age, activated) of agent objects"""
+    return sorted((species_id, int(a.x), int(a.y), int(a.age), bool(getattr(a, "activated", False))) for species_id, agent_list in enumerate(agent_list_list) for a in agent_list)
+
+
+def population_records(population:Population) -> list:
+    """Sorted (species, x, y, age, activated) of a Population"""
+    return sorted(zip(population.species.tolist(), population.x.tolist(), population.y.tolist(), population.age.tolist(), population.activated.tolist()))
+
+
+def run_metrics(output_folder, **arguments) -> dict:
+    simple_run.run_simulation(output_folder=str(output_folder), **{**RUN, **arguments})
+    return load_metrics(f"{output_folder}/logs/metrics.npz")
+
+
+def test_objects_and_arrays_phases_match():
+    # both engines draw their moves differently, so phases are compared from the same agents at each step
+    rng = np.random.default_rng(3)
+    agent_list_list = random_agents(30, 40, rng)
+    for _ in range(10):
+        population = Population.from_agents(agent_list_list, 30)
+        environment.detect_interaction(agent_list_list[B_CELL], agent_list_list[T_CELL])
+        agent_list_list = environment.drop_old_cell(environment.look_for_division(agent_list_list))
+        population.detect_interaction()
+        population.look_for_division()
+        population.drop_old_cell()
+        assert object_records(agent_list_list) == population_records(population)
+        environment.move_agents(agent_list_list, rng)
+
+
+def test_grid_and_brute_detection_match():
+    rng = np.random.default_rng(4)
+    for grid_size in [10, 50]:
+        agent_list_list = random_agents(grid_size, 60, rng)
+        population = Population.from_agents(agent_list_list, grid_size)
+        brute = Population.from_agents(agent_list_list, grid_size)
+        population.detect_interaction(method="grid")
+        brute.detect_interaction(method="brute")
+        assert np.array_equal(population.activated, brute.activated)
+        environment.detect_interaction(agent_list_list[B_CELL], agent_list_list[T_CELL], method="grid")
+        activated = [a.activated for a in agent_list_list[B_CELL]]
+        for a in agent_list_list[B_CELL]:
+            a.activated = False
+        environment.detect_interaction(agent_list_list[B_CELL], agent_list_list[T_CELL], method="brute")
+        assert activated == [a.activated for a in agent_list_list[B_CELL]]
+        assert np.array_equal(population.activated[population.species == B_CELL], activated)
+
+
+@pytest.mark.parametrize("engine", ["objects", "arrays", "parallel"])
+def test_seeded_runs_are_identical(tmp_path, engine):
+    first = run_metrics(tmp_path / "first", engine=engine, n_workers=0, n_tiles=4)
+    second = run_metrics(tmp_path / "second", engine=engine, n_workers=0, n_tiles=4)
+    for column in first:
+        assert np.array_equal(first[column], second[column]), column
+
+
+def test_parallel_workers_do_not_change_metrics(tmp_path):
+    sequential = run_metrics(tmp_path / "sequential", engine="parallel", n_workers=0, n_tiles=4)
+    workers = run_metrics(tmp_path / "workers", engine="parallel", n_workers=2, n_tiles=4)
+    for column in sequential:
+        assert np.array_equal(sequential[column], workers[column]), column
+
+
+def test_parallel_and_arrays_counts_match_over_seeds(tmp_path):
+    # tiles draw from their own generators, so both engines only agree in distribution:
+    # mean and spread over seeds of the count of each species at each step
+    n_seeds = 16
+    species_columns = [species["metric"] for species in load_species()]
+    counts = {}
+    for engine in ["arrays", "parallel"]:
+        runs = [run_metrics(tmp_path / f"{engine}_{seed}", engine=engine, seed=seed, n_steps=20, grid_size=48, n_workers=0, n_tiles=4) for seed in range(n_seeds)]
+        counts[engine] = {column:np.stack([metrics[column] for metrics in runs]) for column in species_columns}
+    for column in species_columns:
+        arrays, parallel = counts["arrays"][column], counts["parallel"][column]
+        standard_error = np.sqrt((arrays.var(axis=0, ddof=1) + parallel.var(axis=0, ddof=1)) / n_seeds)
+        assert np.all(np.abs(arrays.mean(axis=0) - parallel.mean(axis=0)) <= 4 * standard_error + 1), column
+        spread_ratio = (arrays.std(axis=0, ddof=1) + 1) / (parallel.std(axis=0, ddof=1) + 1)
+        assert np.all((spread_ratio > 1 / 3) & (spread_ratio < 3)), column
+
+
+@pytest.mark.parametrize("engine", ["objects", "arrays", "parallel"])
+def test_resume_matches_uninterrupted_run(tmp_path, engine):
+    uninterrupted = run_metrics(tmp_path, engine=engine, n_workers=0, n_tiles=4, outputs={"frame_every":0, "checkpoint_every":6})
+    state = load_checkpoint(f"{tmp_path}/checkpoints/step_00000006")
+    simple_run.run_simulation(**state["parameters"], resume=state)
+    resumed = load_metrics(f"{tmp_path}/logs/metrics.npz")
+    for column in uninterrupted:
+        assert np.array_equal(uninterrupted[column], resumed[column]), column
@@ -0,0 +1,64 @@
+# load usual dependencies
+import numpy as np
+import os
+import pytest
+
+# load modules
+import fields as fields_module
+from fields import CytokineField, load_fields, update_fields
+from species import load_species
+
+
+def gaussian_blob(grid_size:int, width:float) -> np.ndarray:
+    """Smooth bump centered on the grid, far from the borders"""
+    offset = np.arange(grid_size) - grid_size // 2
+    return np.exp(-(offset[:, None]**2 + offset[None, :]**2) / (2 * width**2))
+
+
+def test_secrete_and_sample():
+    field = CytokineField("il4", 8, 1.0, 0.1)
+    field.secrete([1, 1, 2], [3, 3, 4], [0.5, 1.0, 2.0])
+    assert field.sample([1, 2, 0], [3, 4, 0]).tolist() == [1.5, 2.0, 0.0]
+    assert field.total() == 3.5
+
+
+@pytest.mark.parametrize("diffusion", [0.2, 1.0, 3.0])
+def test_stencil_matches_fft(diffusion):
+    # away from the borders, the explicit stencil follows the exact FFT solution
+    blob = gaussian_blob(64, 4.0)
+    fields = [CytokineField(method, 64, diffusion, 0.05, method) for method in ["stencil", "fft"]]
+    for field in fields:
+        field.values = blob.copy()
+        for _ in range(10):
+            field.step()
+    stencil, fft = [field.values for field in fields]
+    assert np.abs(stencil - fft).max() <= 0.02 * fft.max()
+
+    # both conserve the quantity up to the decay
+    for field in fields:
+        assert np.isclose(field.total(), blob.sum() * np.exp(-0.05 * 10))
+
+
+def test_stencil_stays_stable_at_high_diffusion():
+    # a checkerboard is the fastest mode, the sub-steps must damp it instead of amplifying it
+    field = CytokineField("il4", 16, 5.0, 0.0)
+    field.values = np.indices((16, 16)).sum(axis=0) % 2 * 1.0
+    field.step(3.0)
+    assert np.all((field.values >= 0) & (field.values <= 1)) and np.ptp(field.values) < 0.01
+    assert np.isclose(field.total(), 128)
+
+
+def test_load_and_update_fields(tmp_path):
+    registry = load_species()
+    fields = load_fields(os.path.join(os.path.dirname(fields_module.__file__), "ressources", "cytokines.csv"), 10, registry)
+    assert [cytokine["field"].name for cytokine in fields] == ["il4", "il21", "baff"]
+    assert fields[2]["secreted_by"] == [5, 6, 4]
+
+    # only the secreting species add to a field
+    update_fields(fields, np.array([1, 2, 3]), np.array([1, 2, 3]), np.array([0, 1, 5]))
+    assert [round(cytokine["field"].total(), 6) for cytokine in fields] == [round(np.exp(-0.1), 6)] * 2 + [round(np.exp(-0.05), 6)]
+
+    with open(f"{tmp_path}/cytokines.csv", "w") as f:
+        f.write("name,diffusion,decay,secreted_by,secretion_rate,method\nil2,1,0.1,plasma,1,stencil\n")
+    with pytest.raises(ValueError, match="Unknown species plasma"):
+        load_fields(f"{tmp_path}/cytokines.csv", 10, registry)
@@ -0,0 +1,88 @@
+# load usual dependencies
+import numpy as np
+import os
+import pytest
+
+# load modules
+import environment
+import interactions as interactions_module
+from interactions import load_interactions, evaluate_interactions
+from population import Population
+from species import load_species
+from test_equivalence import random_agents, object_records, population_records
+
+
+RULE_FILE = os.path.join(os.path.dirname(interactions_module.__file__), "ressources", "interactions.csv")
+B, T, PATHOGEN, NK, NEUTRO, DENDRITIC = range(6)
+
+
+def test_load_interactions(tmp_path):
+    rules = load_interactions(RULE_FILE, load_species())
+    assert rules[0] == {"source":T, "target":B, "radius":2.0, "effect":"activate"}
+    assert [(rule["source"], rule["target"], rule["effect"]) for rule in rules[1:]] == [
+        (NK, PATHOGEN, "kill"), (NEUTRO, PATHOGEN, "phagocytose"), (6, PATHOGEN, "phagocytose"),
+        (DENDRITIC, PATHOGEN, "phagocytose"), (DENDRITIC, T, "present")
+    ]
+
+    for row, error in [("t,plasma,2,activate", "Unknown species plasma"), ("t,b,2,merge", "Unknown effect merge")]:
+        with open(f"{tmp_path}/interactions.csv", "w") as f:
+            f.write(f"source,target,radius,effect\n{row}\n")
+        with pytest.raises(ValueError, match=error):
+            load_interactions(f"{tmp_path}/interactions.csv", load_species())
+
+
+def rule_table() -> list:
+    return [
+        {"source":T, "target":B, "radius":2.0, "effect":"activate"},
+        {"source":NK, "target":PATHOGEN, "radius":1.0, "effect":"kill"},
+        {"source":NEUTRO, "target":PATHOGEN, "radius":1.0, "effect":"phagocytose"},
+        {"source":DENDRITIC, "target":PATHOGEN, "radius":1.0, "effect":"phagocytose"},
+        {"source":DENDRITIC, "target":T, "radius":2.0, "effect":"present"}
+    ]
+
+
+# (species, x, y, activated) and the expected (activated, alive) after one step
+AGENTS = [
+    (B, 0, 0, False, True, True),                # Tcell in contact
+    (T, 1, 1, False, False, True),
+    (B, 0, 5, False, False, True),               # too far
+    (PATHOGEN, 10, 10, False, False, False),     # killed
+    (NK, 10, 11, False, False, True),
+    (NEUTRO, 20, 20, False, True, True),         # engulfs the lowest of two nearest pathogens
+    (PATHOGEN, 21, 20, False, False, False),
+    (PATHOGEN, 20, 21, False, False, True),
+    (NEUTRO, 22, 20, False, False, True),        # wants the same pathogen, lower source wins
+    (DENDRITIC, 30, 30, True, True, True),       # activated dendritic presents to the Tcell
+    (T, 31, 31, False, True, True),
+    (DENDRITIC, 5, 30, False, True, True),       # activated this step, presents from the next one
+    (PATHOGEN, 5, 31, False, False, False),
+    (T, 6, 30, False, False, True),
+]
+
+
+def test_rule_table_effects():
+    species, x, y, activated, expected_activated, expected_alive = [np.array(column) for column in zip(*AGENTS)]
+    new_activated, alive = evaluate_interactions(rule_table(), x, y, species, activated)
+    assert new_activated.tolist() == expected_activated.tolist()
+    assert alive.tolist() == expected_alive.tolist()
+    assert activated.tolist() == [a[3] for a in AGENTS]
+
+    # the same outcome whatever the order of the rules
+    new_activated, alive = evaluate_interactions(rule_table()[::-1], x, y, species, activated)
+    assert new_activated.tolist() == expected_activated.tolist() and alive.tolist() == expected_alive.tolist()
+
+    # no rule, no change
+    new_activated, alive = evaluate_interactions([], x, y, species, activated)
+    assert np.array_equal(new_activated, activated) and alive.all()
+
+
+def test_objects_and_arrays_apply_the_same_rules():
+    rules = load_interactions(RULE_FILE, load_species())
+    rng = np.random.default_rng(2)
+    agent_list_list = random_agents(20, 30, rng)
+    population = Population.from_agents(agent_list_list, 20)
+    n_before = len(population)
+    agent_list_list = environment.apply_interactions(agent_list_list, rules)
+    population.apply_interactions(rules)
+    assert object_records(agent_list_list) == population_records(population)
+    assert len(population) < n_before and population.activated.any()
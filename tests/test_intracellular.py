@@ -0,0 +1,72 @@
+# load usual dependencies
+import numpy as np
+
+# load modules
+from intracellular import BCellModel, bcell_inputs
+from fields import CytokineField
+
+
+def closed_form(model:BCellModel, state:np.ndarray, inputs:dict, t:float) -> np.ndarray:
+    """Exact states at time t without inhibition of the BCR signal (k_inh = 0): the
+    signal relaxes exponentially and drives linear inhibition & proliferation"""
+
+    # params
+    p = model.parameters
+    zero = np.zeros(state.shape[0])
+    bcr, il4, il21, baff = [inputs.get(name, zero) for name in model.input_names]
+    s0, i0, g0 = state.T
+
+    # bcr_signal, s(t) = s_inf + c * exp(-rate * t)
+    drive = p["k_bcr"] * bcr + p["k_baff"] * baff
+    rate = drive + p["d_bcr"]
+    s_inf = drive / rate
+    c = s0 - s_inf
+
+    def linear_response(gain, decay, x0):
+        # solution of x' = gain * s(t) - decay * x
+        return gain * s_inf / decay * (1 - np.exp(-decay * t)) + gain * c / (decay - rate) * (np.exp(-rate * t) - np.exp(-decay * t)) + x0 * np.exp(-decay * t)
+
+    return np.column_stack([
+        s_inf + c * np.exp(-rate * t),
+        linear_response(p["k_cd22"], p["d_inh"], i0),
+        linear_response(p["k_prolif"] * (1 + p["g_il4"] * il4 + p["g_il21"] * il21), p["d_prolif"], g0)
+    ])
+
+
+def test_rk4_matches_closed_form():
+    model = BCellModel({"k_inh":0.0})
+    state = np.array([[0.0, 0.0, 0.0], [0.3, 0.2, 0.5], [0.9, 1.0, 0.1], [0.0, 0.0, 0.0]])
+    inputs = {"bcr":np.array([1.0, 0.0, 1.0, 0.0]), "il4":np.array([0.0, 2.0, 0.5, 0.0]), "il21":np.array([1.0, 0.0, 0.0, 0.0]), "baff":np.array([0.0, 1.0, 3.0, 0.0])}
+    initial = state.copy()
+    for step in range(1, 11):
+        state = model.integrate(state, inputs)
+        assert np.allclose(state, closed_form(model, initial, inputs, step * model.dt), rtol=0, atol=1e-4), step
+    assert np.array_equal(state[3], [0, 0, 0])
+
+    # finer sub-steps close the gap
+    fine = BCellModel({"k_inh":0.0}, n_substeps=32)
+    assert np.allclose(fine.integrate(initial, inputs), closed_form(fine, initial, inputs, fine.dt), rtol=0, atol=1e-7)
+
+
+def test_rk4_converges_at_fourth_order():
+    # full model, compared with a fine integration
+    state = np.array([[0.1, 0.0, 0.0], [0.6, 0.4, 0.8]])
+    inputs = {"bcr":np.array([1.0, 0.0]), "il4":np.array([1.0, 0.0]), "baff":np.array([0.5, 2.0])}
+    reference = BCellModel(dt=2.0, n_substeps=1024).integrate(state, inputs)
+    errors = [np.abs(BCellModel(dt=2.0, n_substeps=n).integrate(state, inputs) - reference).max() for n in [8, 16, 32]]
+    assert 13 < errors[0] / errors[1] < 22 and 13 < errors[1] / errors[2] < 22
+
+
+def test_thresholds_and_inputs():
+    model = BCellModel()
+    state = np.array([[0.6, 0.0, 1.2], [0.4, 0.0, 0.9]])
+    assert model.activated(state).tolist() == [True, False]
+    assert model.ready_for_division(state).tolist() == [True, False]
+    assert model.after_division(state)[:, 2].tolist() == [0, 0] and state[0, 2] == 1.2
+
+    # Tcell contact & local cytokines named after an input
+    il4 = CytokineField("il4", 10, 1.0, 0.1)
+    il4.secrete([1], [1], 3.0)
+    inputs = bcell_inputs([1, 8], [1, 8], [2], [2], [{"field":il4}, {"field":CytokineField("other", 10, 1.0, 0.1)}])
+    assert set(inputs) == {"bcr", "il4"}
+    assert inputs["bcr"].tolist() == [1.0, 0.0] and inputs["il4"].tolist() == [3.0, 0.0]
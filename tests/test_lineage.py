@@ -0,0 +1,88 @@
+# load usual dependencies
+import numpy as np
+import pytest
+
+# load modules
+from lineage import LineageTable, load_lineage, MIN_CAPACITY
+from population import Population, B_CELL, T_CELL
+from test_equivalence import run_metrics
+
+
+def family_tree() -> LineageTable:
+    # founders 0 & 1, 0 has two daughters 2 & 3, 2 has a daughter 4, 0 dies at step 2
+    lineage = LineageTable()
+    lineage.register([-1, -1], [B_CELL, T_CELL])
+    lineage.step = 1
+    assert lineage.register([0, 0], B_CELL).tolist() == [2, 3]
+    lineage.step = 2
+    lineage.register([2], B_CELL)
+    lineage.record_deaths([0])
+    return lineage
+
+
+def test_parent_links():
+    lineage = family_tree()
+    assert lineage.parent.tolist() == [-1, -1, 0, 0, 2]
+    assert lineage.clone.tolist() == [0, 1, 0, 0, 0] and lineage.depth.tolist() == [0, 0, 1, 1, 2]
+    assert lineage.birth.tolist() == [0, 0, 1, 1, 2] and lineage.death.tolist() == [2, -1, -1, -1, -1]
+    assert lineage.ancestors(4).tolist() == [4, 2, 0] and lineage.ancestors(1).tolist() == [1]
+    assert lineage.alive(1).tolist() == [True, True, True, True, False]
+    clones, sizes = lineage.clone_sizes()
+    assert clones.tolist() == [0, 1] and sizes.tolist() == [3, 1]
+    assert lineage.surviving_clones(species=T_CELL).tolist() == [1]
+
+    # agents missing from the survivors died at the current step
+    lineage.step = 3
+    lineage.record_survivors([1, 4])
+    assert lineage.death.tolist() == [2, -1, 3, 3, -1]
+
+
+def test_save_load_and_growth(tmp_path):
+    lineage = family_tree()
+    lineage.save(f"{tmp_path}/lineage.npz")
+    loaded = load_lineage(f"{tmp_path}/lineage.npz")
+    assert loaded.step == 2 and len(loaded) == 5
+    for column in ["parent", "species", "birth", "death", "clone", "depth"]:
+        assert np.array_equal(getattr(loaded, column), getattr(lineage, column)), column
+
+    # registration goes on after a load, beyond the first capacity
+    ids = loaded.register(np.full(MIN_CAPACITY, 4), B_CELL)
+    assert ids[0] == 5 and loaded.capacity >= MIN_CAPACITY + 5
+    assert loaded.parent[-1] == 4 and loaded.depth[-1] == 3 and loaded.parent[:5].tolist() == [-1, -1, 0, 0, 2]
+
+
+def test_population_links_daughters_to_parents():
+    population = Population(20, np.random.default_rng(0))
+    population.add(B_CELL, [2, 10, 18], [10, 10, 10])
+    population.add(T_CELL, [2], [2])
+    lineage = LineageTable()
+    population.track_lineage(lineage)
+    lineage.step = 1
+    population.look_for_division()
+    assert len(population) == 8 and population.lineage_ids.tolist() == list(range(8))
+    parents = lineage.parent[4:]
+    assert np.abs(population.x[4:] - population.x[parents]).max() <= 1 and np.abs(population.y[4:] - population.y[parents]).max() <= 1
+    assert lineage.species[4:].tolist() == population.species[parents].tolist()
+
+    lineage.step = 2
+    population.keep(population.lineage_ids != 1)
+    assert lineage.death.tolist() == [-1, 2] + [-1] * 6 and 1 not in population.lineage_ids
+
+
+@pytest.mark.parametrize("engine", ["objects", "arrays"])
+def test_run_records_the_family_tree(tmp_path, engine):
+    metrics = run_metrics(tmp_path, engine=engine, outputs={"frame_every":0, "lineage":True})
+    lineage = load_lineage(f"{tmp_path}/logs/lineage.npz")
+    daughters = np.flatnonzero(lineage.parent >= 0)
+    assert daughters.shape[0] > 0 and (lineage.birth[:daughters[0]] == 0).all()
+    parents = lineage.parent[daughters]
+    assert np.all(lineage.birth[parents] < lineage.birth[daughters])
+    assert np.array_equal(lineage.species[parents], lineage.species[daughters])
+    assert np.all(lineage.depth[daughters] == lineage.depth[parents] + 1)
+    alive = np.bincount(lineage.species[lineage.alive(12)], minlength=8)
+    assert alive.tolist() == [metrics[column][-1] for column in ["n_b", "n_t", "n_pathogen", "n_nk", "n_neutro", "n_dendritic", "n_macrophage", "n_mastocyte"]]
+
+
+def test_parallel_engine_has_no_lineage(tmp_path):
+    with pytest.raises(ValueError):
+        run_metrics(tmp_path, engine="parallel", outputs={"frame_every":0, "lineage":True})
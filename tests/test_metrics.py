@@ -0,0 +1,50 @@
+# load usual dependencies
+import numpy as np
+
+# load modules
+from metrics import MetricsTable, SPECIES_COLUMNS, load_metrics
+
+
+def test_record_derived_and_extra_columns():
+    metrics = MetricsTable(2, 10, ["time_movement"])
+    metrics.record(0, [6, 4, 1, 0, 0, 0, 0, 2], 2)
+    metrics.record(1, [7, 3, 1, 0, 0, 0, 0, 2], 5, time_movement=0.5)
+    assert metrics.columns[1:1 + len(SPECIES_COLUMNS)] == SPECIES_COLUMNS
+    assert metrics.column("n_b").tolist() == [6, 7]
+    assert metrics.column("n_mastocyte").tolist() == [2, 2]
+    assert metrics.column("n_activated_b").tolist() == [2, 5]
+    assert metrics.column("n_naive_b").tolist() == [4, 2]
+    assert metrics.column("n_total").tolist() == [10, 10]
+    assert metrics.column("density").tolist() == [0.1, 0.1]
+    assert metrics.column("time_movement").tolist() == [0, 0.5]
+
+
+def test_table_grows_past_its_preallocated_rows():
+    metrics = MetricsTable(1, 10, species_columns=["n_b", "n_t"])
+    for step in range(5):
+        metrics.record(step, [step, 1], 0)
+    assert len(metrics) == 5
+    assert metrics.column("step").tolist() == [0, 1, 2, 3, 4]
+    assert metrics.column("n_b").tolist() == [0, 1, 2, 3, 4]
+
+
+def test_save_load_and_csv(tmp_path):
+    metrics = MetricsTable(5, 20, ["c_il2"])
+    for step in range(3):
+        metrics.record(step, np.arange(8) + step, step, c_il2=1.25 * step)
+    metrics.save(f"{tmp_path}/metrics.npz")
+    metrics.to_csv(f"{tmp_path}/metrics.csv")
+
+    loaded = load_metrics(f"{tmp_path}/metrics.npz")
+    assert list(loaded) == metrics.columns
+    for column in metrics.columns:
+        assert np.array_equal(loaded[column], metrics.column(column)), column
+    csv = np.genfromtxt(f"{tmp_path}/metrics.csv", delimiter=",", names=True)
+    assert list(csv.dtype.names) == metrics.columns
+    assert np.allclose(csv["c_il2"], [0, 1.25, 2.5])
+
+    # rows restored from a checkpoint
+    restored = MetricsTable(5, 20, ["c_il2"])
+    restored.restore(metrics.data[:len(metrics)])
+    restored.record(3, np.arange(8), 0)
+    assert restored.column("step").tolist() == [0, 1, 2, 3]
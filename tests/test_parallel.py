@@ -0,0 +1,45 @@
+# load usual dependencies
+import numpy as np
+
+# load modules
+from population import Population, B_CELL, T_CELL
+from parallel import ParallelPopulation
+
+
+def run_tiles(n_workers:int, grid_size:int=512, n_agents:int=240000, n_steps:int=6, n_tiles:int=8):
+    """Run the parallel engine on a dense grid, return the agents of the last step and
+    the steps whose shared occupancy grid disagrees with the agent positions"""
+
+    # params
+    rng = np.random.default_rng(7)
+    store = Population(grid_size, rng)
+    store.add(B_CELL, rng.integers(0, grid_size, n_agents), rng.integers(0, grid_size, n_agents))
+    store.add(T_CELL, rng.integers(0, grid_size, n_agents // 4), rng.integers(0, grid_size, n_agents // 4))
+    store.init_random_age()
+    corrupted = []
+
+    # steps
+    with ParallelPopulation(grid_size, 11, n_tiles, n_workers) as population:
+        population.scatter(store)
+        for step in range(n_steps):
+            population.detect_interaction()
+            population.look_for_division()
+            population.drop_old_cell()
+            population.move()
+            columns = population.columns()
+            expected = np.zeros((grid_size, grid_size), dtype=np.int64)
+            np.add.at(expected, (columns["x"], columns["y"]), 1)
+            if not np.array_equal(expected, population.occupancy):
+                corrupted.append(step)
+        return population.columns(), corrupted
+
+
+def test_workers_do_not_change_results():
+    # tiles of the same color update the shared occupancy grid at the same time, only
+    # a race between them (e.g a write of the whole grid) makes workers diverge
+    sequential, sequential_corrupted = run_tiles(0)
+    workers, workers_corrupted = run_tiles(4)
+    assert sequential_corrupted == []
+    assert workers_corrupted == []
+    for column in sequential:
+        assert np.array_equal(sequential[column], workers[column]), column
@@ -0,0 +1,102 @@
+# load usual dependencies
+import numpy as np
+import pytest
+
+# load modules
+from population import Population, B_CELL, T_CELL
+from agents.b_cell import LymphocyteB
+from test_equivalence import random_agents, object_records, population_records, run_metrics
+
+
+def test_agents_round_trip():
+    rng = np.random.default_rng(1)
+    agent_list_list = random_agents(25, 30, rng)
+    agent_list_list[B_CELL][0].activate()
+    population = Population.from_agents(agent_list_list, 25)
+    assert population.count().tolist() == [len(agent_list) for agent_list in agent_list_list]
+    assert population_records(population) == object_records(agent_list_list)
+    restored = population.to_agents()
+    assert object_records(restored) == object_records(agent_list_list)
+    assert [type(agent_list[0]) for agent_list in restored] == [type(agent_list[0]) for agent_list in agent_list_list]
+
+
+def test_views_write_through_to_the_arrays():
+    population = Population(10)
+    population.add(B_CELL, [1, 2], [3, 4], [0, 5])
+    population.add(T_CELL, [5], [5])
+    b_view = population.views(B_CELL)[1]
+    assert isinstance(b_view, LymphocyteB)
+    assert (b_view.x, b_view.y, b_view.age) == (2, 4, 5)
+
+    # agent methods update the row and the occupancy grid
+    b_view.activate()
+    b_view.get_older()
+    b_view.move(1, -1)
+    assert population.activated.tolist() == [False, True, False]
+    assert population.age.tolist() == [0, 6, 0]
+    assert (population.x[1], population.y[1]) == (3, 3)
+    assert population.occupancy.counts[3, 3] == 1 and population.occupancy.counts[2, 4] == 0
+
+
+def test_whole_population_phases():
+    population = Population(10, np.random.default_rng(0))
+    population.add(B_CELL, [0, 9, 5], [0, 9, 5], [0, 10, 3])
+    population.move()
+    assert np.all((population.x >= 0) & (population.x < 10) & (population.y >= 0) & (population.y < 10))
+    assert population.occupancy.counts.sum() == 3
+    population.get_older()
+    population.drop_old_cell()
+    assert population.age.tolist() == [1, 4]
+    assert population.occupancy.counts.sum() == 2
+
+
+def test_cap_refuses_or_raises():
+    population = Population(20)
+    population.set_limits(max_agents=5)
+    population.add(B_CELL, [0, 1, 2], [0, 0, 0])
+    population.add(T_CELL, [3, 4, 5, 6], [0, 0, 0, 0])
+    assert len(population) == 5 and population.n_refused == 2
+    assert population.species.tolist() == [B_CELL] * 3 + [T_CELL] * 2
+    assert population.occupancy.counts.sum() == 5 and population.capacity == 5
+
+    # isolated cells, the first parents in store order divide, the sites of the others are released
+    population = Population(20, np.random.default_rng(0))
+    population.set_limits(max_agents=7)
+    population.add(B_CELL, [2, 6, 10, 14, 18], [10] * 5)
+    population.look_for_division()
+    assert len(population) == 7 and population.n_refused == 3
+    assert np.abs(population.x[5:] - [2, 6]).max() <= 1 and population.occupancy.counts.sum() == 7
+
+    # a memory cap is converted to a number of rows
+    population = Population(20, np.random.default_rng(0))
+    population.set_limits(max_memory=4 * population.row_bytes() + 1, overflow="raise")
+    population.add(B_CELL, [2, 6, 10, 14], [10] * 4)
+    with pytest.raises(RuntimeError, match="Population cap reached"):
+        population.look_for_division()
+    assert len(population) == 4 and population.occupancy.counts.sum() == 4
+    with pytest.raises(ValueError, match="Unknown overflow policy"):
+        population.set_limits(overflow="grow")
+
+
+def test_keep_compacts_the_buffers():
+    population = Population(50)
+    population.add(B_CELL, np.arange(50), np.arange(50), np.arange(50))
+    population.add(T_CELL, np.arange(50), np.zeros(50, dtype=int), np.arange(50, 100))
+    assert population.capacity == 64 * 2
+    population.keep(population.age % 3 == 0)
+    assert len(population) == 34 and population.capacity == 128
+    assert population.age.tolist() == list(range(0, 100, 3))
+    assert population.occupancy.counts.sum() == 34 and population.occupancy.counts[3, 3] == 1 and population.occupancy.counts[1, 1] == 0
+
+    # spare rows are reused before the buffers grow
+    population.add(B_CELL, np.arange(94) % 50, np.full(94, 49))
+    assert len(population) == 128 and population.capacity == 128
+    population.add(B_CELL, [0], [48])
+    assert population.capacity == 256 and population.age[:34].tolist() == list(range(0, 100, 3))
+
+
+def test_capped_run(tmp_path):
+    metrics = run_metrics(tmp_path, engine="arrays", max_agents=300)
+    assert max(metrics["n_total"]) <= 300 and sum(metrics["n_refused"]) > 0
+    with pytest.raises(ValueError, match="only supported by the arrays engine"):
+        run_metrics(tmp_path, engine="objects", max_agents=300)
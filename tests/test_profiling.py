@@ -0,0 +1,55 @@
+# load usual dependencies
+import numpy as np
+import json
+import os
+import time
+
+# load modules
+from profiling import Profiler, STEP_PHASES
+from test_equivalence import run_metrics
+
+
+def test_disabled_profiler_is_a_no_op():
+    profiler = Profiler(enabled=False)
+    assert profiler.columns() == []
+    assert profiler.phase("movement") is profiler.phase("division")
+    profiler.start_step(0)
+    with profiler.phase("movement"):
+        profiler.count("n_agents", 3)
+    assert profiler.end_step(0) == {} and profiler.totals == {}
+
+
+def test_phase_timings_callbacks_and_profile_window(tmp_path):
+    steps = []
+    profiler = Profiler(callbacks=[lambda step, timings, counters: steps.append((step, dict(timings), dict(counters)))], profile_steps=(1, 2), profile_file=f"{tmp_path}/window.prof")
+    assert profiler.columns() == [f"time_{phase}" for phase in STEP_PHASES] + ["n_agents"]
+    for step in range(3):
+        profiler.start_step(step)
+        with profiler.phase("movement"):
+            time.sleep(0.01)
+        with profiler.phase("checkpoint"):
+            pass
+        profiler.count("n_agents", 10 + step)
+        values = profiler.end_step(step)
+        assert set(values) == set(profiler.columns())
+        assert values["time_movement"] >= 0.01 and values["time_division"] == 0 and values["n_agents"] == 10 + step
+
+    # per step timings, totals over the run
+    assert [step for step, _, _ in steps] == [0, 1, 2]
+    assert all(set(timings) == {"movement", "checkpoint"} for _, timings, _ in steps)
+    assert [counters["n_agents"] for _, _, counters in steps] == [10, 11, 12]
+    assert np.isclose(profiler.totals["movement"], sum(timings["movement"] for _, timings, _ in steps))
+    assert os.path.isfile(f"{tmp_path}/window.prof") and os.path.isfile(f"{tmp_path}/window.prof.txt")
+    profiler.save_totals(f"{tmp_path}/totals.json")
+    with open(f"{tmp_path}/totals.json") as f:
+        assert set(json.load(f)) == {"movement", "checkpoint"}
+
+
+def test_profiled_run_times_its_outputs(tmp_path):
+    metrics = run_metrics(tmp_path, engine="arrays", profile=True, outputs={"frame_every":0, "checkpoint_every":4, "trajectory_every":3})
+    assert all(f"time_{phase}" in metrics for phase in STEP_PHASES)
+    assert np.flatnonzero(metrics["time_checkpoint"]).tolist() == [4, 8, 12]
+    assert np.flatnonzero(metrics["time_trajectory"]).tolist() == [3, 6, 9, 12]
+    assert np.all(metrics["time_movement"][1:] > 0) and np.all(metrics["n_agents"][1:] > 0)
+    with open(f"{tmp_path}/logs/profile_totals.json") as f:
+        assert {"movement", "checkpoint", "trajectory", "save_metrics"} <= set(json.load(f))
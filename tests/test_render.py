@@ -0,0 +1,39 @@
+# load usual dependencies
+import numpy as np
+import os
+import pytest
+
+# load modules
+from trajectory import TrajectoryWriter
+from test_equivalence import run_metrics
+
+# frames need the plotting modules
+displayer = pytest.importorskip("displayer")
+import render
+
+
+def test_rendered_frame(tmp_path):
+    writer = TrajectoryWriter(f"{tmp_path}/trajectory", 5, ["b", "t"], ["blue", "green"])
+    writer.append(3, TrajectoryWriter.records([1, 1, 3], [1, 4, 0], [0, 0, 0], [0, 0, 1], [True, False, False]))
+    writer.close()
+    assert render.render_trajectory(str(tmp_path), scale=1, colors={"t":"black"}, n_workers=0) == 1
+
+    # y goes up, activated cells in red, species colors overridden by colors
+    frame = displayer.imageio.imread(f"{tmp_path}/images/step_3.png")
+    assert frame[3, 1].tolist() == [255, 0, 0]
+    assert frame[0, 1].tolist() == [0, 0, 255]
+    assert frame[4, 3].tolist() == [0, 0, 0]
+    assert (frame == 255).all(axis=2).sum() == 22
+
+
+def test_workers_render_the_same_frames_in_order(tmp_path):
+    run_metrics(tmp_path, engine="arrays", outputs={"frame_every":0, "trajectory_every":1})
+    n_frames = render.render_trajectory(str(tmp_path), scale=2, save_frames=False, animation_file=f"{tmp_path}/sequential.gif", n_workers=0)
+    render.render_trajectory(str(tmp_path), scale=2, animation_file=f"{tmp_path}/workers.gif", n_workers=2, chunk_size=2)
+    assert n_frames == 13 and len(os.listdir(f"{tmp_path}/images")) == 13
+    sequential = displayer.imageio.mimread(f"{tmp_path}/sequential.gif")
+    workers = displayer.imageio.mimread(f"{tmp_path}/workers.gif")
+    assert len(sequential) == len(workers) == 13
+    for step, (expected, frame) in enumerate(zip(sequential, workers)):
+        assert np.array_equal(expected, frame), step
+    assert np.asarray(workers[5]).shape[:2] == displayer.imageio.imread(f"{tmp_path}/images/step_5.png").shape[:2] == (80, 80)
@@ -0,0 +1,66 @@
+# load usual dependencies
+import numpy as np
+import os
+import pytest
+
+# load modules
+from test_equivalence import run_metrics
+
+# frames need the plotting modules
+displayer = pytest.importorskip("displayer")
+
+
+def test_headless_and_decimated_frames(tmp_path):
+    run_metrics(tmp_path / "headless", engine="arrays", outputs={"frame_every":0})
+    assert os.listdir(tmp_path / "headless" / "images") == []
+    run_metrics(tmp_path / "decimated", engine="arrays", outputs={"frame_every":4, "render":"raster"})
+    assert sorted(os.listdir(tmp_path / "decimated" / "images")) == ["step_0.png", "step_4.png", "step_8.png"]
+
+
+def test_raster_frame():
+    renderer = displayer.FrameRenderer(10, "raster", scale=3)
+    frame = renderer.draw([([0, 9], [0, 9], ["blue", "red"]), ([], [], "green"), ([5], [2], np.array([[1, 2, 3]], dtype=np.uint8))])
+    assert frame.shape == (30, 30, 3) and frame.dtype == np.uint8
+
+    # y goes up, one scale x scale block per site, white background
+    assert np.all(frame[27:30, 0:3] == [0, 0, 255])
+    assert np.all(frame[0:3, 27:30] == [255, 0, 0])
+    assert np.all(frame[21:24, 15:18] == [1, 2, 3])
+    assert np.all(frame[12:15, 12:15] == 255)
+
+
+def test_scatter_frames_reuse_one_figure():
+    renderer = displayer.FrameRenderer(10, "scatter", figsize=(2, 2))
+    first = renderer.draw([([1, 2], [1, 2], "blue")])
+    figure = renderer.figure
+    second = renderer.draw([([8], [8], ["red"])])
+    assert renderer.figure is figure
+    assert first.shape == second.shape and first.shape[2] == 3
+    assert not np.array_equal(first, second)
+    renderer.close()
+    assert renderer.figure is None
+
+
+def test_streamed_gif(tmp_path):
+    rng = np.random.default_rng(0)
+    frames = [np.full((12, 16, 3), color, dtype=np.uint8) for color in [[255, 0, 0], [0, 0, 255], [0, 255, 0]]]
+    frames.append(rng.choice([0, 255], size=(12, 16, 3)).astype(np.uint8))
+    with displayer.AnimationWriter(f"{tmp_path}/stream.gif", duration=0.2) as writer:
+        for frame in frames:
+            writer.append(frame)
+    assert writer.n_frames == 4
+
+    # web palette colors are kept as they are
+    read = displayer.imageio.mimread(f"{tmp_path}/stream.gif")
+    assert len(read) == 4
+    for expected, frame in zip(frames, read):
+        assert np.array_equal(np.asarray(frame)[..., :3], expected)
+
+
+def test_animation_from_saved_frames(tmp_path):
+    # frames are streamed in step order, not in file name order
+    for step in [0, 2, 10]:
+        displayer.save_frame(np.full((8, 8, 3), 25 * step, dtype=np.uint8), f"{tmp_path}/step_{step}.png")
+    displayer.craft_simulation_animation(str(tmp_path), f"{tmp_path}/simulation.gif")
+    read = displayer.imageio.mimread(f"{tmp_path}/simulation.gif")
+    assert [int(np.asarray(frame)[0, 0, 0]) for frame in read] == [0, 51, 255]
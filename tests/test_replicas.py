@@ -0,0 +1,27 @@
+# load usual dependencies
+import numpy as np
+import pytest
+
+# load modules
+from replicas import run_replicas
+from metrics import load_replica_metrics
+from test_equivalence import RUN, run_metrics
+
+
+def test_replicas_follow_seeded_arrays_runs(tmp_path):
+    data = run_replicas({**RUN, "output_folder":str(tmp_path / "replicas")}, 3)
+    saved, columns = load_replica_metrics(f"{tmp_path}/replicas/logs/replica_metrics.npz")
+    assert data.shape == (3, RUN["n_steps"] + 1, len(columns)) and np.array_equal(saved, data)
+
+    # replica r is the arrays run with seed [seed, r]
+    for replica in range(3):
+        metrics = run_metrics(tmp_path / f"run_{replica}", engine="arrays", seed=[RUN["seed"], replica])
+        for position, column in enumerate(columns):
+            assert np.array_equal(data[replica, :, position], metrics[column]), (replica, column)
+    assert not np.array_equal(data[0], data[1])
+
+
+def test_unsupported_options(tmp_path):
+    for option in [{"max_agents":100}, {"intracellular":True}, {"outputs":{"lineage":True}}]:
+        with pytest.raises(ValueError, match="not supported by the replica engine"):
+            run_replicas({**RUN, "output_folder":str(tmp_path), **option}, 2)
@@ -0,0 +1,47 @@
+# load usual dependencies
+import numpy as np
+import random
+import pytest
+
+# load modules
+import environment
+from population import Population, B_CELL
+from test_equivalence import run_metrics, random_agents, object_records
+
+
+@pytest.mark.parametrize("engine", ["objects", "arrays"])
+def test_seed_alone_drives_a_run(tmp_path, engine):
+    # the global generators are left aside, every draw comes from the seeded generator of the run
+    random.seed(1)
+    np.random.seed(1)
+    first = run_metrics(tmp_path / "first", engine=engine)
+    random.seed(2)
+    np.random.seed(2)
+    second = run_metrics(tmp_path / "second", engine=engine)
+    other = run_metrics(tmp_path / "other", engine=engine, seed=6)
+    for column in first:
+        assert np.array_equal(first[column], second[column]), column
+    assert not all(np.array_equal(first[column], other[column]) for column in first)
+
+
+def test_moves_are_drawn_in_one_batch():
+    # one move of every agent object consumes the same draws as one batch of (dx, dy) pairs
+    agent_list_list = random_agents(30, 20, np.random.default_rng(2))
+    expected = [(a.x, a.y) for agent_list in agent_list_list for a in agent_list]
+    steps = np.random.default_rng(3).integers(-1, 2, size=(len(expected), 2))
+    environment.move_agents(agent_list_list, np.random.default_rng(3))
+    speeds = [a.speed for agent_list in agent_list_list for a in agent_list]
+    expected = [(min(max(x + dx, 0), 29), min(max(y + dy * speed, 0), 29)) for (x, y), (dx, dy), speed in zip(expected, steps.tolist(), speeds)]
+    assert [(a.x, a.y) for agent_list in agent_list_list for a in agent_list] == expected
+
+
+def test_population_draws_from_its_generator():
+    populations = []
+    for _ in range(2):
+        population = Population(30, np.random.default_rng(4))
+        population.add(B_CELL, np.arange(30), np.arange(30))
+        population.init_random_age()
+        population.move()
+        populations.append(population)
+    assert np.array_equal(populations[0].x, populations[1].x) and np.array_equal(populations[0].age, populations[1].age)
+    assert object_records(populations[0].to_agents()) == object_records(populations[1].to_agents())
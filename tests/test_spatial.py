@@ -0,0 +1,69 @@
+# load usual dependencies
+import numpy as np
+
+# load modules
+from spatial import CellIndex, OccupancyGrid, DAUGHTER_SITES
+
+
+def brute_pairs(qx, qy, x, y, radius:float) -> set:
+    """Every (query point, point) pair closer than radius, from the full distance matrix"""
+    distance = np.sqrt((qx[:, None] - x[None, :])**2 + (qy[:, None] - y[None, :])**2)
+    return set(zip(*[index.tolist() for index in np.nonzero(distance <= radius)]))
+
+
+def test_cell_index_pairs_match_brute_force():
+    rng = np.random.default_rng(8)
+    for radius, cell_size in [(2, 2), (1.5, 2), (3, 1), (5, 2.5)]:
+        x, y = rng.integers(0, 40, size=(2, 300))
+        qx, qy = rng.integers(-3, 43, size=(2, 200))
+        query_index, point_index = CellIndex(x, y, cell_size).query_pairs(qx, qy, radius)
+        pairs = list(zip(query_index.tolist(), point_index.tolist()))
+        assert len(pairs) == len(set(pairs))
+        assert set(pairs) == brute_pairs(qx, qy, x, y, radius)
+
+
+def test_cell_index_neighbours():
+    index = CellIndex([0, 10], [0, 10], 2)
+    assert index.has_neighbour([1, 5, 12, 10], [1, 5, 10, 13], 2).tolist() == [True, False, True, False]
+    assert CellIndex([], [], 2).has_neighbour([1, 2], [1, 2], 2).tolist() == [False, False]
+    assert CellIndex([1], [1], 2).has_neighbour([], [], 2).shape == (0,)
+
+
+def test_occupancy_updates_match_a_rebuild():
+    rng = np.random.default_rng(9)
+    x, y = rng.integers(0, 30, size=(2, 500))
+    grid = OccupancyGrid(30, x, y)
+    for n_moved in [3, 400]:
+        # sparse and dense updates
+        new_x = np.clip(x + rng.integers(-1, 2, 500) * (np.arange(500) < n_moved), 0, 29)
+        new_y = np.clip(y + rng.integers(-1, 2, 500) * (np.arange(500) < n_moved), 0, 29)
+        grid.move(x, y, new_x, new_y)
+        x, y = new_x, new_y
+        assert np.array_equal(grid.counts, OccupancyGrid(30, x, y).counts)
+    grid.remove(x[:200], y[:200])
+    grid.add([0, 0], [0, 0])
+    assert np.array_equal(grid.counts, OccupancyGrid(30, np.concatenate([x[200:], [0, 0]]), np.concatenate([y[200:], [0, 0]])).counts)
+
+
+def test_neighbour_count_matches_brute_force():
+    rng = np.random.default_rng(10)
+    x, y = rng.integers(0, 20, size=(2, 150))
+    qx, qy = rng.integers(0, 20, size=(2, 60))
+    for radius in [1, 2, 2.5]:
+        expected = [len([p for p in brute_pairs(qx, qy, x, y, radius) if p[0] == q]) for q in range(60)]
+        assert OccupancyGrid(20, x, y).neighbour_count(qx, qy, radius).tolist() == expected
+
+
+def test_daughter_sites():
+    grid = OccupancyGrid(5, [2, 3, 0], [2, 2, 0])
+    site_x, site_y, placed = grid.claim_daughter_sites([2, 2, 0], [2, 2, 0])
+
+    # x+1 of (2, 2) is taken, its two parents get the next free sites in order, a shared site goes to the first one
+    assert placed.tolist() == [True, True, True]
+    assert list(zip(site_x.tolist(), site_y.tolist())) == [(2, 3), (1, 2), (1, 0)]
+    assert grid.counts[2, 3] == 1 and grid.counts[1, 2] == 1 and grid.counts[1, 0] == 1
+
+    # a parent surrounded by agents has no site
+    x, y = zip(*[(2 + dx, 2 + dy) for dx, dy in DAUGHTER_SITES])
+    _, _, placed = OccupancyGrid(5, x, y).claim_daughter_sites([2], [2])
+    assert placed.tolist() == [False]
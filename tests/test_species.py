@@ -0,0 +1,66 @@
+# load usual dependencies
+import numpy as np
+import pytest
+
+# load modules
+import simple_run
+from species import load_species, new_agent
+from population import Population
+from metrics import load_metrics
+from agents.b_cell import LymphocyteB
+from agents.generic_cell import GenericCell
+
+
+def write_species(species_file, rows:list) -> str:
+    """Write a species file, default Bcell & Tcell rows followed by rows, returns its path"""
+    with open(species_file, "w") as f:
+        f.write("name,agent_class,color,life_span,speed,division,count_key\n")
+        f.write("b,agents.b_cell.LymphocyteB,blue,10,1,isolated,n_b_agents\n")
+        f.write("t,agents.t_cell.LymphocyteT,green,10,2,isolated,n_t_agents\n")
+        for row in rows:
+            f.write(row + "\n")
+    return str(species_file)
+
+
+def test_default_registry():
+    registry = load_species()
+    assert [species["name"] for species in registry] == ["b", "t", "pathogen", "nk", "neutro", "dendritic", "macrophage", "mastocyte"]
+    assert registry[0]["agent_class"] is LymphocyteB and registry[0]["metric"] == "n_b"
+    assert registry[1]["speed"] == 2 and registry[2]["life_span"] == 30
+
+
+def test_generic_species(tmp_path):
+    registry = load_species(write_species(tmp_path / "species.csv", ["spore,,orange,6,3,none,n_spore_agents"]))
+    spore = registry[2]
+    assert issubclass(spore["agent_class"], GenericCell) and spore["agent_class"].__name__ == "Spore"
+    assert (spore["color"], spore["life_span"], spore["speed"], spore["division"], spore["metric"]) == ("orange", 6, 3, "none", "n_spore")
+
+    # agent objects & daughters carry the registry parameters
+    agent = new_agent(spore, 4, 4, 20)
+    agent.move(1, -1)
+    assert (agent.x, agent.y, agent.color, agent.life_span) == (5, 1, "orange", 6)
+    daughter = agent.cell_division()
+    assert (daughter.speed, daughter.color, daughter.life_span, daughter.age) == (3, "orange", 6, 0)
+
+    # vertical steps of the arrays engine are scaled by the species speed
+    population = Population(50, np.random.default_rng(0), registry)
+    population.add(2, np.full(200, 25), np.full(200, 25))
+    population.move()
+    assert set(np.unique(population.y - 25).tolist()) == {-3, 0, 3}
+
+
+@pytest.mark.parametrize("engine", ["objects", "arrays"])
+def test_run_with_an_extra_species(tmp_path, engine):
+    species_file = write_species(tmp_path / "species.csv", ["spore,,orange,6,3,none,n_spore_agents"])
+    simple_run.run_simulation(
+        12, str(tmp_path / "run"), 30, 20, 20, 0, 0, 0, 0, 0, 0, engine=engine, seed=3,
+        outputs={"frame_every":0}, species_file=species_file, agent_counts={"n_spore_agents":40}
+    )
+    metrics = load_metrics(f"{tmp_path}/run/logs/metrics.npz")
+    assert metrics["n_spore"][0] == 40 and np.all(np.diff(metrics["n_spore"]) <= 0)
+    assert "n_pathogen" not in metrics
+
+
+def test_unknown_division_rule(tmp_path):
+    with pytest.raises(ValueError, match="division rule"):
+        load_species(write_species(tmp_path / "species.csv", ["spore,,orange,6,3,budding,n_spore_agents"]))
@@ -0,0 +1,57 @@
+# load usual dependencies
+import numpy as np
+import pandas as pd
+
+# load modules
+import sweep
+from metrics import load_metrics
+
+
+# small configuration shared by the sweep tests, every species of the default registry
+SMALL = {
+    "n_steps":3, "grid_size":12, "n_b_agents":8, "n_t_agents":8, "n_pathogen_agents":2,
+    "n_nk_agents":2, "n_neutro_agents":2, "n_dendritic_agents":2, "n_macrophage_agents":2,
+    "n_mastocyte_agents":2, "engine":"arrays"
+}
+
+
+def write_configuration(configuration_file, **parameters) -> str:
+    """Write a PARAMETER,VALUE configuration file, returns its path"""
+    with open(configuration_file, "w") as f:
+        f.write("PARAMETER,VALUE\n")
+        for k, v in parameters.items():
+            f.write(f"{k},{v}\n")
+    return str(configuration_file)
+
+
+def test_sweep_grid_expansion(tmp_path):
+    configuration_file = write_configuration(tmp_path / "sweep.conf", **{**SMALL, "output_folder":tmp_path, "grid_size":"10;20", "engine":"objects;arrays;parallel", "n_replicates":3, "n_workers":2, "seed":9})
+    configuration = sweep.parse_sweep_configuration(configuration_file)
+    assert configuration["valid"]
+    assert (configuration["n_replicates"], configuration["n_workers"], configuration["seed"], configuration["batched"]) == (3, 2, 9, False)
+    combinations = [(p["grid_size"], p["engine"]) for p in configuration["parameter_sets"]]
+    assert combinations == [(g, e) for g in ["10", "20"] for e in ["objects", "arrays", "parallel"]]
+    assert all("n_replicates" not in p and "seed" not in p for p in configuration["parameter_sets"])
+
+
+def test_sweep_seeds_and_aggregation(tmp_path):
+    parameter_sets = [{**SMALL, "grid_size":"12"}, {**SMALL, "grid_size":"14"}]
+    summary = sweep.run_sweep(parameter_sets, 2, str(tmp_path), seed=3, n_workers=1)
+
+    # one seed per run, spawned from the root seed in set & replicate order
+    runs = pd.read_csv(f"{tmp_path}/sweep_runs.csv")
+    expected = [int.from_bytes(child.generate_state(4).tobytes(), "little") for child in np.random.SeedSequence(3).spawn(4)]
+    assert runs["SEED"].astype(str).tolist() == [str(s) for s in expected]
+    assert runs["FOLDER"].tolist() == [f"{tmp_path}/set_{s:03d}/replicate_{r:03d}" for s in range(2) for r in range(2)]
+
+    # mean & quantiles over the replicates of each set
+    assert summary["SET"].tolist() == [0] * 4 + [1] * 4
+    for set_id in range(2):
+        replicates = [load_metrics(f"{tmp_path}/set_{set_id:03d}/replicate_{r:03d}/logs/metrics.npz")["n_b"] for r in range(2)]
+        rows = summary[summary["SET"] == set_id]
+        assert np.allclose(rows["n_b_mean"], np.mean(replicates, axis=0))
+        assert np.allclose(rows["n_b_q05"], np.quantile(replicates, 0.05, axis=0))
+
+    # same root seed, same runs
+    again = sweep.run_sweep(parameter_sets, 2, str(tmp_path / "again"), seed=3, n_workers=1)
+    pd.testing.assert_frame_equal(summary, again)
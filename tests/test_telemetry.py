@@ -0,0 +1,60 @@
+# load usual dependencies
+import numpy as np
+import os
+import pytest
+
+# load modules
+from telemetry import TelemetryChannel, TelemetryReader, occupancy_raster
+from test_equivalence import run_metrics
+
+
+def channel_name(label:str) -> str:
+    return f"test_telemetry_{label}_{os.getpid()}"
+
+
+def test_occupancy_raster():
+    raster = occupancy_raster([0, 1, 9, 9, 12], [0, 3, 9, 8, -1], 10, 5)
+    assert raster.sum() == 5
+    assert (raster[0, 0], raster[0, 1], raster[4, 4], raster[4, 0]) == (1, 1, 2, 1)
+
+
+def test_ring_buffer_wraparound():
+    channel = TelemetryChannel(channel_name("ring"), ["step", "n_b"], 10, capacity=4, raster_size=5)
+    reader = TelemetryReader(channel.name)
+    try:
+        assert (reader.columns, reader.capacity, reader.raster_size, reader.grid_size) == (["step", "n_b"], 4, 5, 10)
+        rows, raster = reader.poll()
+        assert rows.shape == (0, 2) and raster is None
+
+        for step in range(3):
+            channel.publish([step, 10 * step], [step], [step])
+        rows, raster = reader.poll()
+        assert rows[:, 0].tolist() == [0, 1, 2] and raster.sum() == 1 and raster[1, 1] == 1
+
+        # a lagging reader keeps the last capacity steps and counts the others as lost
+        for step in range(3, 10):
+            channel.publish([step, 10 * step], [0, 9], [0, 9])
+        rows, raster = reader.poll()
+        assert rows.tolist() == [[step, 10 * step] for step in range(6, 10)] and reader.n_lost == 3
+        assert raster.tolist() == occupancy_raster([0, 9], [0, 9], 10, 5).tolist()
+
+        # a slot being written is skipped
+        channel.publish([10, 100], [], [])
+        channel.publish([11, 110], [], [])
+        channel.layout.sequence[10 % 4] = -1
+        rows, _ = reader.poll()
+        assert rows[:, 0].tolist() == [11] and reader.n_lost == 4
+    finally:
+        reader.close()
+        channel.close()
+
+
+def test_channel_names_are_exclusive(tmp_path):
+    channel = TelemetryChannel(channel_name("busy"), ["step"], 10)
+    with pytest.raises(ValueError, match="already used by another run"):
+        TelemetryChannel(channel.name, ["step"], 10)
+    channel.close()
+
+    # a run publishing every step releases its channel at the end
+    run_metrics(tmp_path, engine="arrays", outputs={"frame_every":0, "telemetry":channel.name})
+    TelemetryChannel(channel.name, ["step"], 10).close()
@@ -0,0 +1,57 @@
+# load usual dependencies
+import numpy as np
+
+# load modules
+from trajectory import TrajectoryWriter, TrajectoryReader
+from test_equivalence import run_metrics
+
+
+def random_records(n:int, rng:np.random.Generator) -> np.ndarray:
+    return TrajectoryWriter.records(rng.integers(0, 50, n), rng.integers(0, 50, n), rng.integers(0, 10, n), rng.integers(0, 8, n), rng.random(n) < 0.5)
+
+
+def test_round_trip(tmp_path):
+    rng = np.random.default_rng(0)
+    recorded = {0:random_records(30, rng), 5:random_records(0, rng), 10:random_records(45, rng), 15:random_records(12, rng)}
+    writer = TrajectoryWriter(str(tmp_path), 50, ["b", "t"], ["blue", "green"])
+    for step, records in recorded.items():
+        writer.append(step, records)
+    writer.close()
+
+    reader = TrajectoryReader(str(tmp_path))
+    assert (reader.grid_size, reader.species, reader.colors) == (50, ["b", "t"], ["blue", "green"])
+    assert reader.steps.tolist() == [0, 5, 10, 15] and len(reader) == 4
+    for step, records in recorded.items():
+        assert np.array_equal(reader.load_step(step), records), step
+    records, steps = reader.load_range(5, 15)
+    assert np.array_equal(records, np.concatenate([recorded[5], recorded[10]]))
+    assert steps.tolist() == [10] * 45
+    assert reader.load_range(20, 30)[0].shape == (0,)
+
+
+def test_resume_drops_later_steps(tmp_path):
+    rng = np.random.default_rng(1)
+    recorded = [random_records(n, rng) for n in [10, 20, 30]]
+    writer = TrajectoryWriter(str(tmp_path), 50, ["b"])
+    for step, records in enumerate(recorded):
+        writer.append(step, records)
+    writer.close()
+
+    # a run resumed at step 1 records its own step 2
+    replay = random_records(5, rng)
+    writer = TrajectoryWriter(str(tmp_path), 50, ["b"], resume_step=1)
+    writer.append(2, replay)
+    writer.close()
+    reader = TrajectoryReader(str(tmp_path))
+    assert reader.steps.tolist() == [0, 1, 2]
+    assert np.array_equal(reader.load_step(1), recorded[1]) and np.array_equal(reader.load_step(2), replay)
+
+
+def test_recorded_run(tmp_path):
+    metrics = run_metrics(tmp_path, engine="arrays", outputs={"frame_every":0, "trajectory_every":4})
+    reader = TrajectoryReader(f"{tmp_path}/trajectory")
+    assert reader.steps.tolist() == [0, 4, 8, 12]
+    for step in reader.steps:
+        records = reader.load_step(step)
+        assert np.bincount(records["species"], minlength=8).tolist() == [metrics[column][step] for column in ["n_b", "n_t", "n_pathogen", "n_nk", "n_neutro", "n_dendritic", "n_macrophage", "n_mastocyte"]]
+        assert records["activated"][records["species"] == 0].sum() == metrics["n_activated_b"][step]
@@ -0,0 +1,60 @@
+# load usual dependencies
+import threading
+import pytest
+
+# load modules
+from writer import BackgroundWriter
+
+
+def test_jobs_run_in_order_off_the_loop():
+    done = []
+    threads = set()
+    with BackgroundWriter(4) as writer:
+        for job in range(50):
+            writer.submit(lambda job: (done.append(job), threads.add(threading.current_thread().name)), job)
+    assert done == list(range(50))
+    assert threads == {"BackgroundWriter"}
+
+
+def test_bounded_queue_blocks_the_loop():
+    # with a stalled disk, submit waits once the queue is full
+    started, release = threading.Event(), threading.Event()
+    writer = BackgroundWriter(2)
+    writer.submit(lambda: (started.set(), release.wait()))
+    started.wait()
+    submitted = []
+    loop = threading.Thread(target=lambda: [submitted.append(writer.submit(lambda: None)) for _ in range(5)])
+    loop.start()
+    loop.join(0.3)
+    assert loop.is_alive() and len(submitted) == 2
+    release.set()
+    loop.join()
+    writer.close()
+    assert len(submitted) == 5
+
+
+def test_errors_are_raised_in_the_loop():
+    writer = BackgroundWriter(2)
+    writer.submit(lambda: 1 / 0)
+    with pytest.raises(RuntimeError) as error:
+        writer.flush()
+    assert isinstance(error.value.__cause__, ZeroDivisionError)
+    writer.close()
+
+    # jobs after a failure are skipped, the error is raised by close
+    done = []
+    writer = BackgroundWriter(2)
+    writer.submit(lambda: 1 / 0)
+    writer.submit(done.append, 1)
+    with pytest.raises(RuntimeError):
+        writer.close()
+    assert done == []
+
+
+def test_synchronous_mode():
+    done = []
+    with BackgroundWriter(0) as writer:
+        writer.submit(lambda: done.append(threading.current_thread() is threading.main_thread()))
+        assert done == [True]
+        with pytest.raises(ZeroDivisionError):
+            writer.submit(lambda: 1 / 0)
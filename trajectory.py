@@ -0,0 +1,153 @@
+# load usual dependencies
+import numpy as np
+import json
+import os
+
+
+# one record per agent and recorded step
+TRAJECTORY_DTYPE = np.dtype([
+    ("x", "<i4"),
+    ("y", "<i4"),
+    ("age", "<i4"),
+    ("species", "i1"),
+    ("activated", "?")
+])
+
+# one entry per recorded step: first record and number of records of the step
+INDEX_DTYPE = np.dtype([
+    ("step", "<i8"),
+    ("offset", "<i8"),
+    ("count", "<i8")
+])
+
+
+class TrajectoryWriter:
+    """Append the agents of each recorded step to a binary file of fixed size records
+    (agents.bin), with a step index (index.bin) giving where each step starts.
+    Both files are append only, so a crash never corrupts recorded steps, and they
+    can be memory mapped by TrajectoryReader while the simulation runs.
+    """
+
+    def __init__(self, trajectory_folder:str, grid_size:int, species_names:list, species_colors:list=None, resume_step:int=None):
+        """
+        Args:
+            - trajectory_folder (str) : folder of the trajectory files
+            - grid_size (int) : grid_size (assume grid is a square)
+            - species_names (list) : name of each species id
+            - species_colors (list) : color of each species id, used to render the trajectory
+            - resume_step (int) : keep steps up to resume_step of an existing trajectory
+            and append after them, start a new trajectory if not provided
+
+        """
+
+        # params
+        self.trajectory_folder = trajectory_folder
+        os.makedirs(trajectory_folder, exist_ok=True)
+        n_records = 0
+        n_steps = 0
+
+        # drop steps recorded after the resume step
+        if resume_step is not None and os.path.isfile(f"{trajectory_folder}/index.bin"):
+            index = np.fromfile(f"{trajectory_folder}/index.bin", dtype=INDEX_DTYPE)
+            index = index[index["step"] <= resume_step]
+            n_steps = index.shape[0]
+            n_records = int(index["offset"][-1] + index["count"][-1]) if n_steps > 0 else 0
+        mode = "r+b" if resume_step is not None and os.path.isfile(f"{trajectory_folder}/index.bin") else "wb"
+        self.agents_file = open(f"{trajectory_folder}/agents.bin", mode)
+        self.index_file = open(f"{trajectory_folder}/index.bin", mode)
+        self.agents_file.truncate(n_records * TRAJECTORY_DTYPE.itemsize)
+        self.index_file.truncate(n_steps * INDEX_DTYPE.itemsize)
+        self.agents_file.seek(0, os.SEEK_END)
+        self.index_file.seek(0, os.SEEK_END)
+        self.n_records = n_records
+
+        # description of the files
+        with open(f"{trajectory_folder}/meta.json", "w") as f:
+            json.dump({
+                "grid_size":grid_size,
+                "species":list(species_names),
+                "colors":list(species_colors) if species_colors is not None else None,
+                "dtype":TRAJECTORY_DTYPE.descr,
+                "index_dtype":INDEX_DTYPE.descr
+            }, f)
+
+    @staticmethod
+    def records(x, y, age, species, activated) -> np.ndarray:
+        """Pack agent columns into trajectory records (a copy, safe to write later)"""
+        records = np.empty(np.asarray(x).shape[0], dtype=TRAJECTORY_DTYPE)
+        records["x"] = x
+        records["y"] = y
+        records["age"] = age
+        records["species"] = species
+        records["activated"] = activated
+        return records
+
+    def append(self, step:int, records:np.ndarray) -> None:
+        """Append the records of one step
+
+        Args:
+            - step (int) : step number
+            - records (np.ndarray) : agents of the step, see records
+
+        """
+        self.agents_file.write(records.tobytes())
+        entry = np.array([(step, self.n_records, records.shape[0])], dtype=INDEX_DTYPE)
+        self.index_file.write(entry.tobytes())
+        self.n_records += records.shape[0]
+
+    def close(self) -> None:
+        self.agents_file.close()
+        self.index_file.close()
+
+
+class TrajectoryReader:
+    """Read a trajectory recorded by TrajectoryWriter. Records are memory mapped, so
+    loading a step or a range of steps only reads these steps from the disk.
+    """
+
+    def __init__(self, trajectory_folder:str):
+        with open(f"{trajectory_folder}/meta.json") as f:
+            self.meta = json.load(f)
+        self.grid_size = self.meta["grid_size"]
+        self.species = self.meta["species"]
+        self.colors = self.meta.get("colors")
+        self.index = np.fromfile(f"{trajectory_folder}/index.bin", dtype=INDEX_DTYPE)
+        n_records = int(self.index["offset"][-1] + self.index["count"][-1]) if self.index.shape[0] > 0 else 0
+        if n_records > 0:
+            self.records = np.memmap(f"{trajectory_folder}/agents.bin", dtype=TRAJECTORY_DTYPE, mode="r", shape=(n_records,))
+        else:
+            self.records = np.zeros(0, dtype=TRAJECTORY_DTYPE)
+        self.positions = {int(step):position for position, step in enumerate(self.index["step"])}
+
+    def __len__(self):
+        return self.index.shape[0]
+
+    @property
+    def steps(self) -> np.ndarray:
+        """Recorded step numbers"""
+        return self.index["step"]
+
+    def load_step(self, step:int) -> np.ndarray:
+        """Return the agents of one recorded step, as a structured array with the x, y,
+        age, species and activated fields (read only view on the file)"""
+        entry = self.index[self.positions[step]]
+        return self.records[entry["offset"]:entry["offset"] + entry["count"]]
+
+    def load_range(self, start:int, stop:int):
+        """Return the agents of every recorded step in [start, stop)
+
+        Args:
+            - start (int) : first step
+            - stop (int) : last step (excluded)
+
+        Returns:
+            - (np.ndarray) : records of the steps, one after the other
+            - (np.ndarray) : step of each record
+
+        """
+        selected = self.index[(self.index["step"] >= start) & (self.index["step"] < stop)]
+        if selected.shape[0] == 0:
+            return np.zeros(0, dtype=TRAJECTORY_DTYPE), np.zeros(0, dtype=np.int64)
+        first = selected["offset"][0]
+        last = selected["offset"][-1] + selected["count"][-1]
+        return self.records[first:last], np.repeat(selected["step"], selected["count"])
@@ -0,0 +1,78 @@
+# load usual dependencies
+import threading
+import queue
+
+
+class BackgroundWriter:
+    """Run output jobs (frame files, animation frames, checkpoints, metrics) on a
+    background thread, so that the simulation loop does not wait on the disk.
+    Jobs go through a bounded queue: when the writer falls behind, submit() blocks
+    until there is room, so pending outputs never grow without limit. Jobs run in
+    submission order. An error in a job stops the writer and is raised by the next
+    submit() or by close(), close() waits for every pending job.
+    With max_queue=0, jobs run immediately in the calling thread.
+    """
+
+    def __init__(self, max_queue:int=8):
+        self.max_queue = max_queue
+        self.error = None
+        self.thread = None
+        if max_queue > 0:
+            self.queue = queue.Queue(maxsize=max_queue)
+            self.thread = threading.Thread(target=self._run, name="BackgroundWriter", daemon=True)
+            self.thread.start()
+
+    def _run(self) -> None:
+        while True:
+            job = self.queue.get()
+            if job is None:
+                self.queue.task_done()
+                break
+            function, args, kwargs = job
+            if self.error is None:
+                try:
+                    function(*args, **kwargs)
+                except BaseException as error:
+                    self.error = error
+            self.queue.task_done()
+
+    def _raise(self) -> None:
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise RuntimeError("Background output job failed") from error
+
+    def submit(self, function, *args, **kwargs) -> None:
+        """Queue function(*args, **kwargs), arguments must not be modified afterwards
+        (pass copies of arrays updated in place by the simulation)"""
+        self._raise()
+        if self.thread is None:
+            function(*args, **kwargs)
+        else:
+            self.queue.put((function, args, kwargs))
+
+    def flush(self) -> None:
+        """Wait for every queued job"""
+        if self.thread is not None:
+            self.queue.join()
+        self._raise()
+
+    def close(self) -> None:
+        """Run pending jobs and stop the thread"""
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+        self._raise()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+            return
+        # an error is already raised by the simulation, flush what can be but don't mask it
+        try:
+            self.close()
+        except Exception:
+            pass